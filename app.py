@@ -1,6 +1,7 @@
 import argparse
 import json
 import logging
+import mimetypes
 import os
 import queue
 import secrets
@@ -17,12 +18,21 @@ from pathlib import Path
 import psutil
 from packaging.version import Version
 
-from flask import Flask, abort, jsonify, redirect, render_template, request, session, url_for
+from flask import Flask, Response, abort, jsonify, redirect, render_template, request, send_file, session, stream_template, url_for
 
 import soco
+from soco.exceptions import SoCoUPnPException
+from core.collection_warmer import PASS_INTERVAL_SECS as _WARM_PASS_SECS, CollectionWarmer
+from core.event_hub import EventHub
+from core.health import HealthMonitor, TapStats
 from core.nfc_interface import MockNFC, PN532NFC, parse_tag_data
-from providers import get_provider
-from core.sonos_player import get_now_playing, get_speakers, get_volume, next_track, pause, play_album, play_playlist, prev_track, resume, set_volume, stop
+from core.play_plans import PlayPlanStore
+from core.speaker_identity import SpeakerIdentityStore
+from providers import get_provider, list_providers
+from providers import transport as http_transport
+from providers.artwork import SIZES as ARTWORK_SIZES, ArtworkCache, proxy_url, upstream_url
+from providers.metadata_cache import MetadataCache
+from core.sonos_player import add_now_playing_listener, build_album_plan, build_playlist_plan, configure_identity, get_now_playing, get_speakers, get_volume, install_keepalive_sessions, next_track, pause, play_album, play_plan, play_playlist, pool_stats, prev_track, refresh_identity, resume, set_volume, start_now_playing_events, start_topology_events, stop, topology_stats
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", secrets.token_hex(32))
@@ -30,6 +40,8 @@ app.secret_key = os.environ.get("SECRET_KEY", secrets.token_hex(32))
 PROJECT_ROOT = Path(__file__).parent
 CONFIG_PATH = str(PROJECT_ROOT / "config.json")
 TAGS_PATH = str(PROJECT_ROOT / "data" / "tags.json")
+PLAY_PLANS_PATH = str(PROJECT_ROOT / "data" / "play_plans.json")
+METADATA_CACHE_PATH = str(PROJECT_ROOT / "data" / "metadata_cache.sqlite3")
 UPDATE_LOG = PROJECT_ROOT / "update.log"
 UPDATER_PATH = PROJECT_ROOT / "core" / "updater.py"
 
@@ -61,6 +73,46 @@ _nfc_read_queue = queue.Queue(maxsize=1)  # loop posts here when _web_read_pendi
 _NFC_MAX_CONSECUTIVE_ERRORS = 5
 _NFC_BACKOFF_SECS = 30
 
+# Precompiled play plans (tag_string -> queue items). None until
+# _configure_play_plans() runs at startup, so tests never touch data/.
+_play_plans = None  # type: PlayPlanStore | None
+_PLAY_PLAN_REVALIDATE_SECS = 600  # re-check a plan in the background at most every 10 min
+
+# Cached household / model / coordinator / UDNs (speaker_identity.json next to
+# config.json). None until _configure_speaker_identity() runs at startup.
+_speaker_identity = None  # type: SpeakerIdentityStore | None
+
+# True once _configure_sonos_events() has subscribed to the speaker's UPnP
+# events (topology, transport, volume); changing the speaker in settings then
+# moves the subscriptions too.
+_sonos_events = False
+
+# Internet health (offline mode serves cached metadata without network
+# attempts) and which path each tap took.
+_ITUNES_PROBE_URL = "https://itunes.apple.com/lookup?id=1440903625"
+_health = None  # type: HealthMonitor | None
+_tap_stats = TapStats()
+
+# On-disk artwork proxy cache (data/artwork/). None until
+# _configure_artwork_cache() runs; /artwork/ then redirects upstream.
+ARTWORK_CACHE_DIR = str(PROJECT_ROOT / "data" / "artwork")
+_artwork = None  # type: ArtworkCache | None
+_ARTWORK_MAX_AGE = 365 * 86400  # a given CDN URL never changes content
+
+# Background warmer over data/tags.json (metadata cache + play plans). None
+# until _start_collection_warmer() runs at startup.
+_warmer = None  # type: CollectionWarmer | None
+
+
+# Server-sent events (/events). One publisher thread computes now-playing for
+# every connected tab; it wakes on speaker events, transport commands and
+# taps, or every _SSE_REFRESH_SECS as a fallback.
+_events = EventHub()
+_now_playing_dirty = threading.Event()
+_SSE_REFRESH_SECS = 5
+_SSE_HEARTBEAT_SECS = 15
+_SSE_RETRY_MS = 3000
+
 
 def _get_household_id_upnp(speaker_ip: str) -> str:
     """Fetch the Sonos household ID from the local speaker via UPnP SOAP."""
@@ -90,6 +142,18 @@ def _get_household_id_upnp(speaker_ip: str) -> str:
         return ""
 
 
+def _get_household_id(speaker_ip: str) -> str:
+    """Household ID from the speaker identity cache, probing the speaker on a miss."""
+    if _speaker_identity is not None:
+        cached = _speaker_identity.get("household_id")
+        if cached:
+            return cached
+    household_id = _get_household_id_upnp(speaker_ip)
+    if _speaker_identity is not None:
+        _speaker_identity.observe_household(household_id)
+    return household_id
+
+
 def _load_config():
     with open(CONFIG_PATH) as f:
         config = json.load(f)
@@ -165,6 +229,7 @@ def _configure_smapi():
             cfg.setdefault("services", {}).setdefault("apple", {})
             cfg["services"]["apple"]["smapi_token"] = new_token
             cfg["services"]["apple"]["smapi_key"] = new_key
+            cfg["services"]["apple"]["smapi_token_refreshed_at"] = time.time()
             with open(CONFIG_PATH, "w") as f:
                 json.dump(cfg, f, indent=2)
             log.info("Persisted refreshed SMAPI token to config")
@@ -172,10 +237,262 @@ def _configure_smapi():
             log.warning("Failed to persist SMAPI token: %s", e)
 
     provider = get_provider("apple")
-    provider.configure_smapi(token, key, hhid, on_token_refresh=_on_token_refresh)
+    provider.configure_smapi(token, key, hhid, on_token_refresh=_on_token_refresh,
+                             token_issued_at=apple_cfg.get("smapi_token_refreshed_at"))
+    if "search_hedge_ms" in apple_cfg:
+        hedge_ms = apple_cfg["search_hedge_ms"]
+        provider.configure_search(None if hedge_ms is None else hedge_ms / 1000)
     log.info("Apple Music SMAPI search enabled (household=%s)", hhid)
 
 
+def _start_token_refresher():
+    """Rotate the SMAPI token in the background before it expires."""
+    provider = get_provider("apple")
+    if provider.smapi_available:
+        provider.start_token_refresher()
+
+
+def _configure_play_plans():
+    """Load the persistent play plan store from data/play_plans.json."""
+    global _play_plans
+    _play_plans = PlayPlanStore(PLAY_PLANS_PATH)
+    log.info("Loaded %d play plans", len(_play_plans))
+
+
+def _probe_internet():
+    """Raise unless itunes.apple.com answers (any HTTP status counts as reachable)."""
+    try:
+        http_transport.fetch(_ITUNES_PROBE_URL, timeout=5, retries=0)
+    except urllib.error.HTTPError:
+        pass
+
+
+def _is_offline():
+    return _health is not None and _health.offline
+
+
+def _configure_metadata_cache():
+    """Open data/metadata_cache.sqlite3 and route provider lookups through it.
+
+    Fetch outcomes feed the internet health monitor, which switches lookups
+    to cached-only (offline mode) after repeated network failures.
+    """
+    global _health
+    _health = HealthMonitor(_probe_internet)
+    try:
+        cache = MetadataCache(METADATA_CACHE_PATH, health=_health)
+    except Exception as e:
+        log.warning("Metadata cache unavailable, looking everything up live: %s", e)
+        return
+    for provider in list_providers():
+        provider.configure_cache(cache)
+
+
+def _configure_artwork_cache():
+    """Open data/artwork/ with the artwork_cache_mb quota from config (default 100 MB)."""
+    global _artwork
+    try:
+        quota_mb = _load_config().get("artwork_cache_mb", 100)
+    except Exception:
+        quota_mb = 100
+    try:
+        _artwork = ArtworkCache(ARTWORK_CACHE_DIR, quota_bytes=int(quota_mb * 1024 * 1024))
+    except Exception as e:
+        log.warning("Artwork cache unavailable, artwork served from upstream: %s", e)
+
+
+def _configure_speaker_identity():
+    """Load speaker_identity.json (next to config.json) and refresh it in the background."""
+    global _speaker_identity
+    _speaker_identity = SpeakerIdentityStore(
+        os.path.join(os.path.dirname(CONFIG_PATH), "speaker_identity.json"))
+    configure_identity(_speaker_identity)
+    _refresh_speaker_identity_async()
+
+
+def _refresh_speaker_identity():
+    try:
+        refresh_identity(_load_config()["speaker_ip"])
+    except Exception as e:
+        log.warning("Speaker identity refresh failed: %s", e)
+
+
+def _refresh_speaker_identity_async():
+    if _speaker_identity is None:
+        return
+    threading.Thread(target=_refresh_speaker_identity, daemon=True).start()
+
+
+def _configure_sonos_events():
+    global _sonos_events
+    _sonos_events = True
+    _start_sonos_events()
+
+
+def _start_sonos_events():
+    """Subscribe to group, transport and volume changes on the configured speaker
+    (in the background - the subscriptions need the speaker to answer)."""
+    def _subscribe():
+        try:
+            speaker_ip = _load_config().get("speaker_ip")
+            if speaker_ip:
+                start_topology_events(speaker_ip)
+                start_now_playing_events(speaker_ip)
+        except Exception as e:
+            log.warning("Sonos event subscription failed: %s", e)
+    threading.Thread(target=_subscribe, daemon=True).start()
+
+
+def _build_play_plan(tag_string):
+    """Resolve a tag into a play plan via the provider and the speaker's favorites.
+
+    Returns None if the content no longer exists in the catalog.
+    """
+    tag = parse_tag_data(tag_string)
+    provider = get_provider(tag["service"])
+    config = _load_config()
+    if tag["type"] == "playlist":
+        info = provider.get_playlist_info(tag["id"]) or {}
+        return build_playlist_plan(config["speaker_ip"], tag["id"], info.get("title", ""),
+                                   provider, config["sn"])
+    tracks = (provider.get_track(tag["id"]) if tag["type"] == "track"
+              else provider.get_album_tracks(tag["id"]))
+    return build_album_plan(config["speaker_ip"], tracks, provider, config["sn"])
+
+
+def _refresh_play_plan(tag_string):
+    """Rebuild and store the play plan for a tag. Keeps the old plan on network errors."""
+    try:
+        plan = _build_play_plan(tag_string)
+    except Exception as e:
+        log.warning("Play plan refresh failed for %s: %s", tag_string, e)
+        return
+    if plan:
+        _play_plans.put(tag_string, plan)
+    else:
+        _play_plans.discard(tag_string)
+
+
+def _refresh_play_plan_async(tag_string):
+    if _play_plans is None:
+        return
+    threading.Thread(target=_refresh_play_plan, args=(tag_string,), daemon=True).start()
+
+
+def _warm_tag(tag_string):
+    """Get one recorded tag ready to play: refresh provider metadata that is
+    missing or goes stale before the next warm pass, and build the play plan
+    if there is none for the current account. Returns True if it hit the network."""
+    if _is_offline():
+        return False
+    tag = parse_tag_data(tag_string)
+    fetched = get_provider(tag["service"]).refresh_metadata(
+        tag["type"], tag["id"], ahead_secs=_WARM_PASS_SECS)
+    config = _load_config()
+    if _play_plans is None or not config.get("sn") or not config.get("speaker_ip"):
+        return fetched
+    plan = _play_plans.get(tag_string)
+    if plan and str(plan.get("sn")) == str(config["sn"]):
+        return fetched
+    plan = _build_play_plan(tag_string)
+    if plan:
+        _play_plans.put(tag_string, plan)
+    return True
+
+
+def _start_collection_warmer():
+    """Warm every tag in data/tags.json in the background, rate limited."""
+    global _warmer
+    _warmer = CollectionWarmer(lambda: [t["tag_string"] for t in _load_tags()], _warm_tag)
+    _warmer.start()
+
+
+def _remember_play_plan(tag_string, plan):
+    if _play_plans is not None and plan:
+        _play_plans.put(tag_string, plan)
+
+
+def _play_from_plan(tag_string, config, config_path):
+    """Play a tag from its stored play plan, skipping provider and UDN lookups.
+
+    Returns False (without playing) if there is no usable plan for this tag.
+    A plan the speaker rejects (UPnP error for a stale UDN or URIs) is
+    discarded, so the caller falls back to provider lookups and stores a fresh
+    one. Any other failure (speaker unreachable or not found) is raised with
+    the plan kept, since a lookup would fail the same way. A plan older than
+    _PLAY_PLAN_REVALIDATE_SECS is rebuilt in the background after playback
+    has started.
+    """
+    if _play_plans is None:
+        return False
+    plan = _play_plans.get(tag_string)
+    if not plan or str(plan.get("sn")) != str(config["sn"]):
+        return False
+    try:
+        play_plan(config["speaker_ip"], plan,
+                  speaker_name=config.get("speaker_name"), config_path=config_path,
+                  stream=config.get("streaming_start", True))
+    except SoCoUPnPException as e:
+        log.warning("Stored play plan for %s rejected (%s), rebuilding", tag_string, e)
+        _play_plans.discard(tag_string)
+        return False
+    if time.time() - plan.get("built_at", 0) > _PLAY_PLAN_REVALIDATE_SECS and not _is_offline():
+        _refresh_play_plan_async(tag_string)
+    return True
+
+
+def _saved_speaker_ip(config, config_path):
+    """The speaker IP currently in config.json - a failed plan may have just
+    rediscovered the speaker and written a new one."""
+    try:
+        with open(config_path) as f:
+            return json.load(f).get("speaker_ip") or config["speaker_ip"]
+    except (OSError, ValueError):
+        return config["speaker_ip"]
+
+
+class _TagNotFound(Exception):
+    pass
+
+
+def _play_tag(tag_string, config, config_path):
+    """Play a tag and return the path used.
+
+    "plan": the stored play plan (no provider lookups); "lookup": provider
+    lookups; "offline": the same lookups answered from cached metadata only,
+    because the internet health monitor reports the network down. Raises
+    _TagNotFound if the content does not exist; failures count as "failed".
+    """
+    started = time.monotonic()
+    path = "failed"
+    try:
+        tag = parse_tag_data(tag_string)
+        if _play_from_plan(tag_string, config, config_path):
+            path = "plan"
+            return path
+        speaker_ip = _saved_speaker_ip(config, config_path)
+        lookup_path = "offline" if _is_offline() else "lookup"
+        provider = get_provider(tag["service"])
+        if tag["type"] == "playlist":
+            info = provider.get_playlist_info(tag["id"]) or {}
+            plan = play_playlist(speaker_ip, tag["id"], info.get("title", ""),
+                                 provider, config["sn"],
+                                 speaker_name=config.get("speaker_name"), config_path=config_path)
+        else:
+            tracks = (provider.get_track(tag["id"]) if tag["type"] == "track"
+                      else provider.get_album_tracks(tag["id"]))
+            if not tracks:
+                raise _TagNotFound(tag_string)
+            plan = play_album(speaker_ip, tracks, provider, config["sn"],
+                              speaker_name=config.get("speaker_name"), config_path=config_path,
+                              stream=config.get("streaming_start", True))
+        _remember_play_plan(tag_string, plan)
+        path = lookup_path
+        return path
+    finally:
+        _tap_stats.record(tag_string, path, time.monotonic() - started)
+
+
 def _fmt_bytes(n):
     for unit in ("B", "KB", "MB", "GB", "TB"):
         if n < 1024:
@@ -288,6 +605,20 @@ def _get_hardware_stats():
     # NFC reader
     stats["nfc_connected"] = _nfc is not None
 
+    # Sonos device pool / topology cache
+    stats["sonos_pool"] = pool_stats()
+    stats["sonos_topology"] = topology_stats()
+
+    # Provider lookup caches, internet health and tap paths
+    stats["provider_caches"] = get_provider("apple").cache_stats()
+    if _artwork is not None:
+        stats["provider_caches"]["artwork"] = _artwork.stats()
+    stats["provider_coalescing"] = get_provider("apple").coalesce_stats()
+    stats["internet"] = _health.stats() if _health is not None else None
+    stats["http_hosts"] = http_transport.stats()
+    stats["taps"] = _tap_stats.stats()
+    stats["collection_warmer"] = _warmer.stats() if _warmer is not None else None
+
     # Power throttling (Raspberry Pi only — vcgencmd)
     try:
         result = subprocess.run(
@@ -427,25 +758,22 @@ def _nfc_loop(config_path):
             continue  # same card still present - ignore
 
         _nfc_last_tag = tag_data
+        _announce_tap(tag_data)
         try:
-            tag = parse_tag_data(tag_data)
-            provider = get_provider(tag["service"])
-            config = _load_config()
-            if tag["type"] == "playlist":
-                info = provider.get_playlist_info(tag["id"]) or {}
-                play_playlist(config["speaker_ip"], tag["id"], info.get("title", ""),
-                              provider, config["sn"],
-                              speaker_name=config.get("speaker_name"), config_path=config_path)
-            else:
-                tracks = (provider.get_track(tag["id"]) if tag["type"] == "track"
-                          else provider.get_album_tracks(tag["id"]))
-                play_album(config["speaker_ip"], tracks, provider, config["sn"],
-                           speaker_name=config.get("speaker_name"), config_path=config_path)
-            log.info(f"Playing {tag['type']} {tag['id']}")
+            path = _play_tag(tag_data, _load_config(), config_path)
+            log.info(f"Playing {tag_data} ({path})")
+        except _TagNotFound:
+            log.error(f"NFC play error: {tag_data} not found")
         except Exception as e:
             log.error(f"NFC play error: {e}")
 
 
+def _announce_tap(tag_string):
+    """Tell /events clients a card was tapped and refresh now-playing soon after."""
+    _events.publish("tap", {"tag": tag_string}, remember=False)
+    _now_playing_dirty.set()
+
+
 def _start_nfc_thread(config_path):
     """Initialise the shared NFC device and start the background polling thread.
 
@@ -558,8 +886,10 @@ def playlist_page(playlist_id):
     info = provider.get_playlist_info(playlist_id)
     if not info:
         abort(404)
-    tracks = provider.get_playlist_tracks(playlist_id)
-    return render_template("playlist.html", playlist_id=playlist_id, info=info, tracks=tracks, show_now_playing=True)
+    # Streamed: the header and first page of tracks paint while later pages load.
+    tracks = provider.iter_playlist_tracks(playlist_id)
+    return Response(stream_template("playlist.html", playlist_id=playlist_id, info=info,
+                                    tracks=tracks, show_now_playing=True))
 
 
 @app.route("/track/<int:track_id>")
@@ -579,9 +909,9 @@ def print_inserts():
     if not album_ids:
         abort(400)
     albums = []
-    provider = get_provider("apple")
+    album_tracks = get_provider("apple").get_albums_tracks(album_ids)
     for album_id in album_ids:
-        tracks = provider.get_album_tracks(album_id)
+        tracks = album_tracks.get(album_id)
         if tracks:
             albums.append({
                 "album_id": album_id,
@@ -649,6 +979,7 @@ def write_tag():
         _do_record_tag(tag_data, data)
     except Exception:
         pass
+    _refresh_play_plan_async(tag_data)
     return jsonify({"status": "ok", "written": tag_data})
 
 
@@ -706,7 +1037,8 @@ def play():
         if not tracks:
             return jsonify({"error": "not found"}), 404
         play_album(config["speaker_ip"], tracks, provider, config["sn"],
-                   speaker_name=config.get("speaker_name"), config_path=CONFIG_PATH)
+                   speaker_name=config.get("speaker_name"), config_path=CONFIG_PATH,
+                   stream=config.get("streaming_start", True))
     return jsonify({"status": "ok"})
 
 
@@ -724,16 +1056,24 @@ def settings_sonos():
         token = request.form.get("csrf_token", "")
         if not token or token != session.get("csrf_token"):
             abort(403)
+        old_ip = config["speaker_ip"]
         config["speaker_ip"] = request.form.get("speaker_ip", config["speaker_ip"])
         config["speaker_name"] = request.form.get("speaker_name", config.get("speaker_name", ""))
         config["sn"] = request.form.get("sn", config["sn"])
         with open(CONFIG_PATH, "w") as f:
             json.dump(config, f, indent=2)
         saved = True
+        if config["speaker_ip"] != old_ip:
+            if _speaker_identity is not None:
+                _speaker_identity.clear()
+                _refresh_speaker_identity_async()
+            if _sonos_events:
+                _start_sonos_events()
     if "csrf_token" not in session:
         session["csrf_token"] = secrets.token_hex(32)
+    identity = _speaker_identity.snapshot() if _speaker_identity is not None else {}
     return render_template("settings_sonos.html", config=config, saved=saved,
-                           csrf_token=session["csrf_token"])
+                           identity=identity, csrf_token=session["csrf_token"])
 
 
 @app.route("/settings/music")
@@ -825,7 +1165,7 @@ def sonos_callback():
         # Get household ID from the local speaker via UPnP (Control API /households
         # requires commercial approval; local UPnP is always available).
         speaker_ip = config.get("speaker_ip", "")
-        household_id = _get_household_id_upnp(speaker_ip) if speaker_ip else ""
+        household_id = _get_household_id(speaker_ip) if speaker_ip else ""
         if not household_id:
             return redirect(url_for("settings_music") + "?error=no_households")
 
@@ -1160,21 +1500,36 @@ def detect_sn():
     speaker_ip = request.args.get("speaker_ip") or _load_config().get("speaker_ip", "")
     if not speaker_ip:
         return jsonify({"error": "no speaker configured"}), 400
+    # Detect is pressed when the account or sn has changed, so it always
+    # probes; the result refreshes the identity store the tap path reads.
     sn = get_provider("apple").detect_sn(soco.SoCo(speaker_ip))
     if sn is None:
         return jsonify({"error": "No Apple Music favorites found in Sonos - enter 3 or 5 manually"}), 404
+    if _speaker_identity is not None and speaker_ip == _configured_speaker_ip():
+        _speaker_identity.update(sn=sn)
     return jsonify({"sn": sn})
 
 
+def _configured_speaker_ip():
+    try:
+        return _load_config().get("speaker_ip", "")
+    except Exception:
+        return ""
+
+
 
 @app.route("/now-playing")
 def now_playing():
+    return jsonify(_now_playing_payload())
+
+
+def _now_playing_payload():
     config = _load_config()
     if not config.get("speaker_ip"):
-        return jsonify({"playing": False})
+        return {"playing": False}
     info = get_now_playing(config["speaker_ip"])
     if info is None:
-        return jsonify({"playing": False})
+        return {"playing": False}
     result = {
         "playing": True,
         "paused": info["paused"],
@@ -1187,14 +1542,61 @@ def now_playing():
     }
     if info["track_id"]:
         try:
-            tracks = get_provider("apple").get_track(info["track_id"])
-            if tracks:
-                result["album_id"] = tracks[0].get("album_id")
-                result["artwork_url"] = tracks[0].get("artwork_url")
+            album = get_provider("apple").get_track_album(info["track_id"])
+            if album:
+                result["album_id"] = album["album_id"]
+                result["artwork_url"] = album["artwork_url"]
         except Exception:
             pass  # transient network error - return what we have
     result["volume"] = get_volume(config["speaker_ip"])
-    return jsonify(result)
+    return result
+
+
+def _publish_now_playing():
+    """Push now-playing and volume to /events clients (the hub drops repeats)."""
+    payload = _now_playing_payload()
+    volume = payload.pop("volume", None)
+    _events.publish("now-playing", payload)
+    if volume is not None:
+        _events.publish("volume", {"volume": volume})
+
+
+def _now_playing_publisher_loop():
+    while True:
+        _now_playing_dirty.wait(timeout=_SSE_REFRESH_SECS)
+        _now_playing_dirty.clear()
+        if not _events.client_count():
+            continue
+        try:
+            _publish_now_playing()
+        except Exception as e:
+            log.warning("Now-playing publish failed: %s", e)
+
+
+def _configure_events():
+    add_now_playing_listener(_now_playing_dirty.set)
+    threading.Thread(target=_now_playing_publisher_loop, daemon=True).start()
+
+
+@app.route("/events")
+def events():
+    """Server-sent event stream: now-playing, volume and tap events."""
+    q = _events.subscribe()
+    _now_playing_dirty.set()
+
+    def stream():
+        try:
+            yield f"retry: {_SSE_RETRY_MS}\n\n"
+            while True:
+                try:
+                    yield q.get(timeout=_SSE_HEARTBEAT_SECS)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+        finally:
+            _events.unsubscribe(q)
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.route("/health")
@@ -1225,6 +1627,7 @@ def transport():
         set_volume(config["speaker_ip"], value, speaker_name=name, config_path=CONFIG_PATH)
     else:
         stop(config["speaker_ip"], speaker_name=name, config_path=CONFIG_PATH)
+    _now_playing_dirty.set()
     return jsonify({"status": "ok", "action": action})
 
 
@@ -1240,29 +1643,52 @@ def play_tag():
         return jsonify({"error": str(e)}), 400
     config = _load_config()
     try:
-        provider = get_provider(tag["service"])
+        get_provider(tag["service"])
     except KeyError as e:
         return jsonify({"error": str(e)}), 400
-    if tag["type"] == "playlist":
-        info = provider.get_playlist_info(tag["id"]) or {}
-        play_playlist(config["speaker_ip"], tag["id"], info.get("title", ""),
-                      provider, config["sn"],
-                      speaker_name=config.get("speaker_name"), config_path=CONFIG_PATH)
-    else:
-        if tag["type"] == "track":
-            tracks = provider.get_track(tag["id"])
-        else:
-            tracks = provider.get_album_tracks(tag["id"])
-        if not tracks:
-            return jsonify({"error": "not found"}), 404
-        play_album(config["speaker_ip"], tracks, provider, config["sn"],
-                   speaker_name=config.get("speaker_name"), config_path=CONFIG_PATH)
-    return jsonify({"status": "ok"})
+    _announce_tap(tag_string)
+    try:
+        path = _play_tag(tag_string, config, CONFIG_PATH)
+    except _TagNotFound:
+        return jsonify({"error": "not found"}), 404
+    return jsonify({"status": "ok", "path": path})
+
+
+def _tag_unavailable(tag):
+    """True if the provider's last lookup for a collection tag found nothing."""
+    try:
+        parsed = parse_tag_data(tag["tag_string"])
+        return get_provider(parsed["service"]).is_unavailable(parsed["type"], parsed["id"])
+    except (KeyError, ValueError):
+        return False
 
 
 @app.route("/collection")
 def collection():
-    return render_template("collection.html", tags=_load_tags())
+    tags = [dict(t, artwork_url=proxy_url(t.get("artwork_url"), size=300),
+                 unavailable=_tag_unavailable(t))
+            for t in _load_tags()]
+    return render_template("collection.html", tags=tags)
+
+
+@app.route("/artwork/<path:key>")
+def artwork(key):
+    """Serve provider artwork from the local disk cache (see providers.artwork)."""
+    size = request.args.get("size", type=int)
+    if size is not None and size not in ARTWORK_SIZES:
+        abort(400)
+    url = upstream_url(key, size)
+    if url is None:
+        abort(404)
+    if _artwork is None:
+        return redirect(url)
+    try:
+        path, etag = _artwork.path_for(url)
+    except Exception as e:
+        log.warning("Artwork fetch failed for %s: %s", url, e)
+        return redirect(url)
+    return send_file(path, mimetype=mimetypes.guess_type(url)[0] or "image/jpeg",
+                     etag=etag, max_age=_ARTWORK_MAX_AGE, conditional=True)
 
 
 @app.route("/collection/delete", methods=["POST"])
@@ -1273,12 +1699,16 @@ def collection_delete():
         return jsonify({"error": "tag_string required"}), 400
     tags = [t for t in _load_tags() if t["tag_string"] != tag_string]
     _save_tags(tags)
+    if _play_plans is not None:
+        _play_plans.discard(tag_string)
     return jsonify({"status": "ok"})
 
 
 @app.route("/collection/clear", methods=["POST"])
 def collection_clear():
     _save_tags([])
+    if _play_plans is not None:
+        _play_plans.clear()
     return jsonify({"status": "ok"})
 
 
@@ -1356,9 +1786,18 @@ if __name__ == "__main__":  # pragma: no cover
     ssl_context = None
     if args.ssl_cert and args.ssl_key:
         ssl_context = (args.ssl_cert, args.ssl_key)
+    install_keepalive_sessions()
     _configure_sonos()
     _configure_smapi()
+    _start_token_refresher()
+    _configure_play_plans()
+    _configure_metadata_cache()
+    _configure_artwork_cache()
+    _configure_speaker_identity()
+    _configure_sonos_events()
+    _configure_events()
     _start_nfc_thread(CONFIG_PATH)
+    _start_collection_warmer()
     threading.Thread(target=_auto_update_loop, daemon=True).start()
     # Suppress werkzeug "development server" warning — this is a single-user
     # Pi appliance, not a multi-tenant web service.
@@ -0,0 +1,101 @@
+"""Background warmer that gets every recorded card ready for its first tap.
+
+After a restart (or once cached metadata ages out) the first tap of a card
+pays for iTunes/SMAPI lookups and a favorites Browse before anything plays.
+CollectionWarmer walks the tag collection in passes and calls warm_tag() for
+each tag string, which fills the provider metadata cache and play plan when
+they are missing or close to expiry. Tags that needed network work are spaced
+at least min_interval seconds apart so a large collection never floods
+Apple's endpoints or the speaker.
+"""
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+MIN_INTERVAL_SECS = 3.0     # between tags that made network requests
+PASS_INTERVAL_SECS = 1800   # between passes over the collection
+START_DELAY_SECS = 30       # let startup (speaker identity, events) settle first
+
+
+class CollectionWarmer:
+    """Runs warm_tag(tag_string) for every tag from load_tags(), pass after pass.
+
+    warm_tag returns True if it made network requests (which counts against the
+    rate limit) and raises on failure; a failing tag is retried next pass.
+    """
+
+    def __init__(self, load_tags, warm_tag, min_interval=MIN_INTERVAL_SECS,
+                 pass_interval=PASS_INTERVAL_SECS, start_delay=START_DELAY_SECS):
+        self._load_tags = load_tags
+        self._warm_tag = warm_tag
+        self._min_interval = min_interval
+        self._pass_interval = pass_interval
+        self._start_delay = start_delay
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._progress = {"running": False, "total": 0, "done": 0, "warmed": 0,
+                          "failed": 0, "passes": 0, "last_pass_at": None}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        if self._stop.wait(self._start_delay):
+            return
+        while not self._stop.is_set():
+            try:
+                self.run_pass()
+            except Exception as e:
+                log.warning("Collection warm pass failed: %s", e)
+            self._stop.wait(self._pass_interval)
+
+    def run_pass(self):
+        """Warm every tag once. Returns early if stop() is called."""
+        tags = list(dict.fromkeys(self._load_tags()))
+        with self._lock:
+            self._progress.update(running=True, total=len(tags), done=0, warmed=0, failed=0)
+        last_fetch = None
+        try:
+            for tag_string in tags:
+                if last_fetch is not None:
+                    wait = self._min_interval - (time.monotonic() - last_fetch)
+                    if wait > 0 and self._stop.wait(wait):
+                        return
+                if self._stop.is_set():
+                    return
+                try:
+                    fetched = self._warm_tag(tag_string)
+                    failed = False
+                except Exception as e:
+                    log.debug("Warming %s failed: %s", tag_string, e)
+                    fetched = failed = True
+                if fetched:
+                    last_fetch = time.monotonic()
+                with self._lock:
+                    self._progress["done"] += 1
+                    if failed:
+                        self._progress["failed"] += 1
+                    elif fetched:
+                        self._progress["warmed"] += 1
+        finally:
+            with self._lock:
+                self._progress["running"] = False
+                self._progress["passes"] += 1
+                self._progress["last_pass_at"] = time.time()
+        stats = self.stats()
+        log.info("Collection warm pass: %d tags, %d warmed, %d failed",
+                 stats["total"], stats["warmed"], stats["failed"])
+
+    def stats(self):
+        with self._lock:
+            return dict(self._progress)
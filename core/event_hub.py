@@ -0,0 +1,80 @@
+"""Fan-out of server-sent events to every connected browser.
+
+One producer (the now-playing publisher thread, NFC taps) calls publish();
+each /events connection owns a small queue obtained from subscribe(). The
+last payload of each event type is remembered so a newly connected or
+reconnecting client gets the current state immediately.
+"""
+import itertools
+import json
+import queue
+import threading
+
+_CLIENT_QUEUE_SIZE = 32
+
+
+class EventHub:
+    """Thread-safe publish/subscribe hub for SSE messages."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = set()
+        self._latest = {}  # event name -> (JSON data, formatted message)
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        """Register a client. Returns its queue, pre-filled with the latest state."""
+        q = queue.Queue(maxsize=_CLIENT_QUEUE_SIZE)
+        with self._lock:
+            for _, message in self._latest.values():
+                q.put_nowait(message)
+            self._clients.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._clients.discard(q)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def publish(self, event, data, remember=True):
+        """Send data (JSON-serialisable) as an SSE message named event.
+
+        Remembered events are only sent when data differs from the last
+        payload of that event, so a periodic publisher costs clients nothing
+        while state is unchanged. remember=False is for one-off notifications
+        (e.g. a tap) that are always sent and never replayed to late joiners.
+        Returns True if the message was sent.
+        """
+        encoded = json.dumps(data, sort_keys=True)
+        with self._lock:
+            if remember and self._latest.get(event, (None,))[0] == encoded:
+                return False
+            message = format_sse(event, encoded, next(self._ids))
+            if remember:
+                self._latest[event] = (encoded, message)
+            clients = list(self._clients)
+        for q in clients:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # A stalled client: drop its oldest message rather than block
+                # the publisher or grow without bound.
+                try:
+                    q.get_nowait()
+                    q.put_nowait(message)
+                except (queue.Empty, queue.Full):
+                    pass
+        return True
+
+
+def format_sse(event, encoded_data, event_id=None):
+    """Format one SSE message. encoded_data is a single-line JSON string."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {encoded_data}")
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,133 @@
+"""Internet health monitor and tap path counters for offline playback.
+
+When itunes.apple.com or the SMAPI endpoint is unreachable, every metadata
+lookup costs a full timeout before failing. HealthMonitor counts consecutive
+network failures reported by lookups; after failure_threshold of them it
+switches to offline mode, in which callers serve cached metadata without
+trying the network. While offline a background probe checks reachability every
+probe_interval seconds and switches back on the first success. Any successful
+lookup also ends offline mode.
+
+TapStats records which path each tap took ("plan", "lookup", "offline",
+"failed") and how long it took, for the hardware settings page.
+"""
+import logging
+import threading
+import time
+import urllib.error
+
+log = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = 3
+PROBE_INTERVAL_SECS = 30
+
+
+def is_network_error(exc):
+    """True if exc means the remote host could not be reached (not an HTTP or
+    SOAP error reply, which proves the network works)."""
+    if isinstance(exc, urllib.error.HTTPError):
+        return False
+    return isinstance(exc, (OSError, TimeoutError))
+
+
+class HealthMonitor:
+    """Thread-safe online/offline state fed by lookup outcomes and a probe."""
+
+    def __init__(self, probe, failure_threshold=FAILURE_THRESHOLD,
+                 probe_interval=PROBE_INTERVAL_SECS):
+        self._probe = probe
+        self._failure_threshold = failure_threshold
+        self._probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._offline = False
+        self._failures = 0
+        self._changed_at = None
+        self._transitions = 0
+        self._probe_thread = None
+        self._online = threading.Event()  # set when leaving offline mode, wakes the probe
+
+    @property
+    def offline(self):
+        with self._lock:
+            return self._offline
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if not self._offline:
+                return
+            self._set_offline(False)
+        log.info("Internet reachable again, leaving offline mode")
+
+    def record_failure(self, exc):
+        """Count exc if it is a network error. Returns True if now offline."""
+        if not is_network_error(exc):
+            return self.offline
+        with self._lock:
+            self._failures += 1
+            if self._offline or self._failures < self._failure_threshold:
+                return self._offline
+            self._set_offline(True)
+            start_probe = self._probe_thread is None or not self._probe_thread.is_alive()
+            if start_probe:
+                self._probe_thread = threading.Thread(target=self._probe_loop, daemon=True)
+        log.warning("%d consecutive network failures (%s), switching to offline mode",
+                    self._failure_threshold, exc)
+        if start_probe:
+            self._probe_thread.start()
+        return True
+
+    def _set_offline(self, offline):
+        # Caller holds self._lock.
+        self._offline = offline
+        self._changed_at = time.time()
+        self._transitions += 1
+        if offline:
+            self._online.clear()
+        else:
+            self._online.set()
+
+    def _probe_loop(self):
+        while not self._online.wait(self._probe_interval):
+            try:
+                self._probe()
+            except Exception as e:
+                log.debug("Offline probe failed: %s", e)
+                continue
+            self.record_success()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "offline": self._offline,
+                "consecutive_failures": self._failures,
+                "changed_at": self._changed_at,
+                "transitions": self._transitions,
+            }
+
+
+class TapStats:
+    """Per-path tap counts and latencies."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = {}  # path -> {"count", "total_ms", "last_ms"}
+        self._last = None
+
+    def record(self, tag_string, path, secs):
+        ms = secs * 1000
+        with self._lock:
+            entry = self._paths.setdefault(path, {"count": 0, "total_ms": 0.0, "last_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["last_ms"] = ms
+            self._last = {"tag": tag_string, "path": path, "ms": round(ms), "at": time.time()}
+
+    def stats(self):
+        with self._lock:
+            paths = {
+                path: {"count": e["count"], "avg_ms": round(e["total_ms"] / e["count"]),
+                       "last_ms": round(e["last_ms"])}
+                for path, e in self._paths.items()
+            }
+            return {"paths": paths, "last": dict(self._last) if self._last else None}
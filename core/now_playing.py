@@ -0,0 +1,167 @@
+"""Event-driven now-playing snapshot for the configured speaker.
+
+get_now_playing() costs two SOAP calls (transport info + track info) and
+get_volume() a third, repeated by every open browser tab. NowPlayingMonitor
+subscribes to AVTransport on the group coordinator and RenderingControl on
+the speaker itself, and folds each event into an in-memory snapshot that can
+be read without touching the network.
+
+The snapshot is only trusted while both subscriptions are alive and the
+transport subscription is on the speaker's current coordinator; callers fall
+back to polling otherwise (see core.sonos_player.get_now_playing), and move
+the subscription after a regroup.
+"""
+import logging
+import re
+import threading
+
+log = logging.getLogger(__name__)
+
+_PLAYING_STATES = ("PLAYING", "PAUSED_PLAYBACK", "TRANSITIONING")
+
+
+def track_id_from_uri(uri):
+    """Return the Apple Music track ID in a Sonos track URI, or None."""
+    m = re.search(r"song(?:%3[aA]|:)(\d+)(?:\.mp4)?", uri or "")
+    if m and "sid=204" in uri:
+        return int(m.group(1))
+    return None
+
+
+def now_playing_info(state, title, artist, album, uri):
+    """Build the get_now_playing() result, or None if nothing is playing."""
+    if state not in _PLAYING_STATES or not title:
+        return None
+    return {
+        "title": title,
+        "artist": artist or "",
+        "album": album or "",
+        "track_id": track_id_from_uri(uri),
+        "paused": state == "PAUSED_PLAYBACK",
+    }
+
+
+class NowPlayingMonitor:
+    """Keeps transport state, current track and volume current from UPnP events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._speaker_ip = None
+        self._coordinator_uid = None  # whose AVTransport "transport" listens to
+        self._subs = {}  # "transport" / "volume" -> soco Subscription
+        self._state = {}
+        self._listeners = []
+
+    def start(self, speaker_ip, speaker, coordinator):
+        """Subscribe to coordinator transport and speaker volume events.
+
+        Replaces any previous subscriptions. On failure the monitor stays
+        stopped and callers keep polling.
+        """
+        self.stop()
+        subs = {}
+        try:
+            subs["transport"] = coordinator.avTransport.subscribe(auto_renew=True)
+            subs["volume"] = speaker.renderingControl.subscribe(auto_renew=True)
+        except Exception as e:
+            log.warning("Now-playing subscription failed, polling instead: %s", e)
+            for sub in subs.values():
+                _unsubscribe(sub)
+            return False
+        with self._lock:
+            self._speaker_ip = speaker_ip
+            self._coordinator_uid = coordinator.uid
+            self._subs = subs
+            self._state = {}
+        for name, sub in subs.items():
+            sub.auto_renew_fail = self._on_renew_fail
+            _set_callback(sub, getattr(self, f"_on_{name}_event"))
+        return True
+
+    def stop(self):
+        with self._lock:
+            subs, self._subs = self._subs, {}
+            self._speaker_ip = self._coordinator_uid = None
+            self._state = {}
+        for sub in subs.values():
+            _unsubscribe(sub)
+
+    def serves(self, speaker_ip, coordinator_uid=None):
+        """True if events for speaker_ip are live and the snapshot is complete
+        (and, if coordinator_uid is given, come from that coordinator)."""
+        with self._lock:
+            return (
+                speaker_ip == self._speaker_ip
+                and coordinator_uid in (None, self._coordinator_uid)
+                and len(self._subs) == 2
+                and all(sub.time_left for sub in self._subs.values())
+                and "transport_state" in self._state
+                and "volume" in self._state
+            )
+
+    def now_playing(self):
+        with self._lock:
+            s = dict(self._state)
+        return now_playing_info(s.get("transport_state"), s.get("title"),
+                                s.get("artist"), s.get("album"), s.get("uri"))
+
+    def volume(self):
+        with self._lock:
+            return self._state.get("volume")
+
+    def add_listener(self, callback):
+        """Call callback() (no arguments) after every event that changed the snapshot."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _update(self, changes):
+        with self._lock:
+            changed = any(self._state.get(k) != v for k, v in changes.items())
+            self._state.update(changes)
+            listeners = list(self._listeners) if changed else []
+        for callback in listeners:
+            try:
+                callback()
+            except Exception as e:
+                log.warning("Now-playing listener failed: %s", e)
+
+    def _on_transport_event(self, event):
+        variables = event.variables
+        changes = {}
+        if "transport_state" in variables:
+            changes["transport_state"] = variables["transport_state"]
+        if "current_track_uri" in variables:
+            changes["uri"] = variables["current_track_uri"]
+        if "current_track_meta_data" in variables:
+            meta = variables["current_track_meta_data"]
+            changes["title"] = getattr(meta, "title", "") or ""
+            changes["artist"] = getattr(meta, "creator", "") or ""
+            changes["album"] = getattr(meta, "album", "") or ""
+        self._update(changes)
+
+    def _on_volume_event(self, event):
+        volume = event.variables.get("volume")
+        if isinstance(volume, dict) and "Master" in volume:
+            try:
+                self._update({"volume": int(volume["Master"])})
+            except ValueError:
+                pass
+
+    def _on_renew_fail(self, exception):
+        log.warning("Now-playing subscription lost, polling instead: %s", exception)
+        self.stop()
+
+
+def _set_callback(sub, callback):
+    """Attach callback, then replay any events (normally the initial full-state
+    event) that SoCo queued on sub.events before it was set."""
+    sub.callback = callback
+    while not sub.events.empty():
+        callback(sub.events.get_nowait())
+
+
+def _unsubscribe(sub):
+    try:
+        sub.unsubscribe()
+    except Exception as e:
+        log.debug("Now-playing unsubscribe failed: %s", e)
@@ -0,0 +1,73 @@
+"""Persistent play plans keyed by tag string.
+
+A play plan is the final Sonos queue for a tag - track URIs, DIDL metadata
+and the account UDN they were built with - so a tap on a known card can go
+straight to AddURIToQueue without a provider lookup or a favorites Browse.
+
+Plan format:
+  {"sn": "3", "udn": "SA_RINCON52231_...", "built_at": 1700000000.0,
+   "items": [{"uri": "x-sonos-http:...", "metadata": "<DIDL-Lite ...>"}, ...]}
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class PlayPlanStore:
+    """JSON-file backed map of tag_string -> play plan.
+
+    The whole file is loaded once and kept in memory; every change is written
+    back atomically so a power cut never leaves a half-written file behind.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._plans = self._load()
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return {}
+        try:
+            with open(self._path) as f:
+                plans = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning("Ignoring unreadable play plan file %s: %s", self._path, e)
+            return {}
+        return plans if isinstance(plans, dict) else {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._plans, f)
+        os.replace(tmp_path, self._path)
+
+    def get(self, tag_string):
+        with self._lock:
+            return self._plans.get(tag_string)
+
+    def put(self, tag_string, plan):
+        plan = dict(plan)
+        plan.setdefault("built_at", time.time())
+        with self._lock:
+            self._plans[tag_string] = plan
+            self._save()
+
+    def discard(self, tag_string):
+        with self._lock:
+            if self._plans.pop(tag_string, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._plans = {}
+            self._save()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._plans)
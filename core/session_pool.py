@@ -0,0 +1,94 @@
+"""Keep-alive HTTP sessions for SoCo's UPnP calls, one per speaker.
+
+SoCo sends every UPnP action with a bare requests.post(), so each pause,
+volume change or now-playing poll opens a new TCP connection to the speaker.
+SessionPool keeps one requests.Session per speaker IP; install() routes
+soco.services' HTTP calls through those sessions so the connection to the
+speaker stays open between calls.
+
+SoCo devices themselves are not pooled: soco.SoCo(ip) already returns the
+same instance for an IP. A session is closed with reset() when a call fails
+or the speaker is rediscovered at a new IP, so the next call opens a fresh
+connection - the SoCo instance is left as it is.
+"""
+import logging
+import threading
+import urllib.parse
+
+import requests
+import soco.services
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger(__name__)
+
+
+class _SessionRouter:
+    """Stands in for the requests module inside soco.services.
+
+    get/post go through the pool's per-host session; everything else
+    (exceptions, codes) is looked up on the real requests module.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def get(self, url, **kwargs):
+        return self._pool.session_for_url(url).get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._pool.session_for_url(url).post(url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+
+class SessionPool:
+    """Thread-safe registry of keep-alive HTTP sessions keyed by speaker IP."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._hits = 0
+        self._misses = 0
+        self._resets = 0
+
+    def session(self, ip):
+        """Return the keep-alive session used for HTTP calls to ip."""
+        with self._lock:
+            sess = self._sessions.get(ip)
+            if sess is not None:
+                self._hits += 1
+                return sess
+            self._misses += 1
+            sess = requests.Session()
+            # A speaker only ever sees a handful of concurrent calls
+            # (poll, volume slider, queue worker).
+            sess.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            self._sessions[ip] = sess
+            return sess
+
+    def session_for_url(self, url):
+        return self.session(urllib.parse.urlsplit(url).hostname or "")
+
+    def reset(self, ip=None):
+        """Close the session for ip, or for every speaker if ip is None."""
+        with self._lock:
+            ips = list(self._sessions) if ip is None else [ip]
+            sessions = [s for s in (self._sessions.pop(key, None) for key in ips) if s is not None]
+            self._resets += len(sessions)
+        for sess in sessions:
+            sess.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "resets": self._resets,
+                "sessions": len(self._sessions),
+            }
+
+    def install(self):
+        """Route soco.services' HTTP calls through this pool's sessions."""
+        soco.services.requests = _SessionRouter(self)
+        log.info("SoCo UPnP calls now use pooled keep-alive sessions")
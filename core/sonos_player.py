@@ -1,6 +1,141 @@
 import json
-import re
+import logging
+import threading
+
 import soco
+from soco.exceptions import NotSupportedException, SoCoUPnPException
+
+from core.now_playing import NowPlayingMonitor, now_playing_info
+from core.session_pool import SessionPool
+from core.topology import TopologyCache
+
+log = logging.getLogger(__name__)
+
+# One keep-alive HTTP session per speaker IP. A session is reset whenever a
+# call to that IP fails, so retries open a fresh connection.
+_pool = SessionPool()
+
+# Group coordinator per speaker IP, kept current by ZoneGroupTopology events
+# once start_topology_events() has run, or re-resolved every minute otherwise.
+_topology = TopologyCache()
+
+# Event-fed now-playing snapshot; get_now_playing/get_volume read it instead
+# of polling once start_now_playing_events() has subscribed.
+_now_playing = NowPlayingMonitor()
+
+# Sonos accepts at most 16 URIs per AddMultipleURIsToQueue call.
+_BULK_ENQUEUE_CHUNK = 16
+
+# Coordinators that rejected AddMultipleURIsToQueue - go straight to the
+# per-track loop for these instead of failing the bulk call on every play.
+_bulk_unsupported = set()
+
+# Streaming start: the rest of an album is appended by a background worker
+# after playback has begun. _queue_lock serialises every queue mutation so a
+# new play can never interleave with a worker's AddMultipleURIsToQueue call;
+# _stream_cancel is set to stop the current worker before the next play.
+_queue_lock = threading.Lock()
+_stream_cancel = None  # type: threading.Event | None
+
+# Optional core.speaker_identity.SpeakerIdentityStore, set by configure_identity().
+# When present, account UDNs come from disk instead of a favorites Browse.
+_identity = None
+
+
+def configure_identity(store):
+    global _identity
+    _identity = store
+
+
+def _lookup_udn(coordinator, provider, sn):
+    """Return the account UDN for sn, from the identity store when possible.
+
+    Only real UDNs are stored; the bare SA_RINCON{type}_ fallback returned when
+    no favorite matched is looked up again next time.
+    """
+    if _identity is not None:
+        udn = _identity.get_udn(sn)
+        if udn:
+            return udn
+    udn = provider.lookup_udn(coordinator, sn)
+    if _identity is not None and udn != f"SA_RINCON{provider.sonos_service_type}_":
+        _identity.set_udn(sn, udn)
+    return udn
+
+
+def _forget_identity(sn):
+    """Drop the cached UDN after a failed Sonos call so the retry re-learns it."""
+    if _identity is not None:
+        _identity.forget_udn(sn)
+
+
+def refresh_identity(speaker_ip):
+    """Probe the speaker for household, model and coordinator UID and store them.
+
+    A household change clears everything previously learned (UDNs, sn).
+    Returns a copy of the stored identity, or None if no store is configured.
+    """
+    if _identity is None:
+        return None
+    speaker = soco.SoCo(speaker_ip)
+    _identity.observe_household(speaker.household_id)
+    _identity.update(
+        model=speaker.get_speaker_info().get("model_name", ""),
+        coordinator_uid=_coordinator(speaker_ip).uid,
+    )
+    return _identity.snapshot()
+
+
+def install_keepalive_sessions():
+    """Send SoCo's UPnP calls over the pool's per-speaker keep-alive sessions."""
+    _pool.install()
+
+
+def pool_stats():
+    return _pool.stats()
+
+
+def start_topology_events(speaker_ip):
+    """Subscribe to ZoneGroupTopology events so coordinator lookups stay in memory."""
+    _topology.subscribe(soco.SoCo(speaker_ip))
+
+
+def topology_stats():
+    return _topology.stats()
+
+
+def start_now_playing_events(speaker_ip):
+    """Subscribe to transport and volume events for speaker_ip. Returns True on success."""
+    return _now_playing.start(speaker_ip, soco.SoCo(speaker_ip), _coordinator(speaker_ip))
+
+
+def add_now_playing_listener(callback):
+    """Call callback() whenever a transport or volume event changes the snapshot."""
+    _now_playing.add_listener(callback)
+
+
+def _now_playing_live(speaker_ip):
+    """True if the event snapshot can answer for speaker_ip. After a regroup
+    the transport subscription is still on the old coordinator, so it is
+    moved to the new one and this call polls instead."""
+    if not _now_playing.serves(speaker_ip):
+        return False
+    coordinator = _coordinator(speaker_ip)
+    if _now_playing.serves(speaker_ip, coordinator.uid):
+        return True
+    log.info("Coordinator of %s changed, moving now-playing subscription", speaker_ip)
+    _now_playing.start(speaker_ip, soco.SoCo(speaker_ip), coordinator)
+    return False
+
+
+def _coordinator(speaker_ip):
+    return _topology.coordinator(speaker_ip, lambda: soco.SoCo(speaker_ip).group.coordinator)
+
+
+def _invalidate(speaker_ip):
+    """Forget everything cached for a speaker IP after a failed call."""
+    _pool.reset(speaker_ip)
+    _topology.invalidate(speaker_ip)
 
 
 def get_speakers():
@@ -20,6 +155,8 @@ def _rediscover_speaker(speaker_name, config_path):
         if d.player_name == speaker_name:
             with open(config_path) as f:
                 config = json.load(f)
+            if config.get("speaker_ip") != d.ip_address:
+                _invalidate(config.get("speaker_ip"))
             config["speaker_ip"] = d.ip_address
             with open(config_path, "w") as f:
                 json.dump(config, f, indent=2)
@@ -30,8 +167,11 @@ def _rediscover_speaker(speaker_name, config_path):
 def get_now_playing(speaker_ip):
     """Return info about the current track, or None if stopped.
 
-    Checks transport state first so paused tracks are still shown.
+    Checks transport state first so paused tracks are still shown. Answered
+    from the event snapshot when start_now_playing_events() is live.
     """
+    if _now_playing_live(speaker_ip):
+        return _now_playing.now_playing()
     try:
         speaker = soco.SoCo(speaker_ip)
         transport = speaker.get_current_transport_info()
@@ -39,82 +179,80 @@ def get_now_playing(speaker_ip):
         if state not in ("PLAYING", "PAUSED_PLAYBACK", "TRANSITIONING"):
             return None
         info = speaker.get_current_track_info()
-        if not info.get("title"):
-            return None
-        track_id = None
-        m = re.search(r"song(?:%3[aA]|:)(\d+)(?:\.mp4)?", info.get("uri", ""))
-        if m and "sid=204" in info.get("uri", ""):
-            track_id = int(m.group(1))
-        return {
-            "title": info["title"],
-            "artist": info.get("artist", ""),
-            "album": info.get("album", ""),
-            "track_id": track_id,
-            "paused": state == "PAUSED_PLAYBACK",
-        }
+        return now_playing_info(state, info.get("title"), info.get("artist"),
+                                info.get("album"), info.get("uri", ""))
     except Exception:
+        _invalidate(speaker_ip)
         return None
 
 
 def pause(speaker_ip, speaker_name=None, config_path=None):
     try:
-        soco.SoCo(speaker_ip).pause()
+        _coordinator(speaker_ip).pause()
     except Exception:
+        _invalidate(speaker_ip)
         if speaker_name and config_path:
             new_ip = _rediscover_speaker(speaker_name, config_path)
-            soco.SoCo(new_ip).pause()
+            _coordinator(new_ip).pause()
         else:
             raise
 
 
 def resume(speaker_ip, speaker_name=None, config_path=None):
     try:
-        soco.SoCo(speaker_ip).play()
+        _coordinator(speaker_ip).play()
     except Exception:
+        _invalidate(speaker_ip)
         if speaker_name and config_path:
             new_ip = _rediscover_speaker(speaker_name, config_path)
-            soco.SoCo(new_ip).play()
+            _coordinator(new_ip).play()
         else:
             raise
 
 
 def stop(speaker_ip, speaker_name=None, config_path=None):
     try:
-        soco.SoCo(speaker_ip).stop()
+        _coordinator(speaker_ip).stop()
     except Exception:
+        _invalidate(speaker_ip)
         if speaker_name and config_path:
             new_ip = _rediscover_speaker(speaker_name, config_path)
-            soco.SoCo(new_ip).stop()
+            _coordinator(new_ip).stop()
         else:
             raise
 
 
 def next_track(speaker_ip, speaker_name=None, config_path=None):
     try:
-        soco.SoCo(speaker_ip).next()
+        _coordinator(speaker_ip).next()
     except Exception:
+        _invalidate(speaker_ip)
         if speaker_name and config_path:
             new_ip = _rediscover_speaker(speaker_name, config_path)
-            soco.SoCo(new_ip).next()
+            _coordinator(new_ip).next()
         else:
             raise
 
 
 def prev_track(speaker_ip, speaker_name=None, config_path=None):
     try:
-        soco.SoCo(speaker_ip).previous()
+        _coordinator(speaker_ip).previous()
     except Exception:
+        _invalidate(speaker_ip)
         if speaker_name and config_path:
             new_ip = _rediscover_speaker(speaker_name, config_path)
-            soco.SoCo(new_ip).previous()
+            _coordinator(new_ip).previous()
         else:
             raise
 
 
 def get_volume(speaker_ip):
+    if _now_playing_live(speaker_ip):
+        return _now_playing.volume()
     try:
         return soco.SoCo(speaker_ip).volume
     except Exception:
+        _invalidate(speaker_ip)
         return None
 
 
@@ -122,6 +260,7 @@ def set_volume(speaker_ip, value, speaker_name=None, config_path=None):
     try:
         soco.SoCo(speaker_ip).volume = int(value)
     except Exception:
+        _invalidate(speaker_ip)
         if speaker_name and config_path:
             new_ip = _rediscover_speaker(speaker_name, config_path)
             soco.SoCo(new_ip).volume = int(value)
@@ -129,58 +268,194 @@ def set_volume(speaker_ip, value, speaker_name=None, config_path=None):
             raise
 
 
-def _do_play_album(speaker, track_dicts, provider, sn):
-    coordinator = speaker.group.coordinator
-    udn = provider.lookup_udn(coordinator, sn)
-    coordinator.clear_queue()
-    for track in track_dicts:
-        uri = provider.build_track_uri(track["track_id"], sn)
-        metadata = provider.build_track_didl(track, udn)
+def _album_queue_items(track_dicts, provider, sn, udn):
+    return [
+        {
+            "uri": provider.build_track_uri(track["track_id"], sn),
+            "metadata": provider.build_track_didl(track, udn),
+        }
+        for track in track_dicts
+    ]
+
+
+def _playlist_queue_items(playlist_id, title, provider, sn, udn):
+    return [{
+        "uri": provider.build_playlist_uri(playlist_id, sn),
+        "metadata": provider.build_playlist_didl(playlist_id, title, udn),
+    }]
+
+
+def _enqueue_one_by_one(coordinator, items):
+    for item in items:
         coordinator.avTransport.AddURIToQueue([
             ("InstanceID", 0),
-            ("EnqueuedURI", uri),
-            ("EnqueuedURIMetaData", metadata),
+            ("EnqueuedURI", item["uri"]),
+            ("EnqueuedURIMetaData", item["metadata"]),
             ("DesiredFirstTrackNumberEnqueued", 0),
             ("EnqueueAsNext", 0),
         ])
-    coordinator.play_from_queue(0)
 
 
-def _do_play_playlist(speaker, playlist_id, title, provider, sn):
-    coordinator = speaker.group.coordinator
-    udn = provider.lookup_udn(coordinator, sn)
-    uri = provider.build_playlist_uri(playlist_id, sn)
-    metadata = provider.build_playlist_didl(playlist_id, title, udn)
-    coordinator.clear_queue()
-    coordinator.avTransport.AddURIToQueue([
+def _enqueue_chunk(coordinator, chunk):
+    coordinator.avTransport.AddMultipleURIsToQueue([
         ("InstanceID", 0),
-        ("EnqueuedURI", uri),
-        ("EnqueuedURIMetaData", metadata),
+        ("UpdateID", 0),
+        ("NumberOfURIs", len(chunk)),
+        ("EnqueuedURIs", " ".join(item["uri"] for item in chunk)),
+        ("EnqueuedURIsMetaData", " ".join(item["metadata"] for item in chunk)),
+        ("ContainerURI", ""),
+        ("ContainerMetaData", ""),
         ("DesiredFirstTrackNumberEnqueued", 0),
         ("EnqueueAsNext", 0),
     ])
-    coordinator.play_from_queue(0)
+
+
+def _enqueue(coordinator, items):
+    """Append items to the coordinator's queue in as few SOAP calls as possible.
+
+    Uses AddMultipleURIsToQueue in chunks of _BULK_ENQUEUE_CHUNK. If the
+    speaker rejects the bulk action, the remaining items are added one at a
+    time with AddURIToQueue and the speaker is remembered so later plays skip
+    the bulk attempt. Network errors are not caught here - they propagate so
+    the caller's rediscovery logic can run.
+    """
+    if len(items) < 2 or coordinator.ip_address in _bulk_unsupported:
+        _enqueue_one_by_one(coordinator, items)
+        return
+    for start in range(0, len(items), _BULK_ENQUEUE_CHUNK):
+        chunk = items[start:start + _BULK_ENQUEUE_CHUNK]
+        try:
+            _enqueue_chunk(coordinator, chunk)
+        except (SoCoUPnPException, NotSupportedException) as e:
+            log.info("AddMultipleURIsToQueue rejected by %s (%s); enqueuing per track",
+                     coordinator.ip_address, e)
+            _bulk_unsupported.add(coordinator.ip_address)
+            _enqueue_one_by_one(coordinator, items[start:])
+            return
+
+
+def _cancel_streaming():
+    """Signal the background enqueue worker (if any) to stop at its next chunk."""
+    global _stream_cancel
+    if _stream_cancel is not None:
+        _stream_cancel.set()
+        _stream_cancel = None
+
+
+def _stream_remaining(coordinator, items, cancel):
+    """Worker: append items to the queue chunk by chunk until done or cancelled."""
+    for start in range(0, len(items), _BULK_ENQUEUE_CHUNK):
+        with _queue_lock:
+            if cancel.is_set():
+                return
+            try:
+                _enqueue(coordinator, items[start:start + _BULK_ENQUEUE_CHUNK])
+            except Exception as e:
+                log.warning("Background enqueue stopped after %d of %d items: %s",
+                            start, len(items), e)
+                return
+
+
+def _do_play_items(coordinator, items, stream=False):
+    """Replace the queue with items and start playback.
+
+    With stream=True only the first item is enqueued before play_from_queue;
+    the rest are appended in order by a background worker, so time-to-sound
+    no longer depends on album length. Any previous worker is cancelled first.
+    """
+    global _stream_cancel
+    _cancel_streaming()  # stop a running worker from taking the lock again
+    with _queue_lock:
+        # And again under the lock: a play that held it while this one waited
+        # may have started a worker of its own.
+        _cancel_streaming()
+        coordinator.clear_queue()
+        if stream and len(items) > 1:
+            _enqueue(coordinator, items[:1])
+            coordinator.play_from_queue(0)
+            cancel = threading.Event()
+            _stream_cancel = cancel
+            threading.Thread(
+                target=_stream_remaining, args=(coordinator, items[1:], cancel), daemon=True,
+            ).start()
+            return
+        _enqueue(coordinator, items)
+        coordinator.play_from_queue(0)
+
+
+def _do_play_album(coordinator, track_dicts, provider, sn, stream=False):
+    udn = _lookup_udn(coordinator, provider, sn)
+    items = _album_queue_items(track_dicts, provider, sn, udn)
+    _do_play_items(coordinator, items, stream=stream)
+    return {"sn": sn, "udn": udn, "items": items}
+
+
+def _do_play_playlist(coordinator, playlist_id, title, provider, sn):
+    udn = _lookup_udn(coordinator, provider, sn)
+    items = _playlist_queue_items(playlist_id, title, provider, sn, udn)
+    _do_play_items(coordinator, items)
+    return {"sn": sn, "udn": udn, "items": items}
 
 
 def play_playlist(speaker_ip, playlist_id, title, provider, sn, speaker_name=None, config_path=None):
+    """Queue and play a playlist container. Returns the play plan that was used."""
     try:
-        _do_play_playlist(soco.SoCo(speaker_ip), playlist_id, title, provider, sn)
+        return _do_play_playlist(_coordinator(speaker_ip), playlist_id, title, provider, sn)
     except Exception:
+        _invalidate(speaker_ip)
+        _forget_identity(sn)
         if speaker_name and config_path:
             new_ip = _rediscover_speaker(speaker_name, config_path)
-            _do_play_playlist(soco.SoCo(new_ip), playlist_id, title, provider, sn)
+            return _do_play_playlist(_coordinator(new_ip), playlist_id, title, provider, sn)
         else:
             raise
 
 
-def play_album(speaker_ip, track_dicts, provider, sn, speaker_name=None, config_path=None):
+def play_album(speaker_ip, track_dicts, provider, sn, speaker_name=None, config_path=None,
+               stream=False):
+    """Queue and play a list of tracks. Returns the play plan that was used.
+
+    stream=True starts playback after the first track is queued and appends
+    the rest in the background (see _do_play_items).
+    """
     if not track_dicts:
-        return
+        return None
     try:
-        _do_play_album(soco.SoCo(speaker_ip), track_dicts, provider, sn)
+        return _do_play_album(_coordinator(speaker_ip), track_dicts, provider, sn, stream=stream)
     except Exception:
+        _invalidate(speaker_ip)
+        _forget_identity(sn)
         if speaker_name and config_path:
             new_ip = _rediscover_speaker(speaker_name, config_path)
-            _do_play_album(soco.SoCo(new_ip), track_dicts, provider, sn)
+            return _do_play_album(_coordinator(new_ip), track_dicts, provider, sn, stream=stream)
         else:
             raise
+
+
+def play_plan(speaker_ip, plan, speaker_name=None, config_path=None, stream=False):
+    """Replay a stored play plan (see core.play_plans) without any provider or
+    favorites lookups - the URIs and DIDL metadata are enqueued as-is.
+    """
+    try:
+        _do_play_items(_coordinator(speaker_ip), plan["items"], stream=stream)
+    except Exception:
+        _invalidate(speaker_ip)
+        if speaker_name and config_path:
+            new_ip = _rediscover_speaker(speaker_name, config_path)
+            _do_play_items(_coordinator(new_ip), plan["items"], stream=stream)
+        else:
+            raise
+
+
+def build_album_plan(speaker_ip, track_dicts, provider, sn):
+    """Build the play plan for a list of tracks without touching the queue."""
+    if not track_dicts:
+        return None
+    udn = _lookup_udn(_coordinator(speaker_ip), provider, sn)
+    return {"sn": sn, "udn": udn, "items": _album_queue_items(track_dicts, provider, sn, udn)}
+
+
+def build_playlist_plan(speaker_ip, playlist_id, title, provider, sn):
+    """Build the play plan for a playlist container without touching the queue."""
+    udn = _lookup_udn(_coordinator(speaker_ip), provider, sn)
+    return {"sn": sn, "udn": udn, "items": _playlist_queue_items(playlist_id, title, provider, sn, udn)}
@@ -0,0 +1,101 @@
+"""Persistent cache of facts about the configured Sonos system.
+
+Household ID, speaker model, group coordinator UID, the detected Apple Music
+sn and the account UDN per sn all change rarely, but each costs a network
+probe (GetHouseholdID, a FV:2 favorites Browse, ZoneGroupTopology) to learn.
+They are kept in speaker_identity.json next to config.json, loaded at startup
+and only refreshed when a Sonos call fails or the household changes.
+
+File format:
+  {"household_id": "Sonos_...", "model": "Sonos One", "coordinator_uid": "RINCON_...",
+   "sn": "3", "udns": {"3": "SA_RINCON52231_X_#Svc52231-..."}}
+"""
+import json
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class SpeakerIdentityStore:
+    """JSON-file backed speaker identity. All methods are thread-safe."""
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return {}
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log.warning("Ignoring unreadable speaker identity file %s: %s", self._path, e)
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self):
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(tmp_path, self._path)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._data.get(key, default)
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._data))
+
+    def update(self, **fields):
+        """Set top-level fields (household_id, model, coordinator_uid, sn)."""
+        with self._lock:
+            changed = {k: v for k, v in fields.items() if self._data.get(k) != v}
+            if changed:
+                self._data.update(changed)
+                self._save()
+
+    def get_udn(self, sn):
+        with self._lock:
+            return self._data.get("udns", {}).get(str(sn))
+
+    def set_udn(self, sn, udn):
+        with self._lock:
+            udns = self._data.setdefault("udns", {})
+            if udns.get(str(sn)) != udn:
+                udns[str(sn)] = udn
+                self._save()
+
+    def forget_udn(self, sn):
+        with self._lock:
+            if self._data.get("udns", {}).pop(str(sn), None) is not None:
+                self._save()
+
+    def observe_household(self, household_id):
+        """Record the current household ID. If it differs from the stored one,
+        everything learned about the old household is dropped first.
+
+        Returns True if the household changed.
+        """
+        if not household_id:
+            return False
+        with self._lock:
+            previous = self._data.get("household_id")
+            if previous == household_id:
+                return False
+            if previous:
+                log.info("Sonos household changed (%s -> %s); clearing speaker identity",
+                         previous, household_id)
+                self._data = {}
+            self._data["household_id"] = household_id
+            self._save()
+            return bool(previous)
+
+    def clear(self):
+        with self._lock:
+            self._data = {}
+            self._save()
@@ -0,0 +1,114 @@
+"""In-memory group coordinator cache fed by ZoneGroupTopology events.
+
+speaker.group.coordinator costs a GetZoneGroupState call whose XML grows with
+every room in the household. TopologyCache remembers the coordinator per
+speaker IP. While a ZoneGroupTopology subscription is live, entries stay
+valid until the speaker reports a topology change. Without one (not started,
+or renewal failed), entries expire after a fixed refresh interval instead.
+"""
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+FALLBACK_REFRESH_SECS = 60
+
+
+class TopologyCache:
+    """Thread-safe map of speaker IP -> group coordinator."""
+
+    def __init__(self, refresh_secs=FALLBACK_REFRESH_SECS):
+        self._refresh_secs = refresh_secs
+        self._lock = threading.Lock()
+        self._entries = {}  # ip -> (coordinator, resolved_at monotonic)
+        self._subscription = None
+        self._hits = 0
+        self._misses = 0
+        self._events = 0
+
+    def coordinator(self, ip, resolve):
+        """Return the coordinator for ip, calling resolve() only on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is not None and (self._subscribed() or now - entry[1] < self._refresh_secs):
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+        coordinator = resolve()
+        with self._lock:
+            self._entries[ip] = (coordinator, now)
+        return coordinator
+
+    def invalidate(self, ip=None):
+        with self._lock:
+            if ip is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ip, None)
+
+    def _subscribed(self):
+        sub = self._subscription
+        return sub is not None and bool(sub.time_left)
+
+    def subscribe(self, speaker):
+        """Subscribe to ZoneGroupTopology events on speaker.
+
+        Replaces any previous subscription. On failure the cache keeps working
+        on the timed refresh alone.
+        """
+        self.unsubscribe()
+        try:
+            sub = speaker.zoneGroupTopology.subscribe(auto_renew=True)
+        except Exception as e:
+            log.warning("ZoneGroupTopology subscribe failed, using timed refresh: %s", e)
+            return
+        sub.auto_renew_fail = self._on_renew_fail
+        with self._lock:
+            self._subscription = sub
+            self._entries.clear()
+        sub.callback = self._on_event
+        # The initial event carries the full topology; SoCo queues it on
+        # sub.events if it arrived before the callback was attached.
+        while not sub.events.empty():
+            self._on_event(sub.events.get_nowait())
+
+    def unsubscribe(self):
+        with self._lock:
+            sub, self._subscription = self._subscription, None
+        if sub is not None:
+            try:
+                sub.unsubscribe()
+            except Exception as e:
+                log.debug("ZoneGroupTopology unsubscribe failed: %s", e)
+
+    def _on_event(self, event):
+        # With a live subscription SoCo stops polling GetZoneGroupState, and
+        # the threaded events module does not apply the payload itself.
+        zgs = event.variables.get("zone_group_state")
+        if zgs:
+            speaker = event.service.soco
+            try:
+                speaker.zone_group_state.process_payload(
+                    payload=zgs, source="event", source_ip=speaker.ip_address)
+            except Exception as e:
+                log.warning("Could not apply ZoneGroupTopology event: %s", e)
+        with self._lock:
+            self._events += 1
+            self._entries.clear()
+
+    def _on_renew_fail(self, exception):
+        log.warning("ZoneGroupTopology subscription lost, using timed refresh: %s", exception)
+        with self._lock:
+            self._subscription = None
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "events": self._events,
+                "subscribed": self._subscribed(),
+            }
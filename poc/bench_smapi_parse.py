@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Microbenchmark: whole-document vs streaming parse of SMAPI responses.
+
+Compares the old approach (ET.fromstring on the full body, walk every
+descendant, then iter() again per item) with providers.smapi_client._ItemParser
+fed 16 KB chunks, the way SmapiClient now reads search/getMetadata responses.
+
+Reports CPU time per parse and peak Python memory (tracemalloc) for each.
+By default it builds responses shaped like recorded Apple Music ones
+(a 50-result search, a 200-track getMetadata page, a 1000-track page); pass
+paths to recorded SOAP responses to measure those instead:
+
+  python3 poc/bench_smapi_parse.py [response.xml ...]
+
+Run from the repo root (on the Pi for the numbers that matter).
+"""
+import os
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from providers.smapi_client import _ItemParser  # noqa: E402
+
+CHUNK_SIZE = 16 * 1024
+REPEAT = 20
+
+ENVELOPE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"><s:Body>'
+    '<{action}Response xmlns="http://www.sonos.com/Services/1.1"><{action}Result>'
+    "<index>0</index><count>{count}</count><total>{count}</total>"
+    "{items}"
+    "</{action}Result></{action}Response></s:Body></s:Envelope>"
+)
+
+TRACK = (
+    "<mediaMetadata><id>song:{n}</id><itemType>track</itemType>"
+    "<title>Track number {n} (Remastered {n})</title><mimeType>audio/aac</mimeType>"
+    "<trackMetadata><artistId>artist:{n}</artistId><artist>Some Artist {n}</artist>"
+    "<albumId>album:{n}</albumId><album>Some Album Title {n}</album><duration>245</duration>"
+    "<albumArtURI>https://is1-ssl.mzstatic.com/image/thumb/Music/v4/ab/cd/{n}/600x600bb.jpg"
+    "</albumArtURI><canPlay>true</canPlay><canSkip>true</canSkip></trackMetadata>"
+    "</mediaMetadata>"
+)
+
+
+def synthetic(action, count):
+    items = "".join(TRACK.format(n=n) for n in range(count))
+    return ENVELOPE.format(action=action, count=count, items=items).encode("utf-8")
+
+
+def parse_whole(data):
+    """The pre-streaming parser: full tree, then a descendant walk per item."""
+    root = ET.fromstring(data)
+    items = []
+    for elem in root.iter():
+        tag = elem.tag.split("}")[-1] if "}" in elem.tag else elem.tag
+        if tag in ("mediaCollection", "mediaMetadata"):
+            item = {}
+            for child in elem.iter():
+                child_tag = child.tag.split("}")[-1] if "}" in child.tag else child.tag
+                if child.text is not None and child_tag in ("id", "title", "artist", "album",
+                                                            "albumArtURI", "itemType"):
+                    item[child_tag] = child.text
+            items.append(item)
+    return items
+
+
+def parse_streaming(data):
+    parser = _ItemParser()
+    items = []
+    for i in range(0, len(data), CHUNK_SIZE):
+        items.extend(parser.feed(data[i:i + CHUNK_SIZE]))
+    items.extend(parser.close())
+    return items
+
+
+def measure(fn, data):
+    start = time.process_time()
+    for _ in range(REPEAT):
+        count = len(fn(data))
+    cpu_ms = (time.process_time() - start) * 1000 / REPEAT
+    # The old parser needs the whole body in memory; the streaming one only
+    # ever sees a chunk, so the body itself is not counted for either.
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, cpu_ms, peak / 1024
+
+
+def main(paths):
+    if paths:
+        cases = [(os.path.basename(p), open(p, "rb").read()) for p in paths]
+    else:
+        cases = [
+            ("search, 50 results", synthetic("search", 50)),
+            ("getMetadata, 200 tracks", synthetic("getMetadata", 200)),
+            ("getMetadata, 1000 tracks", synthetic("getMetadata", 1000)),
+        ]
+    print(f"{'response':28} {'size':>8} {'parser':>10} {'items':>6} {'cpu ms':>8} {'peak KB':>8}")
+    for name, data in cases:
+        for label, fn in (("whole", parse_whole), ("streaming", parse_streaming)):
+            count, cpu_ms, peak_kb = measure(fn, data)
+            print(f"{name:28} {len(data) // 1024:>6}KB {label:>10} {count:>6} "
+                  f"{cpu_ms:>8.2f} {peak_kb:>8.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,22 +2,93 @@ import html
 import json
 import logging
 import re
+import threading
+import time
+import urllib.error
 import urllib.parse
-import urllib.request
 import xml.sax.saxutils as saxutils
-from typing import Callable, Dict, List, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from providers import transport
+from providers.artwork import proxy_url
 from providers.base import MusicProvider
+from providers.cache import SearchCache, SingleFlight, TTLCache, normalize_query
+from providers.playlist_catalog import PlaylistCatalog
+from providers.smapi_client import AuthTokenExpired, SmapiError
 
 log = logging.getLogger(__name__)
 
 APPLE_SMAPI_ENDPOINT = "https://sonos-music.apple.com/ws/SonosSoap"
 
+# track_id -> (album_id, artwork_url) for /now-playing. Catalog albums and
+# artwork practically never change; unknown IDs are retried after 10 min.
+_TRACK_ALBUM_CACHE_SIZE = 512
+_TRACK_ALBUM_TTL = 24 * 3600
+_TRACK_ALBUM_NEGATIVE_TTL = 600
+
+# get_albums_tracks: album IDs per iTunes multi-ID lookup, lookups in flight at
+# once, and the result limit per lookup (a chunk that reaches it may be
+# truncated, so its albums are re-fetched one by one).
+_ITUNES_BATCH_SIZE = 10
+_ITUNES_BATCH_WORKERS = 3
+_ITUNES_BATCH_LIMIT = 200
+
+# Search-as-you-type results per (type, normalized query). A search that
+# returned fewer rows than the backend's page size is complete, so longer
+# queries typed on top of it are filtered locally.
+_SEARCH_CACHE_SIZE = 256
+_SEARCH_TTL = 600
+_ITUNES_SEARCH_LIMIT = 50  # iTunes Search API default page size
+
+# Hedged search: if SMAPI has not answered within the hedge delay, iTunes is
+# queried too and the first good answer wins. None disables hedging (iTunes
+# only after SMAPI fails). Overridden by services.apple.search_hedge_ms.
+_SEARCH_HEDGE_DELAY = 0.8
+
+# Tag type -> metadata cache kind of the lookup that proves the content exists.
+_TAG_KINDS = {"album": "album", "track": "track", "playlist": "playlist_info"}
+
+# Background SMAPI token rotation: wait before the first check (a token of
+# unknown age is rotated then), and at most this long between checks or
+# after a failed refresh.
+_TOKEN_REFRESH_START_DELAY = 60
+_TOKEN_REFRESH_CHECK_SECS = 300
+
+# Playlist tracks per getMetadata page (pages after the first are fetched in parallel).
+_PLAYLIST_PAGE_SIZE = 200
+
+# One pool per search backend: SMAPI calls that lose a hedge keep their worker
+# until they time out, and must never leave the iTunes hedge queued behind them.
+_smapi_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search-smapi")
+_itunes_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="search-itunes")
+
 
 def _upgrade_artwork_url(url):
     return url.replace("100x100bb", "600x600bb")
 
 
+def _artwork_url(url):
+    """600x600 artwork, served through the local /artwork/ proxy."""
+    return proxy_url(_upgrade_artwork_url(url))
+
+
+def _itunes_lookup(url):
+    """Return the results of an iTunes lookup. An ID iTunes answers 404 for has
+    none, so it is cached as a negative result like an empty lookup."""
+    try:
+        return json.loads(transport.fetch(url))["results"]
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return []
+        raise
+
+
+def _is_item_not_found(exc):
+    """True if exc is a SMAPI fault saying the requested item does not exist."""
+    return isinstance(exc, SmapiError) and "ItemNotFound" in (exc.error_code or exc.fault_string)
+
+
 def _format_duration(ms):
     if not ms:
         return ""
@@ -25,6 +96,50 @@ def _format_duration(ms):
     return f"{s // 60}:{s % 60:02d}"
 
 
+def _album_tracks(results):
+    """Convert the iTunes lookup rows of one album into track dicts, sorted by
+    disc and track number."""
+    collection = next(
+        (r for r in results if r.get("wrapperType") == "collection"), None
+    )
+    release_year = collection.get("releaseDate", "")[:4] if collection else ""
+    copyright_line = collection.get("copyright", "") if collection else ""
+    tracks = [r for r in results if r.get("wrapperType") == "track"]
+    tracks.sort(key=lambda t: (t.get("discNumber", 1), t["trackNumber"]))
+    return [
+        {
+            "track_id": t["trackId"],
+            "name": t["trackName"],
+            "track_number": t["trackNumber"],
+            "artist": t["artistName"],
+            "album": t["collectionName"],
+            "album_id": t.get("collectionId"),
+            "artwork_url": _artwork_url(t.get("artworkUrl100", "")),
+            "duration": _format_duration(t.get("trackTimeMillis")),
+            "release_year": release_year,
+            "copyright": copyright_line,
+        }
+        for t in tracks
+    ]
+
+
+def _playlist_track(item):
+    """Convert a SMAPI playlist child into a track dict, or None if it is not a track."""
+    if item.get("item_type") != "track":
+        return None
+    raw_id = item.get("id", "")
+    for prefix in ("track:", "song:"):
+        if raw_id.startswith(prefix):
+            raw_id = raw_id[len(prefix):]
+            break
+    return {
+        "name": item.get("title", ""),
+        "artist": item.get("artist", ""),
+        "album": item.get("album", ""),
+        "track_id": int(raw_id) if raw_id.isdigit() else None,
+    }
+
+
 class AppleMusicProvider(MusicProvider):
     service_id = "apple"
     display_name = "Apple Music"
@@ -39,6 +154,19 @@ class AppleMusicProvider(MusicProvider):
         self._sonos_refresh_token = None  # type: Optional[str]
         self._sonos_household_id = None  # type: Optional[str]
         self._on_sonos_token_refresh = None  # type: Optional[Callable]
+        self._track_album_cache = TTLCache(
+            _TRACK_ALBUM_CACHE_SIZE, _TRACK_ALBUM_TTL, negative_ttl=_TRACK_ALBUM_NEGATIVE_TTL)
+        self._metadata_cache = None  # type: Optional[MetadataCache]
+        self._search_cache = SearchCache(_SEARCH_CACHE_SIZE, _SEARCH_TTL)
+        # A tap, an open album page and a /now-playing poll often ask for the
+        # same item at once; concurrent identical lookups share one request.
+        self._flights = SingleFlight()
+        self._hedge_delay = _SEARCH_HEDGE_DELAY  # type: Optional[float]
+        self._playlists = None  # type: Optional[PlaylistCatalog]
+        # Refreshed credentials are persisted in order, off the request path.
+        self._token_persist_pool = ThreadPoolExecutor(max_workers=1,
+                                                      thread_name_prefix="smapi-persist")
+        self._token_refresher = None  # type: Optional[threading.Thread]
 
     @property
     def smapi_available(self) -> bool:
@@ -79,6 +207,7 @@ class AppleMusicProvider(MusicProvider):
         key: str,
         household_id: str,
         on_token_refresh: Optional[Callable] = None,
+        token_issued_at: Optional[float] = None,
     ) -> None:
         """Configure SMAPI credentials for authenticated Apple Music access.
 
@@ -88,61 +217,202 @@ class AppleMusicProvider(MusicProvider):
             household_id: Full Sonos household ID with OADevID suffix
             on_token_refresh: Optional callback(new_token, new_key) called after
                               successful token refresh, to persist new credentials.
+            token_issued_at: When token was issued (epoch seconds), if known,
+                             so the background refresher can rotate it on time.
         """
         from providers.smapi_client import SmapiClient
-        self._smapi = SmapiClient(APPLE_SMAPI_ENDPOINT, token, key, household_id)
+        self._smapi = SmapiClient(APPLE_SMAPI_ENDPOINT, token, key, household_id,
+                                  token_issued_at=token_issued_at)
+        self._playlists = PlaylistCatalog(self._smapi)
         self._on_token_refresh = on_token_refresh
         log.info("Apple Music SMAPI configured (household=%s)", household_id[:20] + "...")
 
+    def configure_cache(self, cache) -> None:
+        """Route album, track and playlist lookups through a MetadataCache."""
+        self._metadata_cache = cache
+
+    def _coalesced(self, kind: str, key, loader: Callable) -> Callable:
+        # Tag IDs arrive as str from NFC tags and as int from the web UI;
+        # both must join the same flight.
+        return lambda: self._flights.do((kind, str(key)), loader)
+
+    def _cached(self, kind: str, key, loader: Callable):
+        loader = self._coalesced(kind, key, loader)
+        if self._metadata_cache is None:
+            return loader()
+        return self._metadata_cache.get(kind, f"{self.service_id}:{kind}:{key}", loader)
+
+    def refresh_metadata(self, tag_type: str, item_id, ahead_secs: float = 0) -> bool:
+        if self._metadata_cache is None:
+            return False
+        if tag_type == "album":
+            kind, loader = "album", lambda: self._fetch_album_tracks(item_id)
+        elif tag_type == "track":
+            kind, loader = "track", lambda: self._fetch_track(item_id)
+        elif tag_type == "playlist" and self._smapi:
+            kind, loader = "playlist_info", lambda: self._fetch_playlist_info(item_id)
+        else:
+            return False
+        key = f"{self.service_id}:{kind}:{item_id}"
+        remaining = self._metadata_cache.expires_in(kind, key)
+        if remaining is not None and remaining > ahead_secs:
+            return False
+        self._metadata_cache.load(kind, key, self._coalesced(kind, item_id, loader))
+        return True
+
+    def is_unavailable(self, tag_type: str, item_id) -> bool:
+        kind = _TAG_KINDS.get(tag_type)
+        if self._metadata_cache is None or kind is None:
+            return False
+        return self._metadata_cache.is_negative(f"{self.service_id}:{kind}:{item_id}")
+
+    def _peek_cached(self, kind: str, key):
+        if self._metadata_cache is None:
+            return None
+        return self._metadata_cache.peek(kind, f"{self.service_id}:{kind}:{key}")
+
     def _smapi_search(self, query: str, retry: bool = True):
         """Run SMAPI search with auto-refresh on AuthTokenExpired."""
-        from providers.smapi_client import AuthTokenExpired
+        token = self._smapi.token
         try:
             return self._smapi.search(query)
         except AuthTokenExpired:
             if not retry:
                 raise
             log.info("SMAPI token expired, refreshing...")
-            new_token, new_key = self._smapi.refresh_auth_token()
-            if self._on_token_refresh:
-                try:
-                    self._on_token_refresh(new_token, new_key)
-                except Exception as e:
-                    log.warning("Failed to persist refreshed token: %s", e)
+            self._smapi.note_token_expired(token)
+            self._refresh_smapi_token(token)
             return self._smapi_search(query, retry=False)
 
-    def search_albums(self, query: str) -> List[Dict]:
-        if self._smapi:
+    def _refresh_smapi_token(self, stale_token: str) -> None:
+        """Rotate the SMAPI token (single-flight, see SmapiClient.refresh_if_current)
+        and hand the new credentials to on_token_refresh in the background."""
+        refreshed = self._smapi.refresh_if_current(stale_token)
+        if refreshed and self._on_token_refresh:
+            self._token_persist_pool.submit(self._persist_token, *refreshed)
+
+    def _persist_token(self, new_token: str, new_key: str) -> None:
+        try:
+            self._on_token_refresh(new_token, new_key)
+        except Exception as e:
+            log.warning("Failed to persist refreshed token: %s", e)
+
+    def start_token_refresher(self) -> None:
+        """Rotate the SMAPI token in a daemon thread shortly before it expires,
+        so searches do not pay for an expired-token round trip."""
+        if self._token_refresher is not None and self._token_refresher.is_alive():
+            return
+        self._token_refresher = threading.Thread(target=self._token_refresh_loop,
+                                                 name="smapi-token", daemon=True)
+        self._token_refresher.start()
+
+    def _token_refresh_loop(self) -> None:
+        time.sleep(_TOKEN_REFRESH_START_DELAY)
+        while True:
+            smapi = self._smapi
+            due_in = smapi.refresh_due_in() if smapi is not None else None
+            if due_in is None or due_in > 0:
+                time.sleep(min(due_in or _TOKEN_REFRESH_CHECK_SECS, _TOKEN_REFRESH_CHECK_SECS))
+                continue
             try:
-                return self._smapi_search_albums(query)
+                self._refresh_smapi_token(smapi.token)
             except Exception as e:
-                log.warning("SMAPI album search failed, falling back to iTunes: %s", e)
-        return self._itunes_search_albums(query)
+                log.warning("Background SMAPI token refresh failed: %s", e)
+                time.sleep(_TOKEN_REFRESH_CHECK_SECS)
+
+    def search_albums(self, query: str) -> List[Dict]:
+        return self._search_cache.get_or_search("album", query, self._coalesced_search(
+            "album", self._search_albums))
 
     def search_songs(self, query: str) -> List[Dict]:
-        if self._smapi:
-            try:
-                return self._smapi_search_songs(query)
-            except Exception as e:
-                log.warning("SMAPI song search failed, falling back to iTunes: %s", e)
-        return self._itunes_search_songs(query)
+        return self._search_cache.get_or_search("song", query, self._coalesced_search(
+            "song", self._search_songs))
+
+    def _coalesced_search(self, kind: str, search: Callable) -> Callable:
+        return lambda query: self._flights.do(
+            ("search_" + kind, normalize_query(query)), lambda: search(query))
+
+    def configure_search(self, hedge_delay: Optional[float]) -> None:
+        """Seconds to wait for SMAPI before also asking iTunes (None: only on failure)."""
+        self._hedge_delay = hedge_delay
+
+    def _search_albums(self, query: str):
+        return self._search(query, self._smapi_search_albums, self._itunes_search_albums)
+
+    def _search_songs(self, query: str):
+        return self._search(query, self._smapi_search_songs, self._itunes_search_songs)
+
+    def _search(self, query: str, smapi_search: Callable, itunes_search: Callable):
+        """Search SMAPI, with iTunes as the fallback (or hedge, see _hedged_search)."""
+        if not self._smapi:
+            return itunes_search(query)
+        if self._hedge_delay is not None:
+            return self._hedged_search(query, smapi_search, itunes_search)
+        try:
+            return smapi_search(query)
+        except Exception as e:
+            log.warning("SMAPI search failed, falling back to iTunes: %s", e)
+        return itunes_search(query)
+
+    def _hedged_search(self, query: str, smapi_search: Callable, itunes_search: Callable):
+        """Start SMAPI; if it has not answered after the hedge delay (or fails),
+        start iTunes too and return whichever good answer arrives first.
+
+        The loser is cancelled if it has not started yet; a request already in
+        flight cannot be interrupted, so it finishes in the background and its
+        result is discarded (its latency is still logged).
+        """
+        started = time.monotonic()
+        names = {}
+
+        def submit(name, fn, pool):
+            future = pool.submit(fn, query)
+            names[future] = name
+            future.add_done_callback(lambda f: log.debug(
+                "%s search for %r finished after %.0f ms", name, query,
+                (time.monotonic() - started) * 1000))
+            return future
+
+        pending = {submit("SMAPI", smapi_search, _smapi_search_pool)}
+        done, _ = wait(pending, timeout=self._hedge_delay)
+        if not done:
+            log.info("SMAPI search slower than %.0f ms, hedging with iTunes",
+                     self._hedge_delay * 1000)
+        error = None
+        while True:
+            for future in done:
+                pending.discard(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    log.warning("%s search failed: %s", names[future], e)
+                    error = e
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                log.info("%s search won in %.0f ms", names[future],
+                         (time.monotonic() - started) * 1000)
+                return result
+            if "iTunes" not in names.values():
+                pending.add(submit("iTunes", itunes_search, _itunes_search_pool))
+            if not pending:
+                raise error
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
 
     def list_playlists(self) -> List[Dict]:
         """Return all personal playlists from the user's Apple Music library."""
         if not self._smapi:
             return []
         try:
-            items, _ = self._smapi.get_metadata("libraryfolder:f.4", count=100)
             return [
                 {
                     "id": item["id"].removeprefix("libraryplaylist:"),
                     "playlist_id": item["id"].removeprefix("libraryplaylist:"),
                     "title": item.get("title", ""),
-                    "artwork_url": item.get("album_art_uri", ""),
+                    "artwork_url": proxy_url(item.get("album_art_uri", "")),
                     "item_type": "playlist",
                 }
-                for item in items
-                if item.get("item_type") == "playlist"
+                for item in self._playlists.entries()
             ]
         except Exception as e:
             log.warning("list_playlists failed: %s", e)
@@ -155,8 +425,10 @@ class AppleMusicProvider(MusicProvider):
 
     # --- SMAPI search implementations ---
 
-    def _smapi_search_albums(self, query: str) -> List[Dict]:
-        items, _ = self._smapi_search(query)
+    # Each returns (results, complete) for SearchCache.
+
+    def _smapi_search_albums(self, query: str):
+        items, total = self._smapi_search(query)
         results = []
         for item in items:
             if item.get("item_type") not in ("album", "collection"):
@@ -169,12 +441,12 @@ class AppleMusicProvider(MusicProvider):
                 "id": int(album_id) if album_id.isdigit() else album_id,
                 "name": item.get("title", ""),
                 "artist": item.get("artist", ""),
-                "artwork_url": _upgrade_artwork_url(item.get("album_art_uri", "")),
+                "artwork_url": _artwork_url(item.get("album_art_uri", "")),
             })
-        return results
+        return results, total <= len(items)
 
-    def _smapi_search_songs(self, query: str) -> List[Dict]:
-        items, _ = self._smapi_search(query)
+    def _smapi_search_songs(self, query: str):
+        items, total = self._smapi_search(query)
         results = []
         for item in items:
             if item.get("item_type") != "track":
@@ -192,76 +464,112 @@ class AppleMusicProvider(MusicProvider):
                 "name": item.get("title", ""),
                 "artist": item.get("artist", ""),
                 "album": item.get("album", ""),
-                "artwork_url": _upgrade_artwork_url(item.get("album_art_uri", "")),
+                "artwork_url": _artwork_url(item.get("album_art_uri", "")),
             })
-        return results
+        return results, total <= len(items)
 
     # --- iTunes API implementations ---
 
-    def _itunes_search_albums(self, query: str) -> List[Dict]:
+    def _itunes_search_albums(self, query: str):
         encoded = urllib.parse.quote(query)
         url = f"https://itunes.apple.com/search?term={encoded}&entity=album"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = json.loads(response.read())
-        return [
+        data = json.loads(transport.fetch(url))
+        results = [
             {
                 "id": r["collectionId"],
                 "name": r["collectionName"],
                 "artist": r["artistName"],
-                "artwork_url": _upgrade_artwork_url(r.get("artworkUrl100", "")),
+                "artwork_url": _artwork_url(r.get("artworkUrl100", "")),
             }
             for r in data["results"]
         ]
+        return results, len(data["results"]) < _ITUNES_SEARCH_LIMIT
 
-    def _itunes_search_songs(self, query: str) -> List[Dict]:
+    def _itunes_search_songs(self, query: str):
         encoded = urllib.parse.quote(query)
         url = f"https://itunes.apple.com/search?term={encoded}&entity=song"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = json.loads(response.read())
-        return [
+        data = json.loads(transport.fetch(url))
+        results = [
             {
                 "id": r["trackId"],
                 "name": r["trackName"],
                 "artist": r["artistName"],
                 "album": r["collectionName"],
-                "artwork_url": _upgrade_artwork_url(r.get("artworkUrl100", "")),
+                "artwork_url": _artwork_url(r.get("artworkUrl100", "")),
             }
             for r in data["results"]
             if r.get("wrapperType") == "track"
         ]
+        return results, len(data["results"]) < _ITUNES_SEARCH_LIMIT
 
     def get_album_tracks(self, album_id: str) -> List[Dict]:
-        url = f"https://itunes.apple.com/lookup?id={album_id}&entity=song"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = json.loads(response.read())
-        collection = next(
-            (r for r in data["results"] if r.get("wrapperType") == "collection"), None
-        )
-        release_year = collection.get("releaseDate", "")[:4] if collection else ""
-        copyright_line = collection.get("copyright", "") if collection else ""
-        tracks = [r for r in data["results"] if r.get("wrapperType") == "track"]
-        tracks.sort(key=lambda t: (t.get("discNumber", 1), t["trackNumber"]))
-        return [
-            {
-                "track_id": t["trackId"],
-                "name": t["trackName"],
-                "track_number": t["trackNumber"],
-                "artist": t["artistName"],
-                "album": t["collectionName"],
-                "album_id": t.get("collectionId"),
-                "artwork_url": _upgrade_artwork_url(t.get("artworkUrl100", "")),
-                "duration": _format_duration(t.get("trackTimeMillis")),
-                "release_year": release_year,
-                "copyright": copyright_line,
-            }
-            for t in tracks
-        ]
+        return self._cached("album", album_id, lambda: self._fetch_album_tracks(album_id))
+
+    def _fetch_album_tracks(self, album_id: str) -> List[Dict]:
+        return _album_tracks(_itunes_lookup(
+            f"https://itunes.apple.com/lookup?id={album_id}&entity=song"))
+
+    def get_albums_tracks(self, album_ids: Iterable) -> Dict:
+        """Return {album_id: tracks} for many albums using iTunes multi-ID lookups.
+
+        Albums already in the metadata cache are not fetched. The rest are
+        looked up _ITUNES_BATCH_SIZE at a time, up to _ITUNES_BATCH_WORKERS
+        lookups in parallel; albums whose rows reached the per-ID limit are
+        then re-fetched singly, also in parallel. Unknown albums map to [].
+        """
+        album_ids = list(album_ids)
+        results = {}
+        pending = []
+        for album_id in album_ids:
+            cached = self._peek_cached("album", album_id)
+            if cached is None:
+                pending.append(album_id)
+            else:
+                results[album_id] = cached
+        chunks = [pending[i:i + _ITUNES_BATCH_SIZE]
+                  for i in range(0, len(pending), _ITUNES_BATCH_SIZE)]
+        truncated = []
+        if chunks:
+            with ThreadPoolExecutor(max_workers=min(_ITUNES_BATCH_WORKERS, len(chunks))) as pool:
+                for fetched, cut in pool.map(self._fetch_albums_chunk, chunks):
+                    results.update(fetched)
+                    truncated.extend(cut)
+        if truncated:
+            with ThreadPoolExecutor(max_workers=min(_ITUNES_BATCH_WORKERS, len(truncated))) as pool:
+                for album_id, tracks in zip(truncated, pool.map(self._fetch_album_tracks, truncated)):
+                    results[album_id] = tracks
+                    self._store_album(album_id, tracks)
+        return {album_id: results.get(album_id, []) for album_id in album_ids}
+
+    def _fetch_albums_chunk(self, album_ids: List) -> Tuple[Dict, List]:
+        """Look up a chunk of albums at once. Returns ({album_id: tracks},
+        IDs whose rows reached the per-ID limit and may be incomplete)."""
+        ids = ",".join(str(i) for i in album_ids)
+        url = (f"https://itunes.apple.com/lookup?id={ids}&entity=song"
+               f"&limit={_ITUNES_BATCH_LIMIT}")
+        by_album = {}
+        for r in _itunes_lookup(url):
+            by_album.setdefault(str(r.get("collectionId")), []).append(r)
+        fetched, truncated = {}, []
+        for album_id in album_ids:
+            rows = by_album.get(str(album_id), [])
+            if len(rows) >= _ITUNES_BATCH_LIMIT:  # iTunes applies limit per ID
+                truncated.append(album_id)
+                continue
+            fetched[album_id] = _album_tracks(rows)
+            self._store_album(album_id, fetched[album_id])
+        return fetched, truncated
+
+    def _store_album(self, album_id, tracks: List[Dict]) -> None:
+        if self._metadata_cache is not None:
+            self._metadata_cache.put("album", f"{self.service_id}:album:{album_id}", tracks)
 
     def get_track(self, track_id: str) -> List[Dict]:
-        url = f"https://itunes.apple.com/lookup?id={track_id}"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = json.loads(response.read())
-        tracks = [r for r in data["results"] if r.get("wrapperType") == "track"]
+        return self._cached("track", track_id, lambda: self._fetch_track(track_id))
+
+    def _fetch_track(self, track_id: str) -> List[Dict]:
+        results = _itunes_lookup(f"https://itunes.apple.com/lookup?id={track_id}")
+        tracks = [r for r in results if r.get("wrapperType") == "track"]
         if not tracks:
             return []
         t = tracks[0]
@@ -273,10 +581,37 @@ class AppleMusicProvider(MusicProvider):
                 "artist": t["artistName"],
                 "album": t["collectionName"],
                 "album_id": t.get("collectionId"),
-                "artwork_url": _upgrade_artwork_url(t.get("artworkUrl100", "")),
+                "artwork_url": _artwork_url(t.get("artworkUrl100", "")),
             }
         ]
 
+    def get_track_album(self, track_id) -> Optional[Dict]:
+        """Return {'album_id', 'artwork_url'} for a track, or None if the track
+        is unknown. Cached (see _TRACK_ALBUM_TTL); lookup errors propagate and
+        are not cached.
+        """
+        def _load():
+            tracks = self.get_track(track_id)
+            if not tracks:
+                return None
+            return {"album_id": tracks[0].get("album_id"),
+                    "artwork_url": tracks[0].get("artwork_url")}
+        return self._track_album_cache.get_or_load(int(track_id), _load)
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters for the provider's lookup caches."""
+        stats = {"track_album": self._track_album_cache.stats(),
+                 "search": self._search_cache.stats()}
+        if self._playlists is not None:
+            stats["playlists"] = self._playlists.stats()
+        if self._metadata_cache is not None:
+            stats["metadata"] = self._metadata_cache.stats()
+        return stats
+
+    def coalesce_stats(self) -> Dict:
+        """Lookups made, and how many shared an identical request in flight."""
+        return self._flights.stats()
+
     def build_playlist_uri(self, playlist_id: str, sn: int) -> str:
         """playlist_id is like 'p.PvVos1vxbV'"""
         return f"x-rincon-cpcontainer:1006206clibraryplaylist%3A{playlist_id}?sid=204&flags=8300&sn={sn}"
@@ -302,41 +637,70 @@ class AppleMusicProvider(MusicProvider):
         if not self._smapi:
             return None
         try:
-            items, _ = self._smapi.get_metadata("libraryfolder:f.4", count=100)
-            for item in items:
-                if item.get("id") == f"libraryplaylist:{playlist_id}":
-                    return {"title": item.get("title", ""), "artwork_url": item.get("album_art_uri", "")}
+            return self._cached("playlist_info", playlist_id,
+                                lambda: self._fetch_playlist_info(playlist_id))
         except Exception:
-            pass
-        return None
+            return None
+
+    def _fetch_playlist_info(self, playlist_id: str) -> Optional[Dict]:
+        item = self._playlists.get(playlist_id)
+        if item is None:
+            return None
+        return {"title": item.get("title", ""), "artwork_url": proxy_url(item.get("album_art_uri", ""))}
 
     def get_playlist_tracks(self, playlist_id: str) -> List[Dict]:
         """Return tracks for a personal playlist ID like 'p.PvVos1vxbV'."""
         if not self._smapi:
             return []
         try:
-            items, _ = self._smapi.get_metadata(f"libraryplaylist:{playlist_id}", count=200)
-            results = []
-            for item in items:
-                if item.get("item_type") != "track":
-                    continue
-                raw_id = item.get("id", "")
-                for prefix in ("track:", "song:"):
-                    if raw_id.startswith(prefix):
-                        raw_id = raw_id[len(prefix):]
-                        break
-                track_id = int(raw_id) if raw_id.isdigit() else None
-                results.append({
-                    "name": item.get("title", ""),
-                    "artist": item.get("artist", ""),
-                    "album": item.get("album", ""),
-                    "track_id": track_id,
-                })
-            return results
+            return self._cached("playlist_tracks", playlist_id,
+                                lambda: self._fetch_playlist_tracks(playlist_id))
         except Exception as e:
             log.warning("get_playlist_tracks failed for %s: %s", playlist_id, e)
             return []
 
+    def _fetch_playlist_tracks(self, playlist_id: str) -> List[Dict]:
+        try:
+            items = self._smapi.get_all_metadata(f"libraryplaylist:{playlist_id}",
+                                                 page_size=_PLAYLIST_PAGE_SIZE)
+            return [t for t in map(_playlist_track, items) if t]
+        except SmapiError as e:
+            if _is_item_not_found(e):
+                return []
+            raise
+
+    def _iter_playlist_items(self, playlist_id: str) -> Iterator[Dict]:
+        return self._smapi.iter_metadata(f"libraryplaylist:{playlist_id}",
+                                         page_size=_PLAYLIST_PAGE_SIZE)
+
+    def iter_playlist_tracks(self, playlist_id: str) -> Iterator[Dict]:
+        """Yield a playlist's tracks as SMAPI pages arrive, for progressive rendering.
+
+        A fresh cached list is replayed without a request. A complete fetch is
+        written to the metadata cache; on error the iteration just ends early.
+        """
+        if not self._smapi:
+            return
+        cached = self._peek_cached("playlist_tracks", playlist_id)
+        if cached is not None:
+            yield from cached
+            return
+        tracks = []
+        try:
+            for item in self._iter_playlist_items(playlist_id):
+                track = _playlist_track(item)
+                if track:
+                    tracks.append(track)
+                    yield track
+        except Exception as e:
+            log.warning("iter_playlist_tracks failed for %s after %d tracks: %s",
+                        playlist_id, len(tracks), e)
+            if not (_is_item_not_found(e) and not tracks):
+                return
+        if self._metadata_cache is not None:
+            self._metadata_cache.put("playlist_tracks",
+                                     f"{self.service_id}:playlist_tracks:{playlist_id}", tracks)
+
     def build_track_uri(self, track_id: str, sn: int) -> str:
         return f"x-sonos-http:song%3a{track_id}.mp4?sid=204&flags=8232&sn={sn}"
 
@@ -0,0 +1,158 @@
+"""Local artwork proxy: proxy URLs for provider artwork and an on-disk cache.
+
+Album art comes from Apple's CDN (*.mzstatic.com). Providers hand out
+/artwork/<host>/<path> URLs instead, so the browser loads every image from the
+Pi, which fetches it upstream once and keeps it under data/artwork/. The
+proxy URL carries the upstream location itself, so stored URLs (tags.json,
+the metadata cache) stay valid across restarts without a lookup table.
+
+Size variants come from the CDN, not local resizing: mzstatic paths end in
+"<w>x<h>bb.jpg" and serve any size requested there, so ?size=300 fetches
+(and caches) the 300x300 rendition. Only allowed hosts are proxied; other
+URLs are passed through unchanged. Keys come from request paths, so a key's
+host must be a plain hostname and the URL built from it must resolve to that
+same host (no "?", "#", "@" or port tricks).
+
+ArtworkCache evicts least recently served files once the directory exceeds
+its byte quota.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import urllib.parse
+
+from providers import transport
+
+log = logging.getLogger(__name__)
+
+PROXY_PREFIX = "/artwork/"
+ALLOWED_HOST_SUFFIXES = (".mzstatic.com",)
+SIZES = (100, 300, 600, 1200)
+DEFAULT_QUOTA_BYTES = 100 * 1024 * 1024
+
+_SIZE_RE = re.compile(r"/(\d+)x(\d+)(bb[^/]*)$")
+_HOST_RE = re.compile(r"^[A-Za-z0-9-]+(\.[A-Za-z0-9-]+)+$")
+
+
+def _allowed(host):
+    return any(host.endswith(suffix) for suffix in ALLOWED_HOST_SUFFIXES)
+
+
+def proxy_url(url, size=None):
+    """Return the /artwork/ URL for an upstream (or already proxied) artwork URL.
+
+    size selects a CDN rendition (one of SIZES). URLs on other hosts and empty
+    values are returned unchanged.
+    """
+    if not url:
+        return url
+    if url.startswith(PROXY_PREFIX):
+        key = url[len(PROXY_PREFIX):].split("?", 1)[0]
+    else:
+        parts = urllib.parse.urlsplit(url)
+        if (parts.scheme not in ("http", "https") or parts.netloc != parts.hostname
+                or not _allowed(parts.hostname or "")):
+            return url
+        key = parts.netloc + parts.path
+    return PROXY_PREFIX + key + (f"?size={size}" if size else "")
+
+
+def upstream_url(key, size=None):
+    """Return the upstream https URL for a proxy key, or None if not allowed."""
+    host, _, path = key.partition("/")
+    if (not _HOST_RE.match(host) or not _allowed(host) or not path
+            or ".." in path.split("/") or any(c in path for c in "?#\\")):
+        return None
+    path = "/" + path
+    if size is not None:
+        path = _SIZE_RE.sub(lambda m: f"/{size}x{size}{m.group(3)}", path)
+    url = f"https://{host}{path}"
+    parts = urllib.parse.urlsplit(url)
+    if parts.hostname != host.lower() or parts.port is not None or parts.username is not None:
+        return None
+    return url
+
+
+class ArtworkCache:
+    """Directory of fetched images, named by the hash of their upstream URL,
+    trimmed to quota_bytes by last access (file mtime, touched on each hit)."""
+
+    def __init__(self, directory, quota_bytes=DEFAULT_QUOTA_BYTES):
+        self._dir = directory
+        self._quota = quota_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(os.path.getsize(p) for p in self._files())
+
+    def path_for(self, url):
+        """Return (local file path, etag) for url, fetching it on a miss.
+
+        Raises on fetch errors; nothing is stored then.
+        """
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        path = os.path.join(self._dir, digest)
+        try:
+            os.utime(path)
+            with self._lock:
+                self._hits += 1
+            return path, digest
+        except FileNotFoundError:
+            pass
+        data = transport.fetch(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._misses += 1
+            self._bytes += len(data)
+            over = self._bytes > self._quota
+        if over:
+            self._evict(keep=path)
+        return path, digest
+
+    def _files(self):
+        return [os.path.join(self._dir, name) for name in os.listdir(self._dir)
+                if not name.endswith(".tmp")]
+
+    def _evict(self, keep):
+        entries = []
+        for path in self._files():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self._quota:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self._lock:
+                self._evictions += 1
+        with self._lock:
+            self._bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "bytes": self._bytes,
+                "size": len(self._files()),
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
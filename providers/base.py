@@ -18,6 +18,11 @@ class MusicProvider(ABC):
     @abstractmethod
     def get_album_tracks(self, album_id: str) -> List[Dict]: ...
 
+    def get_albums_tracks(self, album_ids) -> Dict:
+        """Return {album_id: tracks} for many albums. Providers with a batch
+        lookup override this; the default fetches one album at a time."""
+        return {album_id: self.get_album_tracks(album_id) for album_id in album_ids}
+
     @abstractmethod
     def get_track(self, track_id: str) -> List[Dict]: ...
 
@@ -32,3 +37,19 @@ class MusicProvider(ABC):
 
     @abstractmethod
     def detect_sn(self, speaker) -> Optional[str]: ...
+
+    def refresh_metadata(self, tag_type: str, item_id, ahead_secs: float = 0) -> bool:
+        """Fetch the metadata a tag needs into the metadata cache if it is
+        missing or stops being fresh within ahead_secs. Returns True if a
+        lookup was made. Providers without a cache never fetch."""
+        return False
+
+    def is_unavailable(self, tag_type: str, item_id) -> bool:
+        """True if the last lookup for a tag's content found nothing (removed
+        from the catalog or deleted). Never fetches; providers without a cache
+        never know."""
+        return False
+
+    def configure_cache(self, cache) -> None:
+        """Route metadata lookups through a providers.metadata_cache.MetadataCache.
+        Providers without cacheable lookups ignore it."""
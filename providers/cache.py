@@ -0,0 +1,234 @@
+"""Small in-memory caches for provider lookups.
+
+TTLCache is a bounded LRU whose entries expire after a TTL. A loader result
+of None is a negative result ("this ID does not exist") and is kept for the
+shorter negative_ttl, so a missing track is not looked up again on every
+poll but reappears soon if the catalog changes. Exceptions from the loader
+are never cached.
+
+SearchCache holds search-as-you-type results per (type, normalized query).
+When a shorter prefix of the query was answered completely (the backend
+returned everything it had, not a truncated page), a longer query is
+answered by filtering that result instead of searching again.
+
+SingleFlight coalesces identical calls that overlap in time: while a call
+for a key is running, later callers for the same key wait for it and share
+its result (or its exception) instead of issuing their own request. Nothing
+is kept once the call returns; caching stays the job of the classes above.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize, ttl, negative_ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at monotonic)
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=MISSING):
+        """Return the cached value (None for a negative entry), or default."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            if entry[0] is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        ttl = self._negative_ttl if value is None else self._ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is MISSING:
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._negative_hits + self._misses
+            return {
+                "hits": self._hits,
+                "negative_hits": self._negative_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+                "hit_rate": (self._hits + self._negative_hits) / lookups if lookups else 0.0,
+            }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-safe per-key call coalescing with call/coalesced counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> _Flight
+        self._calls = 0
+        self._coalesced = 0
+
+    def do(self, key, fn):
+        """Return fn(), or the result of the identical call already running."""
+        with self._lock:
+            self._calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "coalesced": self._coalesced,
+                "upstream": self._calls - self._coalesced,
+                "in_flight": len(self._flights),
+            }
+
+
+def normalize_query(query):
+    """Case-fold and collapse whitespace: "  The  Beatles" -> "the beatles"."""
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """Thread-safe LRU of search results with TTL expiry and prefix reuse.
+
+    search(query) must return (results, complete). Results are dicts; a
+    cached complete result for a prefix is filtered by requiring every word
+    of the new query to appear in one of match_fields.
+    """
+
+    def __init__(self, maxsize, ttl, match_fields=("name", "artist", "album")):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._match_fields = match_fields
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (kind, query) -> (results, complete, expires_at)
+        self._hits = 0
+        self._prefix_hits = 0
+        self._misses = 0
+
+    def get_or_search(self, kind, query, search):
+        q = normalize_query(query)
+        results = self._lookup(kind, q)
+        if results is None:
+            results, complete = search(query)
+            self._store(kind, q, results, complete)
+        return results
+
+    def _lookup(self, kind, q):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(kind, q, now)
+            if entry is not None:
+                self._hits += 1
+                return entry[0]
+            for end in range(len(q) - 1, 0, -1):
+                entry = self._live(kind, q[:end], now)
+                if entry is not None and entry[1]:
+                    self._prefix_hits += 1
+                    words = q.split()
+                    results = [r for r in entry[0] if self._matches(r, words)]
+                    self._put(kind, q, results, True, entry[2])
+                    return results
+            self._misses += 1
+            return None
+
+    def _live(self, kind, q, now):
+        # Caller holds self._lock.
+        entry = self._entries.get((kind, q))
+        if entry is None:
+            return None
+        if entry[2] <= now:
+            del self._entries[(kind, q)]
+            return None
+        self._entries.move_to_end((kind, q))
+        return entry
+
+    def _matches(self, result, words):
+        text = " ".join(str(result.get(f) or "") for f in self._match_fields).casefold()
+        return all(w in text for w in words)
+
+    def _store(self, kind, q, results, complete):
+        with self._lock:
+            self._put(kind, q, results, complete, time.monotonic() + self._ttl)
+
+    def _put(self, kind, q, results, complete, expires_at):
+        # Caller holds self._lock. A filtered entry keeps its source's expiry.
+        self._entries[(kind, q)] = (results, complete, expires_at)
+        self._entries.move_to_end((kind, q))
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._prefix_hits + self._misses
+            return {
+                "hits": self._hits,
+                "prefix_hits": self._prefix_hits,
+                "misses": self._misses,
+                "size": len(self._entries),
+                "hit_rate": (self._hits + self._prefix_hits) / lookups if lookups else 0.0,
+            }
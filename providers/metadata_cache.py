@@ -0,0 +1,266 @@
+"""Two-tier (memory + SQLite) cache for provider metadata lookups.
+
+Album track lists, single tracks and playlist info are fetched from iTunes or
+SMAPI on every tap, album page, print sheet and tag confirmation. MetadataCache
+keeps recent results in an in-memory LRU in front of a SQLite file under
+data/, so lookups stay fast across service restarts and updates (the updater
+only resets tracked files).
+
+Per kind, an entry is:
+  fresh   (age < ttl)        - returned as-is
+  stale   (age < max_stale)  - returned immediately, refreshed in the background
+  expired                    - fetched synchronously; if that fetch fails the
+                               expired value is returned rather than nothing
+Empty results ([] / None, including IDs the catalog answers 404 for) use the
+shorter negative_ttl, so a removed album is not looked up again on every tap
+but reappears soon if the catalog changes. is_negative() reports whether the
+last stored lookup for a key found nothing, however old, for flagging dead
+cards. The SQLite file is trimmed to max_rows, least recently used first.
+
+An optional health monitor (core.health.HealthMonitor) is told the outcome of
+every fetch. While it reports offline, any cached copy is returned as-is,
+whatever its age, without trying the network.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+# kind -> (ttl, max_stale) in seconds
+DEFAULT_TTLS = {
+    "album": (7 * 86400, 90 * 86400),
+    "track": (7 * 86400, 90 * 86400),
+    "playlist_info": (3600, 30 * 86400),
+    "playlist_tracks": (900, 30 * 86400),
+}
+NEGATIVE_TTL = 600
+_DEFAULT_TTL = (3600, 86400)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+_TRIM_EVERY = 50  # writes between max_rows checks
+
+
+class MetadataCache:
+    """Thread-safe memory LRU over a SQLite store. Keys are strings."""
+
+    def __init__(self, path, memory_size=256, max_rows=5000, ttls=None, health=None,
+                 negative_ttl=NEGATIVE_TTL):
+        self._path = path
+        self._memory_size = memory_size
+        self._max_rows = max_rows
+        self._ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._health = health
+        self._negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, fetched_at)
+        self._refreshing = set()
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "negative_hits": 0,
+                       "misses": 0, "refreshes": 0, "fallbacks": 0, "offline_hits": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    def get(self, kind, key, loader):
+        """Return the value for key, calling loader() when it is missing or expired."""
+        now = time.time()
+        entry, tier = self._lookup(key)
+        if entry is not None:
+            value, fetched_at = entry
+            ttl, max_stale = self._ttl(kind, value)
+            age = now - fetched_at
+            if age < ttl:
+                self._count(tier if value else "negative_hits")
+                return value
+            if self._health is not None and self._health.offline:
+                self._count("offline_hits")
+                return value
+            if age < max_stale:
+                self._count("stale_hits")
+                self._refresh_async(kind, key, loader)
+                return value
+        self._count("misses")
+        try:
+            value = self._load(loader)
+        except Exception:
+            if entry is None:
+                raise
+            log.warning("Metadata fetch for %s failed, serving expired copy", key)
+            self._count("fallbacks")
+            return entry[0]
+        self.put(kind, key, value)
+        return value
+
+    def load(self, kind, key, loader):
+        """Fetch with loader() and store the result, whatever is cached."""
+        value = self._load(loader)
+        self.put(kind, key, value)
+        return value
+
+    def peek(self, kind, key):
+        """Return the value for key if it is fresh, else None. Never fetches."""
+        entry, tier = self._lookup(key)
+        if entry is None:
+            return None
+        value, fetched_at = entry
+        if time.time() - fetched_at >= self._ttl(kind, value)[0]:
+            return None
+        self._count(tier)
+        return value
+
+    def expires_in(self, kind, key):
+        """Seconds until the entry for key stops being fresh (negative once it
+        is stale), or None if there is no entry. Not counted in the stats."""
+        entry, _ = self._lookup(key)
+        if entry is None:
+            return None
+        value, fetched_at = entry
+        return fetched_at + self._ttl(kind, value)[0] - time.time()
+
+    def is_negative(self, key):
+        """True if the last lookup stored for key found nothing, however old.
+        Never fetches and is not counted in the stats."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                return not entry[0]
+            row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        try:
+            return not json.loads(row[0])
+        except ValueError:
+            return False
+
+    def put(self, kind, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, fetched_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(value), now, now),
+            )
+            self._writes += 1
+            if self._writes % _TRIM_EVERY == 0:
+                self._trim()
+            self._db.commit()
+
+    def discard(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_size"] = len(self._memory)
+            stats["disk_size"] = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        hits = (stats["memory_hits"] + stats["disk_hits"] + stats["stale_hits"]
+                + stats["negative_hits"])
+        lookups = hits + stats["misses"]
+        stats["size"] = stats["disk_size"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # --- internal ---
+
+    def _ttl(self, kind, value):
+        ttl, max_stale = self._ttls.get(kind, _DEFAULT_TTL)
+        if not value:
+            return min(ttl, self._negative_ttl), min(max_stale, self._negative_ttl)
+        return ttl, max_stale
+
+    def _lookup(self, key):
+        """Return ((value, fetched_at), tier) or (None, None)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry, "memory_hits"
+            row = self._db.execute(
+                "SELECT value, fetched_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, None
+            try:
+                value = json.loads(row[0])
+            except ValueError:
+                return None, None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self._remember(key, value, row[1])
+            return (value, row[1]), "disk_hits"
+
+    def _remember(self, key, value, fetched_at):
+        # Caller holds self._lock.
+        self._memory[key] = (value, fetched_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+    def _trim(self):
+        # Caller holds self._lock.
+        self._db.execute(
+            "DELETE FROM entries WHERE key IN ("
+            " SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self._max_rows,),
+        )
+
+    def _load(self, loader):
+        if self._health is None:
+            return loader()
+        try:
+            value = loader()
+        except Exception as e:
+            self._health.record_failure(e)
+            raise
+        self._health.record_success()
+        return value
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _refresh_async(self, kind, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _refresh():
+            try:
+                self.load(kind, key, loader)
+                self._count("refreshes")
+            except Exception as e:
+                log.debug("Background refresh of %s failed: %s", key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_refresh, daemon=True).start()
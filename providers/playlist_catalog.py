@@ -0,0 +1,131 @@
+"""In-memory index of the user's personal playlists (SMAPI libraryfolder:f.4).
+
+Every playlist page view and playlist tap needs a playlist's title, and the
+only SMAPI way to get it is to list the library folder. PlaylistCatalog pages
+through the whole folder using the reported total (so libraries beyond one
+page are complete) and keeps an id -> entry dict. Paging is
+SmapiClient.iter_metadata's, so pages after the first are fetched
+concurrently and a short page is completed rather than skipped.
+
+Refreshes are incremental: once the catalog is older than ttl, only the first
+page is re-read; if the total and that page are unchanged the catalog is kept
+as-is. Otherwise (or every full_refresh seconds) the folder is paged again.
+Lookups of an unknown ID trigger a refresh at most every miss_refresh seconds,
+so a playlist created since the last refresh is found on its first tap.
+"""
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+FOLDER_ID = "libraryfolder:f.4"
+PAGE_SIZE = 100
+TTL_SECS = 900
+FULL_REFRESH_SECS = 6 * 3600
+MISS_REFRESH_SECS = 30
+
+
+class PlaylistCatalog:
+    """Thread-safe playlist_id -> entry map of a SmapiClient's library playlist folder.
+
+    Entries are SMAPI item dicts (id, title, album_art_uri, item_type, ...);
+    keys are the playlist ID without the "libraryplaylist:" prefix.
+    """
+
+    def __init__(self, client, folder_id=FOLDER_ID, page_size=PAGE_SIZE, ttl=TTL_SECS,
+                 full_refresh=FULL_REFRESH_SECS, miss_refresh=MISS_REFRESH_SECS):
+        self._client = client
+        self._folder_id = folder_id
+        self._page_size = page_size
+        self._ttl = ttl
+        self._full_refresh = full_refresh
+        self._miss_refresh = miss_refresh
+        self._lock = threading.Lock()        # guards the fields below
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+        self._entries = {}
+        self._first_page = None
+        self._total = None
+        self._checked_at = None   # monotonic time of the last refresh (full or quick)
+        self._loaded_at = None    # monotonic time of the last full page-through
+        self._stats = {"hits": 0, "misses": 0, "quick_refreshes": 0, "full_refreshes": 0}
+
+    def entries(self):
+        """All playlists, in library order. Raises if the first load fails."""
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._entries.values())
+
+    def get(self, playlist_id):
+        """Return the entry for playlist_id, or None if it is not in the library."""
+        self._ensure_fresh()
+        with self._lock:
+            entry = self._entries.get(playlist_id)
+            stale_miss = entry is None and time.monotonic() - self._checked_at >= self._miss_refresh
+            self._stats["hits" if entry is not None else "misses"] += 1
+        if stale_miss:
+            self._refresh(full=True, requested_at=time.monotonic())
+            with self._lock:
+                entry = self._entries.get(playlist_id)
+        return entry
+
+    def invalidate(self):
+        """Force the next lookup to page through the whole folder again."""
+        with self._lock:
+            self._checked_at = self._loaded_at = None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    # --- internal ---
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        with self._lock:
+            loaded = self._loaded_at is not None
+            if loaded and now - self._checked_at < self._ttl:
+                return
+            full = not loaded or now - self._loaded_at >= self._full_refresh
+        try:
+            self._refresh(full=full, requested_at=now)
+        except Exception as e:
+            if not loaded:
+                raise
+            log.warning("Playlist catalog refresh failed, using cached list: %s", e)
+
+    def _refresh(self, full, requested_at):
+        with self._refresh_lock:
+            with self._lock:
+                if self._checked_at is not None and self._checked_at >= requested_at:
+                    return  # another thread refreshed while we waited
+            items, total = self._client.get_metadata(self._folder_id, index=0,
+                                                      count=self._page_size)
+            with self._lock:
+                unchanged = (not full and total == self._total
+                             and _ids(items) == _ids(self._first_page or []))
+                if unchanged:
+                    self._checked_at = time.monotonic()
+                    self._stats["quick_refreshes"] += 1
+                    return
+            entries = {}
+            for item in self._client.iter_metadata(self._folder_id, page_size=self._page_size,
+                                                   first_page=(items, total)):
+                if item.get("item_type") == "playlist":
+                    entries[item["id"].removeprefix("libraryplaylist:")] = item
+            now = time.monotonic()
+            with self._lock:
+                self._entries = entries
+                self._first_page = items
+                self._total = total
+                self._checked_at = self._loaded_at = now
+                self._stats["full_refreshes"] += 1
+            log.info("Playlist catalog loaded: %d playlists", len(entries))
+
+
+def _ids(items):
+    return [(item.get("id"), item.get("title"), item.get("album_art_uri")) for item in items]
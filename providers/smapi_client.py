@@ -13,9 +13,14 @@ from __future__ import annotations
 
 import logging
 import re
-import urllib.request
+import threading
+import time
+import urllib.error
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from providers import transport
 
 log = logging.getLogger(__name__)
 
@@ -24,6 +29,14 @@ NS_SONOS = "http://www.sonos.com/Services/1.1"
 
 _NAMESPACES = {"s": NS_SOAP, "ns": NS_SONOS}
 
+# SMAPI refreshAuthToken replies carry no expiry, so token lifetime starts as
+# this guess and is shortened to the observed age of any token the service
+# rejects as expired. Tokens are rotated once REFRESH_AT of the lifetime has
+# passed.
+TOKEN_LIFETIME_SECS = 12 * 3600
+REFRESH_AT = 0.8
+_MIN_LEARNED_LIFETIME = 600
+
 
 def _build_envelope(header_xml: str, body_xml: str) -> str:
     return (
@@ -82,34 +95,43 @@ class SmapiClient:
         token: OAuth access token
         key: Private/refresh key
         household_id: Full Sonos household ID with OADevID suffix
+        token_issued_at: When token was issued (epoch seconds), if known
     """
 
-    def __init__(self, endpoint: str, token: str, key: str, household_id: str):
+    def __init__(self, endpoint: str, token: str, key: str, household_id: str,
+                 token_issued_at: Optional[float] = None):
         self.endpoint = endpoint
         self.token = token
         self.key = key
         self.household_id = household_id
+        self.token_issued_at = token_issued_at
+        self.token_lifetime = TOKEN_LIFETIME_SECS
+        self._refresh_lock = threading.RLock()
 
-    def _call(self, action: str, body_xml: str, timeout: int = 10) -> ET.Element:
-        """Make an authenticated SMAPI SOAP call and return the parsed Body element."""
+    def _request(self, action: str, body_xml: str) -> Tuple[bytes, Dict]:
+        """Return the SOAP envelope and headers for an authenticated call."""
         header = _credentials_header(self.token, self.key, self.household_id)
         envelope = _build_envelope(header, body_xml)
-        req = urllib.request.Request(
-            self.endpoint,
-            data=envelope.encode("utf-8"),
-            headers={
-                "Content-Type": "text/xml; charset=utf-8",
-                "SOAPAction": f'"{NS_SONOS}#{action}"',
-                "User-Agent": "Linux UPnP/1.0 Sonos/80.1-55240",
-            },
-        )
+        headers = {
+            "Content-Type": "text/xml; charset=utf-8",
+            "SOAPAction": f'"{NS_SONOS}#{action}"',
+            "User-Agent": "Linux UPnP/1.0 Sonos/80.1-55240",
+        }
+        return envelope.encode("utf-8"), headers
+
+    def _call(self, action: str, body_xml: str, timeout: int = 10,
+              retries: int = 1) -> ET.Element:
+        """Make an authenticated SMAPI SOAP call and return the parsed Body element.
+
+        retries defaults to one resend, which is only safe for read actions;
+        pass retries=0 for anything that changes server-side state.
+        """
+        data, headers = self._request(action, body_xml)
         try:
-            with urllib.request.urlopen(req, timeout=timeout) as resp:
-                root = ET.fromstring(resp.read())
+            root = ET.fromstring(transport.fetch(self.endpoint, data=data, headers=headers,
+                                                 timeout=timeout, retries=retries))
         except urllib.error.HTTPError as e:
-            body = e.read().decode("utf-8", errors="replace")
-            self._raise_soap_fault(body)
-            raise SmapiError(f"HTTP {e.code}", str(e.code))
+            self._raise_http_error(e)
 
         # Check for SOAP faults in 200 responses
         fault = root.find(".//s:Fault", _NAMESPACES)
@@ -119,6 +141,32 @@ class SmapiClient:
         body = root.find("s:Body", _NAMESPACES)
         return body
 
+    def _call_items(self, action: str, body_xml: str,
+                    timeout: int = 10) -> Tuple[List[Dict], int]:
+        """Make a search/getMetadata call, parsing items as the response streams in.
+
+        Returns (items, total); total falls back to len(items) when the
+        response does not report it.
+        """
+        data, headers = self._request(action, body_xml)
+        parser = _ItemParser()
+        items = []
+        try:
+            for chunk in transport.stream(self.endpoint, data=data, headers=headers,
+                                          timeout=timeout, retries=1):
+                items.extend(parser.feed(chunk))
+            items.extend(parser.close())
+        except urllib.error.HTTPError as e:
+            self._raise_http_error(e)
+        if parser.fault is not None:
+            self._raise_from_fault(parser.fault)
+        return items, parser.total or len(items)
+
+    def _raise_http_error(self, e: urllib.error.HTTPError) -> None:
+        body = e.read().decode("utf-8", errors="replace")
+        self._raise_soap_fault(body)
+        raise SmapiError(f"HTTP {e.code}", str(e.code))
+
     def _raise_soap_fault(self, response_text: str) -> None:
         """Parse a SOAP fault from error response body and raise."""
         try:
@@ -186,8 +234,7 @@ class SmapiClient:
             f"<ns:count>{count}</ns:count>"
             "</ns:search>"
         )
-        resp_body = self._call("search", body)
-        return self._parse_search_response(resp_body)
+        return self._call_items("search", body)
 
     def get_metadata(
         self, item_id: str, index: int = 0, count: int = 100
@@ -209,8 +256,58 @@ class SmapiClient:
             f"<ns:count>{count}</ns:count>"
             "</ns:getMetadata>"
         )
-        resp_body = self._call("getMetadata", body)
-        return self._parse_search_response(resp_body)
+        return self._call_items("getMetadata", body)
+
+    def iter_metadata(
+        self, item_id: str, page_size: int = 200, workers: int = 4,
+        first_page: Optional[Tuple[List[Dict], int]] = None,
+    ) -> Iterator[Dict]:
+        """Yield every child of an item, paging through getMetadata.
+
+        The first page is yielded as soon as it arrives. Once it reports the
+        total, the remaining pages are fetched concurrently (up to workers at
+        a time) and yielded in order. The page size the service actually
+        returned is used for the follow-up pages, in case it caps count; a
+        follow-up page that still comes back short is completed before the
+        next one is yielded, so no range is silently skipped.
+
+        first_page is an (items, total) reply for index 0 the caller already
+        has; it is used instead of fetching the first page again.
+        """
+        if first_page is None:
+            first_page = self.get_metadata(item_id, index=0, count=page_size)
+        items, total = first_page
+        yield from items
+        step = len(items)
+        if not step or step >= total:
+            return
+        indexes = range(step, total, step)
+        with ThreadPoolExecutor(max_workers=min(workers, len(indexes))) as pool:
+            futures = [pool.submit(self.get_metadata, item_id, index, step)
+                       for index in indexes]
+            try:
+                for index, future in zip(indexes, futures):
+                    page, _ = future.result()
+                    yield from page
+                    got, end = len(page), min(index + step, total)
+                    while page and index + got < end:
+                        page, _ = self.get_metadata(item_id, index + got, end - index - got)
+                        yield from page
+                        got += len(page)
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def get_all_metadata(
+        self, item_id: str, page_size: int = 200, workers: int = 4
+    ) -> List[Dict]:
+        """Return every child of an item, however many pages it spans.
+
+        Pages after the first are fetched concurrently (see iter_metadata),
+        so a large container takes about two round trips rather than one per
+        page.
+        """
+        return list(self.iter_metadata(item_id, page_size=page_size, workers=workers))
 
     def get_media_metadata(self, item_id: str) -> Optional[Dict]:
         """Get metadata for a single item.
@@ -231,13 +328,44 @@ class SmapiClient:
                     return self._parse_item(item)
         return None
 
+    def refresh_due_in(self) -> float:
+        """Seconds until the token should be rotated (0 if its age is unknown)."""
+        if self.token_issued_at is None:
+            return 0.0
+        return self.token_issued_at + self.token_lifetime * REFRESH_AT - time.time()
+
+    def note_token_expired(self, token: str) -> None:
+        """Learn the token lifetime from a call rejected with AuthTokenExpired."""
+        if token != self.token or self.token_issued_at is None:
+            return
+        age = time.time() - self.token_issued_at
+        if _MIN_LEARNED_LIFETIME <= age < self.token_lifetime:
+            self.token_lifetime = age
+            log.info("SMAPI token expired after %.0f min, rotating earlier from now on", age / 60)
+
+    def refresh_if_current(self, stale_token: str) -> Optional[Tuple[str, str]]:
+        """Single-flight refresh: rotate the token unless stale_token was
+        already replaced, e.g. by a concurrent caller whose refresh this one
+        waited for. Returns (new_token, new_key) if this call refreshed, else None.
+        """
+        with self._refresh_lock:
+            if self.token != stale_token:
+                return None
+            return self.refresh_auth_token()
+
     def refresh_auth_token(self) -> Tuple[str, str]:
         """Call refreshAuthToken to get a new token/key pair.
 
         Updates self.token and self.key in-place and returns (new_token, new_key).
         """
+        with self._refresh_lock:
+            return self._refresh_auth_token()
+
+    def _refresh_auth_token(self) -> Tuple[str, str]:
         body = "<ns:refreshAuthToken/>"
-        resp_body = self._call("refreshAuthToken", body)
+        # Not retried: a refresh that reached the server may already have
+        # rotated the key, and a resend would present the old one.
+        resp_body = self._call("refreshAuthToken", body, retries=0)
 
         new_token = None
         new_key = None
@@ -251,57 +379,96 @@ class SmapiClient:
         if new_token and new_key:
             self.token = new_token
             self.key = new_key
+            self.token_issued_at = time.time()
             log.info("SMAPI token refreshed successfully")
             return new_token, new_key
 
         raise SmapiError("refreshAuthToken returned no credentials")
 
-    def _parse_search_response(self, body: ET.Element) -> Tuple[List[Dict], int]:
-        """Parse search or getMetadata response body into items list."""
-        items = []
-        total = 0
+    def _parse_item(self, elem: ET.Element) -> Optional[Dict]:
+        """Parse a mediaCollection or mediaMetadata element into a dict."""
+        item = _new_item(elem.tag)
+        for child in elem.iter():
+            _set_field(item, child.tag, child.text)
+        return item if "id" in item else None
 
-        for elem in body.iter():
-            tag = elem.tag.split("}")[-1] if "}" in elem.tag else elem.tag
-            if tag == "total" and elem.text:
-                try:
-                    total = int(elem.text)
-                except ValueError:
-                    pass
-            if tag in ("mediaCollection", "mediaMetadata"):
-                item = self._parse_item(elem)
-                if item:
-                    items.append(item)
 
-        if not total:
-            total = len(items)
-        return items, total
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
 
-    def _parse_item(self, elem: ET.Element) -> Optional[Dict]:
-        """Parse a mediaCollection or mediaMetadata element into a dict."""
-        tag = elem.tag.split("}")[-1] if "}" in elem.tag else elem.tag
-        item_type = "collection" if tag == "mediaCollection" else "track"
 
-        item = {"item_type": item_type}
+def _qualified(names):
+    """Names as they appear in parsed tags, in the SMAPI namespace or none."""
+    qualified = {n: n for n in names}
+    qualified.update({f"{{{NS_SONOS}}}{n}": n for n in names})
+    return qualified
 
-        for child in elem.iter():
-            child_tag = child.tag.split("}")[-1] if "}" in child.tag else child.tag
-            if child.text is None:
-                continue
-            if child_tag == "id":
-                item["id"] = child.text
-            elif child_tag == "title":
-                item["title"] = child.text
-            elif child_tag == "artist":
-                item["artist"] = child.text
-            elif child_tag == "albumArtURI":
-                item["album_art_uri"] = child.text
-            elif child_tag == "album":
-                item["album"] = child.text
-            elif child_tag == "itemType":
-                item["item_type"] = child.text
 
-        return item if "id" in item else None
+_ITEM_TAGS = _qualified(("mediaCollection", "mediaMetadata"))
+_FIELD_KEYS = {
+    "id": "id",
+    "title": "title",
+    "artist": "artist",
+    "albumArtURI": "album_art_uri",
+    "album": "album",
+    "itemType": "item_type",
+}
+_ITEM_FIELDS = {tag: _FIELD_KEYS[name] for tag, name in _qualified(_FIELD_KEYS).items()}
+_TOTAL_TAGS = _qualified(("total",))
+
+
+def _new_item(tag: str) -> Dict:
+    return {"item_type": "collection" if _local_name(tag) == "mediaCollection" else "track"}
+
+
+def _set_field(item: Dict, tag: str, text: Optional[str]) -> None:
+    key = _ITEM_FIELDS.get(tag)
+    if key is not None and text is not None:
+        item[key] = text
+
+
+class _ItemParser:
+    """Incremental parser for search and getMetadata responses.
+
+    feed() takes the next chunk of the HTTP body and returns the items
+    completed by it. Only end events are read: an item is converted when its
+    element closes and is cleared straight away, so memory stays at about one
+    item however long the response is, and each element is visited once. A
+    SOAP Fault is kept whole in .fault for the caller to raise.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("end",))
+        self.total = 0
+        self.fault = None  # type: Optional[ET.Element]
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        self._parser.feed(chunk)
+        return self._read_events()
+
+    def close(self) -> List[Dict]:
+        self._parser.close()
+        return self._read_events()
+
+    def _read_events(self) -> List[Dict]:
+        done = []
+        for _, elem in self._parser.read_events():
+            tag = elem.tag
+            if tag in _ITEM_TAGS:
+                item = _new_item(tag)
+                for child in elem.iter():
+                    _set_field(item, child.tag, child.text)
+                if "id" in item:
+                    done.append(item)
+                elem.clear()
+            elif tag in _TOTAL_TAGS and elem.text:
+                try:
+                    self.total = int(elem.text)
+                except ValueError:
+                    pass
+            elif _local_name(tag) == "Fault":
+                self.fault = elem
+        return done
 
 
 def _xml_escape(text: str) -> str:
@@ -3,9 +3,10 @@ import json
 import logging
 import urllib.error
 import urllib.parse
-import urllib.request
 from typing import Dict, List, Tuple
 
+from providers import transport
+
 log = logging.getLogger(__name__)
 
 SONOS_AUTH_URL = "https://api.sonos.com/login/v3/oauth"
@@ -81,18 +82,12 @@ class SonosControlClient:
 
     def _token_request(self, data: bytes) -> Tuple[str, str, int]:
         log.debug("Token request to %s body=%s", SONOS_TOKEN_URL, data.decode())
-        req = urllib.request.Request(
-            SONOS_TOKEN_URL,
-            data=data,
-            headers={
-                "Authorization": f"Basic {self._basic_auth}",
-                "Content-Type": "application/x-www-form-urlencoded",
-            },
-            method="POST",
-        )
+        headers = {
+            "Authorization": f"Basic {self._basic_auth}",
+            "Content-Type": "application/x-www-form-urlencoded",
+        }
         try:
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                body = json.loads(resp.read())
+            body = json.loads(transport.fetch(SONOS_TOKEN_URL, data=data, headers=headers))
         except urllib.error.HTTPError as e:
             raw = b""
             try:
@@ -109,16 +104,12 @@ class SonosControlClient:
         )
 
     def _api_get(self, path: str, access_token: str) -> Dict:
-        req = urllib.request.Request(
-            f"{SONOS_API_BASE}{path}",
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json",
-            },
-        )
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        }
         try:
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                return json.loads(resp.read())
+            return json.loads(transport.fetch(f"{SONOS_API_BASE}{path}", headers=headers))
         except urllib.error.HTTPError as e:
             raw = b""
             try:
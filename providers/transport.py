@@ -0,0 +1,178 @@
+"""Shared keep-alive HTTP transport for provider and Sonos cloud calls.
+
+A bare urllib.request.urlopen() opens a new connection per call, so every
+iTunes lookup, SMAPI request and Sonos API call pays DNS, TCP and TLS setup
+again (hundreds of ms against sonos-music.apple.com on a Pi). Transport keeps
+one requests.Session per host with a small connection pool, so the TLS
+connection is reused between calls for as long as the server keeps it open.
+
+fetch() returns the response body; stream() yields it in chunks as it
+arrives, for incremental parsers. Error statuses raise
+urllib.error.HTTPError (carrying the body, like urlopen), so callers keep
+their existing error handling and core.health still tells HTTP replies apart
+from network failures (requests' ConnectionError/Timeout are OSErrors).
+
+Retries: idempotent calls (GET by default) are retried on connection errors
+and on 429/502/503/504 with exponential backoff and jitter. Timeouts and
+hosts that do not resolve are not retried: the call has already used its
+budget or the network is down, and retrying would only delay offline mode.
+Per-host request, error and latency counters are kept for the hardware
+settings page.
+"""
+import io
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:  # pragma: no cover - urllib3 < 2 reports DNS failures generically
+    NameResolutionError = ()
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 2  # for GETs; other methods default to no retries
+BACKOFF_SECS = 0.2
+POOL_SIZE = 8  # concurrent calls per host (search hedging, playlist page workers)
+RETRY_STATUSES = (429, 502, 503, 504)
+CHUNK_SIZE = 16 * 1024
+
+
+class Transport:
+    """Thread-safe per-host session pool with retries and counters."""
+
+    def __init__(self, pool_size=POOL_SIZE, retries=DEFAULT_RETRIES, backoff=BACKOFF_SECS):
+        self._pool_size = pool_size
+        self._retries = retries
+        self._backoff = backoff
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._stats = {}  # host -> counters
+
+    def session(self, host):
+        """Return the keep-alive session used for calls to host."""
+        with self._lock:
+            sess = self._sessions.get(host)
+            if sess is None:
+                sess = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                self._sessions[host] = sess
+            return sess
+
+    def fetch(self, url, data=None, headers=None, timeout=DEFAULT_TIMEOUT,
+              retries=None, method=None):
+        """Send a request and return the response body as bytes.
+
+        method defaults to POST when data is given, else GET. retries
+        defaults to DEFAULT_RETRIES for GET and 0 otherwise.
+        """
+        return self._send(url, data, headers, timeout, retries, method, stream=False).content
+
+    def stream(self, url, data=None, headers=None, timeout=DEFAULT_TIMEOUT,
+               retries=None, method=None, chunk_size=CHUNK_SIZE):
+        """Like fetch(), but yield the body in chunks as they arrive, so a
+        large response can be parsed without holding all of it. The request
+        is sent when iteration starts."""
+        resp = self._send(url, data, headers, timeout, retries, method, stream=True)
+        with resp:
+            yield from resp.iter_content(chunk_size)
+
+    def _send(self, url, data, headers, timeout, retries, method, stream):
+        method = method or ("POST" if data is not None else "GET")
+        if retries is None:
+            retries = self._retries if method == "GET" else 0
+        host = urllib.parse.urlsplit(url).hostname or ""
+        sess = self.session(host)
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                resp = sess.request(method, url, data=data, headers=headers, timeout=timeout,
+                                    stream=stream)
+            except requests.Timeout:
+                self._record(host, started, error=True)
+                raise
+            except requests.ConnectionError as e:
+                self._record(host, started, error=True)
+                if attempt >= retries or _unresolved(e):
+                    raise
+                log.debug("%s %s failed (%s), retrying", method, host, e)
+            else:
+                self._record(host, started, http_error=resp.status_code >= 400)
+                if resp.status_code < 400:
+                    return resp
+                body = resp.content
+                resp.close()
+                if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+                    raise urllib.error.HTTPError(url, resp.status_code, resp.reason,
+                                                 resp.headers, io.BytesIO(body))
+                log.debug("%s %s returned %d, retrying", method, host, resp.status_code)
+            attempt += 1
+            self._count(host, "retries")
+            time.sleep(self._backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    def _entry(self, host):
+        # Caller holds self._lock.
+        return self._stats.setdefault(host, {
+            "requests": 0, "errors": 0, "http_errors": 0, "retries": 0,
+            "total_ms": 0.0, "last_ms": 0.0,
+        })
+
+    def _record(self, host, started, error=False, http_error=False):
+        ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            entry = self._entry(host)
+            entry["requests"] += 1
+            entry["errors"] += error
+            entry["http_errors"] += http_error
+            entry["total_ms"] += ms
+            entry["last_ms"] = ms
+
+    def _count(self, host, name):
+        with self._lock:
+            self._entry(host)[name] += 1
+
+    def stats(self):
+        """Per-host counters: requests, errors (no response), http_errors
+        (4xx/5xx replies), retries, avg_ms, last_ms."""
+        with self._lock:
+            return {
+                host: {
+                    "requests": e["requests"], "errors": e["errors"],
+                    "http_errors": e["http_errors"], "retries": e["retries"],
+                    "avg_ms": round(e["total_ms"] / e["requests"]) if e["requests"] else 0,
+                    "last_ms": round(e["last_ms"]),
+                }
+                for host, e in self._stats.items()
+            }
+
+
+def _unresolved(exc):
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, NameResolutionError)
+
+
+_default = Transport()
+
+
+def fetch(url, **kwargs):
+    """Send a request through the shared transport (see Transport.fetch)."""
+    return _default.fetch(url, **kwargs)
+
+
+def stream(url, **kwargs):
+    """Stream a response through the shared transport (see Transport.stream)."""
+    return _default.stream(url, **kwargs)
+
+
+def stats():
+    return _default.stats()
@@ -129,3 +129,21 @@ def temp_config(tmp_path, monkeypatch):
     import app
     monkeypatch.setattr(app, "CONFIG_PATH", str(config_file))
     return config_file
+
+
+# --- Module-level caches ---
+
+@pytest.fixture(autouse=True)
+def reset_sonos_state(monkeypatch):
+    """Give each test an empty SoCo session pool, topology cache, now-playing
+    snapshot and provider caches so cached state never leaks between tests."""
+    from core import sonos_player
+    from core.now_playing import NowPlayingMonitor
+    from core.session_pool import SessionPool
+    from core.topology import TopologyCache
+    monkeypatch.setattr(sonos_player, "_pool", SessionPool())
+    monkeypatch.setattr(sonos_player, "_topology", TopologyCache())
+    monkeypatch.setattr(sonos_player, "_now_playing", NowPlayingMonitor())
+    import providers
+    providers.get_provider("apple")._track_album_cache.clear()
+    providers.get_provider("apple")._search_cache.clear()
@@ -2,6 +2,7 @@ import json
 import pytest
 from unittest.mock import ANY, patch, MagicMock
 import providers
+from soco.exceptions import SoCoUPnPException
 
 
 SAMPLE_ALBUMS = [
@@ -371,7 +372,8 @@ class TestPlay:
             resp = client.post("/play", json={"album_id": "1440903625"})
         assert resp.status_code == 200
         mock_play.assert_called_once_with("10.0.0.12", SAMPLE_TRACKS, ANY, "3",
-                                          speaker_name="Family Room", config_path=ANY)
+                                          speaker_name="Family Room", config_path=ANY,
+                                          stream=True)
 
     def test_plays_track(self, client, temp_config):
         with patch.object(providers.get_provider("apple"), "get_track", return_value=SAMPLE_SINGLE_TRACK), \
@@ -379,7 +381,8 @@ class TestPlay:
             resp = client.post("/play", json={"track_id": "1440904001"})
         assert resp.status_code == 200
         mock_play.assert_called_once_with("10.0.0.12", SAMPLE_SINGLE_TRACK, ANY, "3",
-                                          speaker_name="Family Room", config_path=ANY)
+                                          speaker_name="Family Room", config_path=ANY,
+                                          stream=True)
 
     def test_returns_ok(self, client, temp_config):
         with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
@@ -614,6 +617,39 @@ class TestSettingsHardware:
             resp = client.get("/settings/hardware")
         assert b"Not connected" in resp.data
 
+    def test_renders_sonos_pool_stats(self, client, temp_config):
+        stats = {**FAKE_HW_STATS, "sonos_pool": {"hits": 41, "misses": 2, "resets": 1,
+                                                 "sessions": 1}}
+        with patch("app._get_hardware_stats", return_value=stats):
+            resp = client.get("/settings/hardware")
+        assert b"41 hits / 2 misses" in resp.data
+        assert b"1 session resets" in resp.data
+
+    def test_renders_provider_cache_hit_rate(self, client, temp_config):
+        stats = {**FAKE_HW_STATS, "provider_caches": {"track_album": {
+            "hits": 3, "negative_hits": 0, "misses": 1, "evictions": 0, "size": 1, "hit_rate": 0.75}}}
+        with patch("app._get_hardware_stats", return_value=stats):
+            resp = client.get("/settings/hardware")
+        assert b"Track album" in resp.data
+        assert b"75% hits" in resp.data
+
+    def test_renders_coalesced_lookups(self, client, temp_config):
+        stats = {**FAKE_HW_STATS, "provider_caches": {"search": {"size": 0, "hit_rate": 0.0}},
+                 "provider_coalescing": {"calls": 12, "coalesced": 5, "upstream": 7,
+                                         "in_flight": 0}}
+        with patch("app._get_hardware_stats", return_value=stats):
+            resp = client.get("/settings/hardware")
+        assert b"5 of 12 joined a request in flight" in resp.data
+
+    def test_renders_collection_warmer_progress(self, client, temp_config):
+        stats = {**FAKE_HW_STATS, "collection_warmer": {
+            "running": True, "total": 40, "done": 12, "warmed": 5, "failed": 1,
+            "passes": 0, "last_pass_at": None}}
+        with patch("app._get_hardware_stats", return_value=stats):
+            resp = client.get("/settings/hardware")
+        assert b"Warming 12 / 40" in resp.data
+        assert b"5 refreshed, 1 failed" in resp.data
+
     def test_renders_power_ok(self, client, temp_config):
         stats = {**FAKE_HW_STATS, "throttle_ok": True, "throttle_flags": []}
         with patch("app._get_hardware_stats", return_value=stats):
@@ -991,6 +1027,29 @@ class TestDetectSn:
         resp = client.get("/detect-sn")
         assert resp.status_code == 400
 
+    @pytest.fixture
+    def identity(self, tmp_path, monkeypatch):
+        import app
+        from core.speaker_identity import SpeakerIdentityStore
+        store = SpeakerIdentityStore(str(tmp_path / "speaker_identity.json"))
+        monkeypatch.setattr(app, "_speaker_identity", store)
+        return store
+
+    def test_detect_always_probes_and_updates_store(self, client, temp_config, identity):
+        identity.update(sn="3")
+        with patch.object(providers.get_provider("apple"), "detect_sn", return_value="5") as mock_detect:
+            resp = client.get("/detect-sn")
+        mock_detect.assert_called_once()
+        assert resp.get_json()["sn"] == "5"
+        assert identity.get("sn") == "5"
+
+    def test_other_speaker_ip_is_not_cached(self, client, temp_config, identity):
+        identity.update(sn="3")
+        with patch.object(providers.get_provider("apple"), "detect_sn", return_value="5"):
+            resp = client.get("/detect-sn?speaker_ip=10.0.0.99")
+        assert resp.get_json()["sn"] == "5"
+        assert identity.get("sn") == "3"
+
 
 class TestNowPlaying:
     def test_returns_playing_false_when_nothing_playing(self, client, temp_config):
@@ -1051,6 +1110,80 @@ class TestNowPlaying:
         assert data["album_id"] is None
         assert data["artwork_url"] is None
 
+    def test_repeated_polls_reuse_track_lookup(self, client, temp_config):
+        info = {"title": "Track One", "artist": "Test Artist", "album": "Test Album",
+                "track_id": 1440904001, "paused": False}
+        with patch("app.get_now_playing", return_value=info), \
+             patch("app.get_volume", return_value=20), \
+             patch.object(providers.get_provider("apple"), "get_track",
+                          return_value=SAMPLE_SINGLE_TRACK) as mock_get_track:
+            client.get("/now-playing")
+            resp = client.get("/now-playing")
+        mock_get_track.assert_called_once_with(1440904001)
+        assert resp.get_json()["album_id"] == 1440903625
+
+
+class TestEvents:
+    def test_stream_starts_with_retry_and_latest_state(self, client, monkeypatch):
+        import app
+        from core.event_hub import EventHub
+        hub = EventHub()
+        monkeypatch.setattr(app, "_events", hub)
+        hub.publish("now-playing", {"playing": False})
+        resp = client.get("/events", buffered=False)
+        assert resp.mimetype == "text/event-stream"
+        chunks = iter(resp.response)
+        assert next(chunks).decode().startswith("retry: ")
+        assert "event: now-playing" in next(chunks).decode()
+        assert hub.client_count() == 1
+        resp.close()
+        assert hub.client_count() == 0
+
+    def test_heartbeat_when_idle(self, client, monkeypatch):
+        import app
+        from core.event_hub import EventHub
+        monkeypatch.setattr(app, "_events", EventHub())
+        monkeypatch.setattr(app, "_SSE_HEARTBEAT_SECS", 0.01)
+        resp = client.get("/events", buffered=False)
+        chunks = iter(resp.response)
+        next(chunks)
+        assert next(chunks).decode() == ": heartbeat\n\n"
+        resp.close()
+
+    def test_publish_now_playing_splits_volume(self, client, temp_config, monkeypatch):
+        import app
+        from core.event_hub import EventHub
+        hub = EventHub()
+        monkeypatch.setattr(app, "_events", hub)
+        q = hub.subscribe()
+        with patch("app.get_now_playing", return_value={
+            "title": "Some Radio", "artist": "", "album": "", "track_id": None, "paused": False
+        }), patch("app.get_volume", return_value=30):
+            app._publish_now_playing()
+        messages = [q.get_nowait(), q.get_nowait()]
+        assert "event: now-playing" in messages[0] and "Some Radio" in messages[0]
+        assert "volume" not in messages[0]
+        assert "event: volume" in messages[1] and "30" in messages[1]
+
+    def test_play_tag_announces_tap(self, client, temp_config, monkeypatch):
+        import app
+        from core.event_hub import EventHub
+        hub = EventHub()
+        monkeypatch.setattr(app, "_events", hub)
+        q = hub.subscribe()
+        with patch("app.play_album"), \
+             patch.object(providers.get_provider("apple"), "get_album_tracks",
+                          return_value=SAMPLE_TRACKS):
+            client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert "event: tap" in q.get_nowait()
+
+    def test_transport_wakes_publisher(self, client, temp_config):
+        import app
+        app._now_playing_dirty.clear()
+        with patch("app.pause"):
+            client.post("/transport", json={"action": "pause"})
+        assert app._now_playing_dirty.is_set()
+
 
 class TestHealth:
     def test_returns_200(self, client):
@@ -1146,7 +1279,8 @@ class TestPlayTag:
             resp = client.post("/play/tag", json={"tag": "apple:1440903625"})
         assert resp.status_code == 200
         mock_play.assert_called_once_with("10.0.0.12", SAMPLE_TRACKS, ANY, "3",
-                                          speaker_name="Family Room", config_path=ANY)
+                                          speaker_name="Family Room", config_path=ANY,
+                                          stream=True)
 
     def test_plays_track_tag(self, client, temp_config):
         with patch.object(providers.get_provider("apple"), "get_track", return_value=SAMPLE_SINGLE_TRACK), \
@@ -1154,7 +1288,8 @@ class TestPlayTag:
             resp = client.post("/play/tag", json={"tag": "apple:track:1440904001"})
         assert resp.status_code == 200
         mock_play.assert_called_once_with("10.0.0.12", SAMPLE_SINGLE_TRACK, ANY, "3",
-                                          speaker_name="Family Room", config_path=ANY)
+                                          speaker_name="Family Room", config_path=ANY,
+                                          stream=True)
 
     def test_invalid_tag_returns_400(self, client, temp_config):
         resp = client.post("/play/tag", json={"tag": "notvalid"})
@@ -1164,6 +1299,15 @@ class TestPlayTag:
         resp = client.post("/play/tag", json={})
         assert resp.status_code == 400
 
+    def test_streaming_start_can_be_disabled(self, client, temp_config):
+        config = json.loads(temp_config.read_text())
+        config["streaming_start"] = False
+        temp_config.write_text(json.dumps(config))
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
+             patch("app.play_album") as mock_play:
+            client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert mock_play.call_args.kwargs["stream"] is False
+
     def test_unknown_album_tag_returns_404(self, client, temp_config):
         with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=[]), \
              patch("app.play_album") as mock_play:
@@ -1192,6 +1336,27 @@ class TestCollection:
         resp = client.get("/collection")
         assert b"No tags written yet" in resp.data
 
+    def test_unavailable_tags_flagged(self, client):
+        tags = [{"tag_string": "apple:1", "type": "album", "name": "Gone", "artist": "B",
+                 "artwork_url": "", "album_id": 1, "written_at": "2024-01-01"},
+                {"tag_string": "apple:2", "type": "album", "name": "Here", "artist": "B",
+                 "artwork_url": "", "album_id": 2, "written_at": "2024-01-01"}]
+        with patch("app._load_tags", return_value=tags), \
+             patch.object(providers.get_provider("apple"), "is_unavailable",
+                          side_effect=lambda tag_type, item_id: item_id == "1") as mock_dead:
+            resp = client.get("/collection")
+        assert b'"unavailable": true' in resp.data
+        assert b'"unavailable": false' in resp.data
+        mock_dead.assert_any_call("album", "1")
+
+    def test_unparseable_tag_not_flagged(self, client):
+        tags = [{"tag_string": "garbage", "type": "album", "name": "X", "artist": "B",
+                 "artwork_url": "", "album_id": 1, "written_at": "2024-01-01"}]
+        with patch("app._load_tags", return_value=tags):
+            resp = client.get("/collection")
+        assert resp.status_code == 200
+        assert b'"unavailable": false' in resp.data
+
     def test_delete_removes_entry(self, client, tmp_path, monkeypatch):
         import app
         tags_file = tmp_path / "tags.json"
@@ -1399,24 +1564,47 @@ class TestLoadTags:
         assert app._load_tags() == []
 
 
+class TestPlaylistPage:
+    def test_streams_tracks(self, client):
+        tracks = [{"name": f"Song {i}", "artist": "A", "album": "B", "track_id": i} for i in range(1, 4)]
+        provider = providers.get_provider("apple")
+        with patch.object(provider, "get_playlist_info", return_value={"title": "Road Trip", "artwork_url": ""}), \
+             patch.object(provider, "iter_playlist_tracks", return_value=iter(tracks)):
+            resp = client.get("/playlist/p.ABC")
+            assert resp.is_streamed
+            body = resp.get_data(as_text=True)
+        assert "Road Trip" in body
+        assert "Song 3" in body
+        assert '/track/2' in body
+
+    def test_unknown_playlist_404(self, client):
+        with patch.object(providers.get_provider("apple"), "get_playlist_info", return_value=None):
+            resp = client.get("/playlist/p.NOPE")
+        assert resp.status_code == 404
+
+
 class TestPrintInserts:
     def test_single_album_returns_200(self, client):
-        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS):
+        with patch.object(providers.get_provider("apple"), "get_albums_tracks",
+                          return_value={1440903625: SAMPLE_TRACKS}):
             resp = client.get("/print?ids=1440903625")
         assert resp.status_code == 200
 
     def test_renders_album_name(self, client):
-        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS):
+        with patch.object(providers.get_provider("apple"), "get_albums_tracks",
+                          return_value={1440903625: SAMPLE_TRACKS}):
             resp = client.get("/print?ids=1440903625")
         assert b"Test Album" in resp.data
 
     def test_renders_artist(self, client):
-        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS):
+        with patch.object(providers.get_provider("apple"), "get_albums_tracks",
+                          return_value={1440903625: SAMPLE_TRACKS}):
             resp = client.get("/print?ids=1440903625")
         assert b"Test Artist" in resp.data
 
     def test_renders_track_names(self, client):
-        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS):
+        with patch.object(providers.get_provider("apple"), "get_albums_tracks",
+                          return_value={1440903625: SAMPLE_TRACKS}):
             resp = client.get("/print?ids=1440903625")
         assert b"Track One" in resp.data
         assert b"Track Two" in resp.data
@@ -1428,11 +1616,13 @@ class TestPrintInserts:
         tracks_b = [{"track_id": 2, "name": "Song B", "track_number": 1,
                      "artist": "Artist B", "album": "Album B",
                      "artwork_url": "https://example.com/b.jpg"}]
-        with patch.object(providers.get_provider("apple"), "get_album_tracks", side_effect=[tracks_a, tracks_b]):
+        with patch.object(providers.get_provider("apple"), "get_albums_tracks",
+                          return_value={111: tracks_a, 222: tracks_b}) as mock_batch:
             resp = client.get("/print?ids=111,222")
         assert resp.status_code == 200
         assert b"Album A" in resp.data
         assert b"Album B" in resp.data
+        mock_batch.assert_called_once_with([111, 222])
 
     def test_missing_ids_param_returns_400(self, client):
         resp = client.get("/print")
@@ -1447,7 +1637,8 @@ class TestPrintInserts:
         assert resp.status_code == 400
 
     def test_all_ids_not_found_returns_404(self, client):
-        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=[]):
+        with patch.object(providers.get_provider("apple"), "get_albums_tracks",
+                          return_value={9999999: []}):
             resp = client.get("/print?ids=9999999")
         assert resp.status_code == 404
 
@@ -1455,7 +1646,8 @@ class TestPrintInserts:
         tracks_a = [{"track_id": 1, "name": "Song A", "track_number": 1,
                      "artist": "Artist A", "album": "Album A",
                      "artwork_url": "https://example.com/a.jpg"}]
-        with patch.object(providers.get_provider("apple"), "get_album_tracks", side_effect=[tracks_a, []]):
+        with patch.object(providers.get_provider("apple"), "get_albums_tracks",
+                          return_value={111: tracks_a, 999: []}):
             resp = client.get("/print?ids=111,999")
         assert resp.status_code == 200
         assert b"Album A" in resp.data
@@ -1644,6 +1836,289 @@ class TestNfcLoop:
         mock_thread.assert_not_called()
 
 
+class TestArtworkProxy:
+    KEY = "is1-ssl.mzstatic.com/image/thumb/Music/v4/ab/cd/600x600bb.jpg"
+
+    @pytest.fixture
+    def artwork_cache(self, tmp_path, monkeypatch):
+        import app
+        from providers.artwork import ArtworkCache
+        cache = ArtworkCache(str(tmp_path / "artwork"))
+        monkeypatch.setattr(app, "_artwork", cache)
+        return cache
+
+    def test_serves_cached_image_with_cache_headers(self, client, artwork_cache):
+        with patch("providers.transport.fetch", return_value=b"\xff\xd8jpeg") as mock_fetch:
+            resp = client.get(f"/artwork/{self.KEY}?size=300")
+            again = client.get(f"/artwork/{self.KEY}?size=300",
+                               headers={"If-None-Match": resp.headers["ETag"]})
+        assert resp.status_code == 200
+        assert resp.data == b"\xff\xd8jpeg"
+        assert resp.mimetype == "image/jpeg"
+        assert "max-age=31536000" in resp.headers["Cache-Control"]
+        assert again.status_code == 304
+        assert mock_fetch.call_count == 1
+        assert mock_fetch.call_args[0][0].endswith("/300x300bb.jpg")
+
+    def test_unknown_size_rejected(self, client, artwork_cache):
+        assert client.get(f"/artwork/{self.KEY}?size=123").status_code == 400
+
+    def test_other_hosts_not_proxied(self, client, artwork_cache):
+        assert client.get("/artwork/example.com/a.jpg").status_code == 404
+
+    @pytest.mark.parametrize("key", [
+        "evil.example%3F.mzstatic.com/x.jpg",
+        "evil.example%23.mzstatic.com/x.jpg",
+        "10.0.0.1:8080%23.mzstatic.com/x.jpg",
+        "is1-ssl.mzstatic.com:8443/x.jpg",
+    ])
+    def test_smuggled_hosts_not_fetched_or_redirected(self, client, artwork_cache, key):
+        with patch("providers.transport.fetch") as mock_fetch:
+            resp = client.get(f"/artwork/{key}")
+        assert resp.status_code == 404
+        mock_fetch.assert_not_called()
+
+    def test_fetch_failure_redirects_upstream(self, client, artwork_cache):
+        with patch("providers.transport.fetch", side_effect=OSError("offline")):
+            resp = client.get(f"/artwork/{self.KEY}")
+        assert resp.status_code == 302
+        assert resp.headers["Location"] == f"https://{self.KEY}"
+
+    def test_collection_uses_thumbnails(self, client):
+        tags = [{"tag_string": "apple:1", "type": "album", "name": "A", "artist": "B",
+                 "artwork_url": f"https://{self.KEY}", "album_id": 1, "written_at": "2024-01-01"}]
+        with patch("app._load_tags", return_value=tags):
+            resp = client.get("/collection")
+        assert f"/artwork/{self.KEY}?size=300".encode() in resp.data
+
+
+class TestOfflinePlayback:
+    """Taps report the path used; offline mode plays from cached data only."""
+
+    @pytest.fixture
+    def offline(self, monkeypatch):
+        import app
+        from core.health import HealthMonitor
+        health = HealthMonitor(probe=lambda: None, failure_threshold=1, probe_interval=3600)
+        health._offline = True
+        monkeypatch.setattr(app, "_health", health)
+        return health
+
+    def test_lookup_path_reported(self, client, temp_config):
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
+             patch("app.play_album"):
+            resp = client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert resp.get_json()["path"] == "lookup"
+
+    def test_offline_path_reported(self, client, temp_config, offline):
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
+             patch("app.play_album") as mock_album:
+            resp = client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert resp.get_json()["path"] == "offline"
+        mock_album.assert_called_once()
+
+    def test_offline_plan_not_revalidated(self, client, temp_config, offline, tmp_path, monkeypatch):
+        import app
+        from core.play_plans import PlayPlanStore
+        plans = PlayPlanStore(str(tmp_path / "play_plans.json"))
+        plans.put("apple:1440903625", {"sn": "3", "udn": "U", "items": [], "built_at": 0})
+        monkeypatch.setattr(app, "_play_plans", plans)
+        with patch("app.play_plan"), patch("app._refresh_play_plan_async") as mock_refresh:
+            resp = client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert resp.get_json()["path"] == "plan"
+        mock_refresh.assert_not_called()
+
+    def test_tap_stats_count_failures(self, client, temp_config):
+        import app
+        before = app._tap_stats.stats()["paths"].get("failed", {}).get("count", 0)
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=[]):
+            resp = client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert resp.status_code == 404
+        assert app._tap_stats.stats()["paths"]["failed"]["count"] == before + 1
+
+    def test_warmer_idle_while_offline(self, temp_config, offline):
+        import app
+        with patch.object(providers.get_provider("apple"), "refresh_metadata") as mock_refresh:
+            assert app._warm_tag("apple:1440903625") is False
+        mock_refresh.assert_not_called()
+
+    def test_hardware_page_shows_offline(self, client, temp_config):
+        stats = {**FAKE_HW_STATS, "internet": {"offline": True, "consecutive_failures": 3,
+                                               "changed_at": 0, "transitions": 1},
+                 "taps": {"paths": {"offline": {"count": 2, "avg_ms": 180, "last_ms": 150}},
+                          "last": None}}
+        with patch("app._get_hardware_stats", return_value=stats):
+            resp = client.get("/settings/hardware")
+        assert b"Offline (playing from cache)" in resp.data
+        assert b"Taps (offline)" in resp.data
+
+
+class TestWarmTag:
+    """_warm_tag gets a recorded card ready for its first tap."""
+
+    @pytest.fixture
+    def plans(self, tmp_path, monkeypatch):
+        import app
+        from core.play_plans import PlayPlanStore
+        store = PlayPlanStore(str(tmp_path / "play_plans.json"))
+        monkeypatch.setattr(app, "_play_plans", store)
+        return store
+
+    def test_builds_missing_plan(self, temp_config, plans):
+        import app
+        plan = {"sn": "3", "udn": "SA_RINCON52231_X", "items": []}
+        with patch.object(providers.get_provider("apple"), "refresh_metadata", return_value=False), \
+             patch("app._build_play_plan", return_value=plan) as mock_build:
+            assert app._warm_tag("apple:1440903625") is True
+        mock_build.assert_called_once_with("apple:1440903625")
+        assert plans.get("apple:1440903625")["udn"] == "SA_RINCON52231_X"
+
+    def test_existing_plan_not_rebuilt(self, temp_config, plans):
+        import app
+        plans.put("apple:1440903625", {"sn": "3", "udn": "U", "items": []})
+        with patch.object(providers.get_provider("apple"), "refresh_metadata",
+                          return_value=False) as mock_refresh, \
+             patch("app._build_play_plan") as mock_build:
+            assert app._warm_tag("apple:1440903625") is False
+        mock_build.assert_not_called()
+        mock_refresh.assert_called_once_with("album", "1440903625", ahead_secs=app._WARM_PASS_SECS)
+
+    def test_plan_for_other_sn_rebuilt(self, temp_config, plans):
+        import app
+        plans.put("apple:1440903625", {"sn": "5", "udn": "U", "items": []})
+        with patch.object(providers.get_provider("apple"), "refresh_metadata", return_value=False), \
+             patch("app._build_play_plan", return_value={"sn": "3", "udn": "V", "items": []}):
+            app._warm_tag("apple:1440903625")
+        assert plans.get("apple:1440903625")["sn"] == "3"
+
+
+class TestPlayPlanCache:
+    """Known tags replay their stored play plan instead of hitting the provider."""
+
+    PLAN = {"sn": "3", "udn": "SA_RINCON52231_X", "built_at": 0,
+            "items": [{"uri": "x-sonos-http:song%3a1440904001.mp4?sid=204&flags=8232&sn=3",
+                       "metadata": "<DIDL-Lite/>"}]}
+
+    @pytest.fixture
+    def plans(self, tmp_path, monkeypatch):
+        import app
+        from core.play_plans import PlayPlanStore
+        store = PlayPlanStore(str(tmp_path / "play_plans.json"))
+        monkeypatch.setattr(app, "_play_plans", store)
+        return store
+
+    def test_first_play_stores_plan(self, client, temp_config, plans):
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
+             patch("app.play_album", return_value=self.PLAN):
+            client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert plans.get("apple:1440903625")["items"] == self.PLAN["items"]
+
+    def test_known_tag_skips_provider(self, client, temp_config, plans):
+        plans.put("apple:1440903625", dict(self.PLAN, built_at=9e12))
+        with patch.object(providers.get_provider("apple"), "get_album_tracks") as mock_tracks, \
+             patch("app.play_album") as mock_album, \
+             patch("app.play_plan") as mock_plan:
+            resp = client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert resp.status_code == 200
+        mock_plan.assert_called_once()
+        mock_tracks.assert_not_called()
+        mock_album.assert_not_called()
+
+    def test_plan_for_other_sn_is_ignored(self, client, temp_config, plans):
+        plans.put("apple:1440903625", dict(self.PLAN, sn="5"))
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
+             patch("app.play_album", return_value=self.PLAN) as mock_album, \
+             patch("app.play_plan") as mock_plan:
+            client.post("/play/tag", json={"tag": "apple:1440903625"})
+        mock_album.assert_called_once()
+        mock_plan.assert_not_called()
+
+    def test_failing_plan_falls_back_to_lookup_and_is_replaced(self, client, temp_config, plans):
+        plans.put("apple:1440903625", dict(self.PLAN, udn="SA_RINCON_STALE", built_at=9e12))
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
+             patch("app.play_plan", side_effect=SoCoUPnPException("UPnP Error 714", 714, "")), \
+             patch("app.play_album", return_value=self.PLAN) as mock_album:
+            resp = client.post("/play/tag", json={"tag": "apple:1440903625"})
+        assert resp.status_code == 200
+        mock_album.assert_called_once()
+        assert plans.get("apple:1440903625")["udn"] == "SA_RINCON52231_X"
+
+    def test_fallback_uses_rediscovered_speaker_ip(self, temp_config, plans):
+        import app
+        plans.put("apple:1440903625", dict(self.PLAN, built_at=9e12))
+
+        def moved_then_rejected(*args, **kwargs):
+            temp_config.write_text(json.dumps(dict(json.loads(temp_config.read_text()),
+                                                   speaker_ip="10.0.0.99")))
+            raise SoCoUPnPException("UPnP Error 714", 714, "")
+
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
+             patch("app.play_plan", side_effect=moved_then_rejected), \
+             patch("app.play_album", return_value=self.PLAN) as mock_album:
+            app._play_tag("apple:1440903625", app._load_config(), str(temp_config))
+        assert mock_album.call_args[0][0] == "10.0.0.99"
+
+    def test_plan_survives_speaker_not_found(self, temp_config, plans):
+        import app
+        plans.put("apple:1440903625", dict(self.PLAN, built_at=9e12))
+        with patch("app.play_plan", side_effect=Exception("Speaker 'Family Room' not found on network")), \
+             patch("app.play_album") as mock_album:
+            with pytest.raises(Exception, match="not found on network"):
+                app._play_tag("apple:1440903625", app._load_config(), str(temp_config))
+        mock_album.assert_not_called()
+        assert plans.get("apple:1440903625") is not None
+
+    def test_stale_plan_revalidated_in_background(self, client, temp_config, plans):
+        plans.put("apple:1440903625", self.PLAN)
+        with patch("app.play_plan"), \
+             patch("app._refresh_play_plan_async") as mock_refresh:
+            client.post("/play/tag", json={"tag": "apple:1440903625"})
+        mock_refresh.assert_called_once_with("apple:1440903625")
+
+    def test_nfc_tap_uses_plan(self, temp_config, plans, monkeypatch):
+        import app
+        plans.put("apple:1440903625", dict(self.PLAN, built_at=9e12))
+        monkeypatch.setattr(app, "_nfc_last_tag", None)
+        mock_nfc = MagicMock()
+        mock_nfc.read_tag.side_effect = ["apple:1440903625", KeyboardInterrupt]
+        monkeypatch.setattr(app, "_nfc", mock_nfc)
+        with patch("app.play_album") as mock_album, patch("app.play_plan") as mock_plan:
+            with pytest.raises(KeyboardInterrupt):
+                app._nfc_loop(str(temp_config))
+        mock_plan.assert_called_once()
+        mock_album.assert_not_called()
+
+    def test_refresh_discards_plan_for_removed_album(self, temp_config, plans):
+        import app
+        plans.put("apple:1440903625", self.PLAN)
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=[]):
+            app._refresh_play_plan("apple:1440903625")
+        assert plans.get("apple:1440903625") is None
+
+    def test_refresh_keeps_plan_on_network_error(self, temp_config, plans):
+        import app
+        plans.put("apple:1440903625", self.PLAN)
+        with patch.object(providers.get_provider("apple"), "get_album_tracks",
+                          side_effect=Exception("timeout")):
+            app._refresh_play_plan("apple:1440903625")
+        assert plans.get("apple:1440903625") is not None
+
+    def test_refresh_stores_rebuilt_plan(self, temp_config, plans):
+        import app
+        with patch.object(providers.get_provider("apple"), "get_album_tracks", return_value=SAMPLE_TRACKS), \
+             patch("app.build_album_plan", return_value=self.PLAN) as mock_build:
+            app._refresh_play_plan("apple:1440903625")
+        mock_build.assert_called_once_with("10.0.0.12", SAMPLE_TRACKS, ANY, "3")
+        assert plans.get("apple:1440903625")["udn"] == "SA_RINCON52231_X"
+
+    def test_collection_delete_discards_plan(self, client, plans, tmp_path, monkeypatch):
+        import app
+        monkeypatch.setattr(app, "TAGS_PATH", str(tmp_path / "tags.json"))
+        plans.put("apple:1440903625", self.PLAN)
+        client.post("/collection/delete", json={"tag_string": "apple:1440903625"})
+        assert plans.get("apple:1440903625") is None
+
+
 class TestMakeNfc:
     def test_pn532_import_error_raises_runtime_error(self):
         import app
@@ -18,11 +18,8 @@ def _make_smapi_provider():
 
 
 def make_mock_response(data):
-    """Create a mock urlopen response that works as a context manager."""
-    mock_response = MagicMock()
-    mock_response.__enter__.return_value = mock_response
-    mock_response.read.return_value = json.dumps(data).encode()
-    return mock_response
+    """Create a response body as returned by providers.transport.fetch."""
+    return json.dumps(data).encode()
 
 
 class TestBuildTrackUri:
@@ -47,7 +44,7 @@ class TestUpgradeArtworkUrl:
 class TestSearchAlbums:
     def test_returns_album_list(self):
         mock_resp = make_mock_response(SAMPLE_SEARCH_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             results = _p.search_albums("Test Album Test Artist")
         assert len(results) == 1
         assert results[0]["id"] == 1440903625
@@ -57,13 +54,20 @@ class TestSearchAlbums:
 
     def test_artwork_url_upgraded(self):
         mock_resp = make_mock_response(SAMPLE_SEARCH_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             results = _p.search_albums("Test Album Test Artist")
         assert "600x600bb" in results[0]["artwork_url"]
 
+    def test_cdn_artwork_served_through_proxy(self):
+        data = {"results": [dict(SAMPLE_SEARCH_RESPONSE["results"][0],
+                                 artworkUrl100="https://is1-ssl.mzstatic.com/image/a/100x100bb.jpg")]}
+        with patch("providers.transport.fetch", return_value=make_mock_response(data)):
+            results = _p.search_albums("proxied artwork")
+        assert results[0]["artwork_url"] == "/artwork/is1-ssl.mzstatic.com/image/a/600x600bb.jpg"
+
     def test_empty_results(self):
         mock_resp = make_mock_response({"resultCount": 0, "results": []})
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             results = _p.search_albums("xyznotanalbum")
         assert results == []
 
@@ -71,20 +75,20 @@ class TestSearchAlbums:
 class TestGetAlbumTracks:
     def test_filters_collection_row(self):
         mock_resp = make_mock_response(SAMPLE_LOOKUP_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_album_tracks(1440903625)
         assert len(tracks) == 2
 
     def test_sorted_by_track_number(self):
         mock_resp = make_mock_response(SAMPLE_LOOKUP_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_album_tracks(1440903625)
         assert tracks[0]["name"] == "Track One"
         assert tracks[1]["name"] == "Track Two"
 
     def test_fields_mapped_correctly(self):
         mock_resp = make_mock_response(SAMPLE_LOOKUP_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_album_tracks(1440903625)
         t = tracks[0]
         assert t["track_id"] == 1440904001
@@ -96,14 +100,14 @@ class TestGetAlbumTracks:
 
     def test_artwork_url_upgraded(self):
         mock_resp = make_mock_response(SAMPLE_LOOKUP_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_album_tracks(1440903625)
         assert "600x600bb" in tracks[0]["artwork_url"]
 
     def test_skips_results_missing_wrapper_type(self):
         response = {"resultCount": 1, "results": [{"trackId": 1, "trackName": "X"}]}
         mock_resp = make_mock_response(response)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_album_tracks(1440903625)
         assert tracks == []
 
@@ -128,7 +132,7 @@ class TestGetAlbumTracks:
             ],
         }
         mock_resp = make_mock_response(response)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_album_tracks(1)
         assert [t["name"] for t in tracks] == ["D1T1", "D1T2", "D2T1", "D2T2"]
 
@@ -136,13 +140,13 @@ class TestGetAlbumTracks:
 class TestGetTrack:
     def test_returns_single_item_list(self):
         mock_resp = make_mock_response(SAMPLE_TRACK_LOOKUP_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_track(1440904001)
         assert len(tracks) == 1
 
     def test_fields_mapped_correctly(self):
         mock_resp = make_mock_response(SAMPLE_TRACK_LOOKUP_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_track(1440904001)
         t = tracks[0]
         assert t["track_id"] == 1440904001
@@ -154,15 +158,231 @@ class TestGetTrack:
 
     def test_returns_empty_list_when_not_found(self):
         mock_resp = make_mock_response({"resultCount": 0, "results": []})
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             tracks = _p.get_track(9999)
         assert tracks == []
 
 
+class TestGetTrackAlbum:
+    def test_returns_album_and_artwork(self):
+        p = AppleMusicProvider()
+        mock_resp = make_mock_response(SAMPLE_TRACK_LOOKUP_RESPONSE)
+        with patch("providers.transport.fetch", return_value=mock_resp):
+            album = p.get_track_album(1440904001)
+        assert album == {"album_id": None, "artwork_url": "https://example.com/600x600bb.jpg"}
+
+    def test_second_lookup_is_cached(self):
+        p = AppleMusicProvider()
+        mock_resp = make_mock_response(SAMPLE_TRACK_LOOKUP_RESPONSE)
+        with patch("providers.transport.fetch", return_value=mock_resp) as mock_fetch:
+            p.get_track_album(1440904001)
+            p.get_track_album("1440904001")
+        assert mock_fetch.call_count == 1
+        assert p.cache_stats()["track_album"]["hits"] == 1
+
+    def test_unknown_track_is_negatively_cached(self):
+        p = AppleMusicProvider()
+        mock_resp = make_mock_response({"resultCount": 0, "results": []})
+        with patch("providers.transport.fetch", return_value=mock_resp) as mock_fetch:
+            assert p.get_track_album(9999) is None
+            assert p.get_track_album(9999) is None
+        assert mock_fetch.call_count == 1
+        assert p.cache_stats()["track_album"]["negative_hits"] == 1
+
+    def test_errors_are_not_cached(self):
+        p = AppleMusicProvider()
+        mock_resp = make_mock_response(SAMPLE_TRACK_LOOKUP_RESPONSE)
+        with patch("providers.transport.fetch", side_effect=[OSError("timeout"), mock_resp]):
+            with pytest.raises(OSError):
+                p.get_track_album(1440904001)
+            assert p.get_track_album(1440904001) is not None
+
+
+def _second_album(album_id=222):
+    return [
+        {"wrapperType": "collection", "collectionId": album_id, "collectionName": "Other",
+         "artistName": "Other Artist", "releaseDate": "2005-01-01T08:00:00Z"},
+        {"wrapperType": "track", "trackId": 9002, "trackName": "B2", "trackNumber": 2,
+         "artistName": "Other Artist", "collectionName": "Other", "collectionId": album_id},
+        {"wrapperType": "track", "trackId": 9001, "trackName": "B1", "trackNumber": 1,
+         "artistName": "Other Artist", "collectionName": "Other", "collectionId": album_id},
+    ]
+
+
+class TestGetAlbumsTracks:
+    def test_one_lookup_split_per_album(self):
+        data = {"results": SAMPLE_LOOKUP_RESPONSE["results"] + _second_album()}
+        with patch("providers.transport.fetch", return_value=make_mock_response(data)) as mock_fetch:
+            result = _p.get_albums_tracks([1440903625, 222, 333])
+        assert mock_fetch.call_count == 1
+        url = mock_fetch.call_args[0][0]
+        assert "id=1440903625,222,333" in url
+        assert "entity=song" in url
+        assert [t["track_id"] for t in result[1440903625]] == [1440904001, 1440904002]
+        assert [t["name"] for t in result[222]] == ["B1", "B2"]
+        assert result[222][0]["release_year"] == "2005"
+        assert result[333] == []
+
+    def test_ids_chunked(self, mocker):
+        mocker.patch("providers.apple_music._ITUNES_BATCH_SIZE", 2)
+        with patch("providers.transport.fetch",
+                   side_effect=lambda *a, **k: make_mock_response({"results": []})) as mock_fetch:
+            result = _p.get_albums_tracks([1, 2, 3, 4, 5])
+        assert mock_fetch.call_count == 3
+        assert list(result) == [1, 2, 3, 4, 5]
+
+    def test_truncated_lookup_falls_back_to_single_album(self, mocker):
+        mocker.patch("providers.apple_music._ITUNES_BATCH_LIMIT", 2)
+        mocker.patch.object(_p, "_fetch_album_tracks", return_value=["full"])
+        data = {"results": SAMPLE_LOOKUP_RESPONSE["results"]}
+        with patch("providers.transport.fetch", return_value=make_mock_response(data)):
+            result = _p.get_albums_tracks([1440903625])
+        assert result == {1440903625: ["full"]}
+
+    def test_limit_checked_per_album_not_per_chunk(self, mocker):
+        mocker.patch("providers.apple_music._ITUNES_BATCH_LIMIT", 4)
+        refetch = mocker.patch.object(_p, "_fetch_album_tracks")
+        data = {"results": SAMPLE_LOOKUP_RESPONSE["results"] + _second_album()}
+        with patch("providers.transport.fetch", return_value=make_mock_response(data)):
+            result = _p.get_albums_tracks([1440903625, 222])
+        refetch.assert_not_called()
+        assert len(result[1440903625]) == 2
+        assert len(result[222]) == 2
+
+    def test_truncated_albums_refetched_in_parallel(self, mocker):
+        import threading
+        mocker.patch("providers.apple_music._ITUNES_BATCH_LIMIT", 2)
+        threads = set()
+
+        def refetch(album_id):
+            threads.add(threading.current_thread().name)
+            threading.Event().wait(0.02)
+            return ["full"]
+
+        mocker.patch.object(_p, "_fetch_album_tracks", side_effect=refetch)
+        data = {"results": SAMPLE_LOOKUP_RESPONSE["results"] + _second_album()}
+        with patch("providers.transport.fetch", return_value=make_mock_response(data)):
+            result = _p.get_albums_tracks([1440903625, 222])
+        assert result == {1440903625: ["full"], 222: ["full"]}
+        assert len(threads) == 2
+
+    def test_cached_albums_not_fetched(self, tmp_path):
+        from providers.metadata_cache import MetadataCache
+        p = AppleMusicProvider()
+        p.configure_cache(MetadataCache(str(tmp_path / "metadata_cache.sqlite3")))
+        with patch("providers.transport.fetch",
+                   return_value=make_mock_response(SAMPLE_LOOKUP_RESPONSE)):
+            p.get_album_tracks(1440903625)
+        data = {"results": _second_album()}
+        with patch("providers.transport.fetch", return_value=make_mock_response(data)) as mock_fetch:
+            result = p.get_albums_tracks([1440903625, 222])
+            again = p.get_album_tracks(222)
+        assert mock_fetch.call_count == 1
+        assert "id=222&" in mock_fetch.call_args[0][0]
+        assert len(result[1440903625]) == 2
+        assert again == result[222]
+
+
+class TestMetadataCacheIntegration:
+    def _provider(self, tmp_path):
+        from providers.metadata_cache import MetadataCache
+        p = AppleMusicProvider()
+        p.configure_cache(MetadataCache(str(tmp_path / "metadata_cache.sqlite3")))
+        return p
+
+    def test_album_tracks_cached(self, tmp_path):
+        p = self._provider(tmp_path)
+        mock_resp = make_mock_response(SAMPLE_LOOKUP_RESPONSE)
+        with patch("providers.transport.fetch", return_value=mock_resp) as mock_fetch:
+            first = p.get_album_tracks(1440903625)
+            second = p.get_album_tracks(1440903625)
+        assert first == second
+        assert mock_fetch.call_count == 1
+
+    def test_playlist_tracks_error_not_cached(self, tmp_path):
+        p = self._provider(tmp_path)
+        p.configure_smapi("tok", "key", "Sonos_hh_abc")
+        p._smapi.get_metadata = MagicMock(side_effect=[
+            Exception("SMAPI down"),
+            ([{"id": "song:1440904001", "item_type": "track", "title": "Track One"}], 1),
+        ])
+        assert p.get_playlist_tracks("p.abc") == []
+        assert p.get_playlist_tracks("p.abc")[0]["track_id"] == 1440904001
+
+    def test_refresh_metadata_fetches_missing_then_skips_fresh(self, tmp_path):
+        p = self._provider(tmp_path)
+        mock_resp = make_mock_response(SAMPLE_LOOKUP_RESPONSE)
+        with patch("providers.transport.fetch", return_value=mock_resp) as mock_fetch:
+            assert p.refresh_metadata("album", 1440903625, ahead_secs=3600) is True
+            assert p.refresh_metadata("album", 1440903625, ahead_secs=3600) is False
+            assert len(p.get_album_tracks(1440903625)) == 2
+        assert mock_fetch.call_count == 1
+
+    def test_refresh_metadata_renews_entries_close_to_expiry(self, tmp_path):
+        p = self._provider(tmp_path)
+        mock_resp = make_mock_response(SAMPLE_LOOKUP_RESPONSE)
+        with patch("providers.transport.fetch", return_value=mock_resp) as mock_fetch:
+            p.refresh_metadata("album", 1440903625)
+            assert p.refresh_metadata("album", 1440903625, ahead_secs=8 * 86400) is True
+        assert mock_fetch.call_count == 2
+
+    def test_refresh_metadata_without_cache_is_noop(self):
+        with patch("providers.transport.fetch") as mock_fetch:
+            assert AppleMusicProvider().refresh_metadata("album", 1440903625) is False
+        mock_fetch.assert_not_called()
+
+    def test_stats_include_metadata_cache(self, tmp_path):
+        assert "metadata" in self._provider(tmp_path).cache_stats()
+        assert "metadata" not in AppleMusicProvider().cache_stats()
+
+    def test_removed_album_negatively_cached_and_flagged(self, tmp_path):
+        p = self._provider(tmp_path)
+        mock_resp = make_mock_response({"resultCount": 0, "results": []})
+        with patch("providers.transport.fetch", return_value=mock_resp) as mock_fetch:
+            assert p.get_album_tracks(1440903625) == []
+            assert p.get_album_tracks(1440903625) == []
+        assert mock_fetch.call_count == 1
+        assert p.is_unavailable("album", 1440903625) is True
+        assert p.is_unavailable("album", 999) is False
+        assert p.cache_stats()["metadata"]["negative_hits"] == 1
+
+    def test_404_is_a_negative_result(self, tmp_path):
+        import urllib.error
+        p = self._provider(tmp_path)
+        err = urllib.error.HTTPError("https://itunes.apple.com", 404, "Not Found", {}, None)
+        with patch("providers.transport.fetch", side_effect=err) as mock_fetch:
+            assert p.get_track(1440904001) == []
+            assert p.get_track(1440904001) == []
+        assert mock_fetch.call_count == 1
+        assert p.is_unavailable("track", 1440904001) is True
+
+    def test_server_errors_are_not_negative(self, tmp_path):
+        import urllib.error
+        p = self._provider(tmp_path)
+        err = urllib.error.HTTPError("https://itunes.apple.com", 503, "Unavailable", {}, None)
+        with patch("providers.transport.fetch", side_effect=err):
+            with pytest.raises(urllib.error.HTTPError):
+                p.get_album_tracks(1440903625)
+        assert p.is_unavailable("album", 1440903625) is False
+
+    def test_deleted_playlist_negatively_cached(self, tmp_path):
+        from providers.smapi_client import SmapiError
+        p = self._provider(tmp_path)
+        p.configure_smapi("tok", "key", "Sonos_hh_abc")
+        p._smapi.get_metadata = MagicMock(
+            side_effect=SmapiError("Item not found", "SOAP-ENV:Client.ItemNotFound"))
+        assert p.get_playlist_tracks("p.gone") == []
+        assert p.get_playlist_tracks("p.gone") == []
+        assert p._smapi.get_metadata.call_count == 1
+
+    def test_unavailable_without_cache_is_unknown(self):
+        assert AppleMusicProvider().is_unavailable("album", 1440903625) is False
+
+
 class TestSearchSongs:
     def test_returns_song_list(self):
         mock_resp = make_mock_response(SAMPLE_SONG_SEARCH_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             results = _p.search_songs("Track One Test Artist")
         assert len(results) == 2
         assert results[0]["id"] == 1440904001
@@ -173,7 +393,7 @@ class TestSearchSongs:
 
     def test_empty_results(self):
         mock_resp = make_mock_response({"resultCount": 0, "results": []})
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             results = _p.search_songs("xyznotasong")
         assert results == []
 
@@ -222,12 +442,192 @@ class TestSmapiSearchAlbums:
         from providers.smapi_client import SmapiError
         p._smapi.search = MagicMock(side_effect=SmapiError("fail", "500"))
         mock_resp = make_mock_response(SAMPLE_SEARCH_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             results = p.search_albums("Test Album")
         assert len(results) == 1
         assert results[0]["id"] == 1440903625
 
 
+class TestSearchCache:
+    def test_repeat_search_served_from_cache(self):
+        mock_resp = make_mock_response(SAMPLE_SEARCH_RESPONSE)
+        with patch("providers.transport.fetch", return_value=mock_resp) as mock_fetch:
+            _p.search_albums("Test Album")
+            results = _p.search_albums("test album")
+        assert mock_fetch.call_count == 1
+        assert results[0]["id"] == 1440903625
+
+    def test_typing_on_complete_result_filters_locally(self):
+        p = _make_smapi_provider()
+        p._smapi.search = MagicMock(return_value=([
+            {"id": "album:1", "title": "Abbey Road", "artist": "The Beatles", "item_type": "album"},
+            {"id": "album:2", "title": "Beat Street", "artist": "Various", "item_type": "album"},
+        ], 2))
+        p.search_albums("beat")
+        results = p.search_albums("beatles")
+        assert [r["id"] for r in results] == [1]
+        p._smapi.search.assert_called_once_with("beat")
+
+    def test_truncated_result_not_filtered(self):
+        p = _make_smapi_provider()
+        p._smapi.search = MagicMock(return_value=([
+            {"id": "album:1", "title": "Abbey Road", "artist": "The Beatles", "item_type": "album"},
+        ], 500))
+        p.search_albums("beat")
+        p.search_albums("beatl")
+        assert p._smapi.search.call_count == 2
+
+    def test_stats_include_search(self):
+        assert "search" in AppleMusicProvider().cache_stats()
+
+
+class TestRequestCoalescing:
+    def _burst(self, fn, n=4):
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            return [f.result() for f in [pool.submit(fn) for _ in range(n)]]
+
+    def _slow_fetch(self, data, p, n=4):
+        """transport.fetch stand-in that answers once all n lookups have joined."""
+        import threading
+
+        def fetch(url, **kwargs):
+            while p.coalesce_stats()["calls"] < n:
+                threading.Event().wait(0.001)
+            return make_mock_response(data)
+        return fetch
+
+    def test_concurrent_album_lookups_share_one_request(self):
+        p = AppleMusicProvider()
+        with patch("providers.transport.fetch",
+                   side_effect=self._slow_fetch(SAMPLE_LOOKUP_RESPONSE, p)) as mock_fetch:
+            results = self._burst(lambda: p.get_album_tracks(1440903625))
+        assert mock_fetch.call_count == 1
+        assert all(len(tracks) == 2 for tracks in results)
+        assert p.coalesce_stats()["coalesced"] == 3
+
+    def test_str_and_int_ids_share_one_request(self):
+        p = AppleMusicProvider()
+        ids = iter([1440903625, "1440903625", 1440903625, "1440903625"])
+        with patch("providers.transport.fetch",
+                   side_effect=self._slow_fetch(SAMPLE_LOOKUP_RESPONSE, p)) as mock_fetch:
+            self._burst(lambda: p.get_album_tracks(next(ids)))
+        assert mock_fetch.call_count == 1
+        assert p.coalesce_stats()["coalesced"] == 3
+
+    def test_concurrent_searches_share_one_request(self):
+        p = AppleMusicProvider()
+        queries = iter(["Test Album", "test album", "TEST  album", "test album"])
+        with patch("providers.transport.fetch",
+                   side_effect=self._slow_fetch(SAMPLE_SEARCH_RESPONSE, p)) as mock_fetch:
+            self._burst(lambda: p.search_albums(next(queries)))
+        assert mock_fetch.call_count == 1
+
+    def test_sequential_lookups_are_not_coalesced(self):
+        p = AppleMusicProvider()
+        with patch("providers.transport.fetch",
+                   return_value=make_mock_response(SAMPLE_LOOKUP_RESPONSE)) as mock_fetch:
+            p.get_album_tracks(1440903625)
+            p.get_album_tracks(1440903625)
+        assert mock_fetch.call_count == 2
+        assert p.coalesce_stats() == {"calls": 2, "coalesced": 0, "upstream": 2, "in_flight": 0}
+
+
+class TestHedgedSearch:
+    ALBUM = {"id": "album:1", "title": "Abbey Road", "artist": "The Beatles", "item_type": "album"}
+
+    def test_fast_smapi_wins_without_itunes(self):
+        p = _make_smapi_provider()
+        p._smapi.search = MagicMock(return_value=([self.ALBUM], 1))
+        with patch("providers.transport.fetch") as mock_fetch:
+            results = p.search_albums("abbey")
+        assert results[0]["id"] == 1
+        mock_fetch.assert_not_called()
+
+    def test_slow_smapi_hedged_with_itunes(self):
+        import threading
+        p = _make_smapi_provider()
+        p.configure_search(0.01)
+        release = threading.Event()
+
+        def slow_search(query):
+            release.wait(timeout=2)
+            return [self.ALBUM], 1
+
+        p._smapi.search = MagicMock(side_effect=slow_search)
+        mock_resp = make_mock_response(SAMPLE_SEARCH_RESPONSE)
+        try:
+            with patch("providers.transport.fetch", return_value=mock_resp):
+                results = p.search_albums("test album")
+        finally:
+            release.set()
+        assert results[0]["id"] == 1440903625
+
+    def test_itunes_failure_waits_for_smapi(self):
+        import threading
+        p = _make_smapi_provider()
+        p.configure_search(0.01)
+        started = threading.Event()
+
+        def slow_search(query):
+            started.wait(timeout=2)
+            return [self.ALBUM], 1
+
+        def itunes_down(*args, **kwargs):
+            started.set()
+            raise OSError("offline")
+
+        p._smapi.search = MagicMock(side_effect=slow_search)
+        with patch("providers.transport.fetch", side_effect=itunes_down):
+            results = p.search_albums("abbey")
+        assert results[0]["id"] == 1
+
+    def test_both_failing_raises(self):
+        p = _make_smapi_provider()
+        from providers.smapi_client import SmapiError
+        p._smapi.search = MagicMock(side_effect=SmapiError("fail", "500"))
+        with patch("providers.transport.fetch", side_effect=OSError("offline")):
+            with pytest.raises(OSError):
+                p.search_albums("abbey")
+
+    def test_hedging_disabled_is_sequential(self):
+        p = _make_smapi_provider()
+        p.configure_search(None)
+        p._smapi.search = MagicMock(return_value=([self.ALBUM], 1))
+        with patch("providers.apple_music._smapi_search_pool") as mock_pool:
+            assert p.search_albums("abbey")[0]["id"] == 1
+        mock_pool.submit.assert_not_called()
+
+    def test_stalled_smapi_never_blocks_the_hedge(self):
+        import threading
+        p = _make_smapi_provider()
+        p.configure_search(0.01)
+        stalled = threading.Event()
+
+        def never_answers(query):
+            stalled.wait(timeout=5)
+            return [self.ALBUM], 1
+
+        p._smapi.search = MagicMock(side_effect=never_answers)
+        results = []
+
+        def keystrokes():
+            for query in ("abbey", "blue", "court", "dark", "exile", "fear"):  # no shared prefixes
+                results.append(p.search_albums(query))
+
+        mock_resp = make_mock_response(SAMPLE_SEARCH_RESPONSE)
+        try:
+            with patch("providers.transport.fetch", return_value=mock_resp):
+                typing = threading.Thread(target=keystrokes)
+                typing.start()
+                typing.join(timeout=2)
+                assert not typing.is_alive()  # more keystrokes than SMAPI workers
+        finally:
+            stalled.set()
+        assert len(results) == 6
+        assert all(r[0]["id"] == 1440903625 for r in results)
+
+
 class TestSmapiSearchSongs:
     def test_uses_smapi_when_configured(self):
         p = _make_smapi_provider()
@@ -277,6 +677,24 @@ class TestSmapiSearchSongs:
         assert results[0]["name"] == "Catalog Track"
 
 
+class TestPlaylistCatalogIntegration:
+    def test_list_and_info_share_one_paged_listing(self):
+        p = _make_smapi_provider()
+        items = [{"id": f"libraryplaylist:p.{i}", "title": f"Mix {i}", "item_type": "playlist",
+                  "album_art_uri": f"https://example.com/{i}.jpg"} for i in range(150)]
+        p._smapi.get_metadata = MagicMock(
+            side_effect=lambda item_id, index=0, count=100: (items[index:index + count], len(items)))
+        assert len(p.list_playlists()) == 150
+        assert p.get_playlist_info("p.149") == {"title": "Mix 149",
+                                                "artwork_url": "https://example.com/149.jpg"}
+        assert p._smapi.get_metadata.call_count == 2
+
+    def test_list_playlists_error_returns_empty(self):
+        p = _make_smapi_provider()
+        p._smapi.get_metadata = MagicMock(side_effect=Exception("SMAPI down"))
+        assert p.list_playlists() == []
+
+
 class TestGetPlaylistTracks:
     def test_returns_tracks_for_playlist(self):
         p = _make_smapi_provider()
@@ -287,7 +705,7 @@ class TestGetPlaylistTracks:
              "album": "Album Y", "item_type": "track"},
         ], 2))
         tracks = p.get_playlist_tracks("p.ABC123")
-        p._smapi.get_metadata.assert_called_once_with("libraryplaylist:p.ABC123", count=200)
+        p._smapi.get_metadata.assert_called_once_with("libraryplaylist:p.ABC123", index=0, count=200)
         assert len(tracks) == 2
         assert tracks[0] == {"name": "Track One", "artist": "Artist A", "album": "Album X", "track_id": 111}
         assert tracks[1] == {"name": "Track Two", "artist": "Artist B", "album": "Album Y", "track_id": 222}
@@ -313,10 +731,39 @@ class TestGetPlaylistTracks:
         assert len(tracks) == 1
         assert tracks[0]["name"] == "Real Track"
 
+    def test_pages_beyond_first_request(self):
+        p = _make_smapi_provider()
+        items = [{"id": f"track:{i}", "title": f"T{i}", "item_type": "track"} for i in range(450)]
+        p._smapi.get_metadata = MagicMock(
+            side_effect=lambda item_id, index=0, count=100: (items[index:index + count], len(items)))
+        tracks = p.get_playlist_tracks("p.BIG")
+        assert [t["track_id"] for t in tracks] == list(range(450))
+        assert p._smapi.get_metadata.call_count == 3
+
+    def test_iter_yields_tracks_and_caches_full_list(self, tmp_path):
+        from providers.metadata_cache import MetadataCache
+        p = _make_smapi_provider()
+        p.configure_cache(MetadataCache(str(tmp_path / "metadata_cache.sqlite3")))
+        p._smapi.get_metadata = MagicMock(return_value=([
+            {"id": "track:111", "title": "Track One", "item_type": "track"},
+            {"id": "track:222", "title": "Track Two", "item_type": "track"},
+        ], 2))
+        streamed = [t["track_id"] for t in p.iter_playlist_tracks("p.ABC")]
+        assert streamed == [111, 222]
+        assert [t["track_id"] for t in p.iter_playlist_tracks("p.ABC")] == [111, 222]
+        assert [t["track_id"] for t in p.get_playlist_tracks("p.ABC")] == [111, 222]
+        assert p._smapi.get_metadata.call_count == 1
+
+    def test_iter_stops_quietly_on_error(self):
+        p = _make_smapi_provider()
+        p._smapi.get_metadata = MagicMock(side_effect=Exception("network error"))
+        assert list(p.iter_playlist_tracks("p.ABC")) == []
+
     def test_returns_empty_without_smapi(self):
         from providers.apple_music import AppleMusicProvider
         p = AppleMusicProvider()
         assert p.get_playlist_tracks("p.ABC") == []
+        assert list(p.iter_playlist_tracks("p.ABC")) == []
 
     def test_returns_empty_on_error(self):
         p = _make_smapi_provider()
@@ -341,8 +788,66 @@ class TestSmapiAutoRefresh:
         results = p.search_albums("test")
         assert len(results) == 1
         p._smapi.refresh_auth_token.assert_called_once()
+        p._token_persist_pool.submit(lambda: None).result()  # persisted in the background
         callback.assert_called_once_with("new_tok", "new_key")
 
+    def test_persisting_does_not_block_search(self):
+        import threading
+        from providers.smapi_client import AuthTokenExpired
+        p = _make_smapi_provider()
+        release = threading.Event()
+        p._on_token_refresh = MagicMock(side_effect=lambda *a: release.wait(timeout=2))
+        p._smapi.search = MagicMock(side_effect=[
+            AuthTokenExpired("expired", "SOAP-ENV:Client-AuthTokenExpired"),
+            ([{"id": "album:1", "title": "A", "artist": "B", "item_type": "album"}], 1),
+        ])
+        p._smapi.refresh_auth_token = MagicMock(return_value=("new_tok", "new_key"))
+        try:
+            assert len(p.search_albums("test")) == 1
+        finally:
+            release.set()
+
+    def test_concurrent_expiries_share_one_refresh(self):
+        from concurrent.futures import ThreadPoolExecutor
+        import threading
+        p = _make_smapi_provider()
+        started = threading.Event()
+
+        def refresh():
+            started.set()
+            threading.Event().wait(0.05)
+            p._smapi.token = "new_tok"
+            return "new_tok", "new_key"
+
+        p._smapi.refresh_auth_token = MagicMock(side_effect=refresh)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: p._refresh_smapi_token("tok"), range(4)))
+        p._smapi.refresh_auth_token.assert_called_once()
+
+    def test_background_refresher_rotates_due_token(self, mocker):
+        import time
+
+        class _Stop(Exception):
+            pass
+
+        p = AppleMusicProvider()
+        p.configure_smapi("tok", "key", "Sonos_hh_abc", on_token_refresh=MagicMock(),
+                          token_issued_at=time.time() - 86400)
+
+        def refresh():
+            p._smapi.token = "new_tok"
+            p._smapi.token_issued_at = time.time()
+            return "new_tok", "new_key"
+
+        p._smapi.refresh_auth_token = MagicMock(side_effect=refresh)
+        sleep = mocker.patch("providers.apple_music.time.sleep", side_effect=[None, _Stop()])
+        with pytest.raises(_Stop):
+            p._token_refresh_loop()
+        p._smapi.refresh_auth_token.assert_called_once()
+        assert sleep.call_args_list[-1].args[0] == 300  # next check, not another refresh
+        p._token_persist_pool.submit(lambda: None).result()
+        p._on_token_refresh.assert_called_once_with("new_tok", "new_key")
+
     def test_falls_back_to_itunes_if_refresh_also_fails(self):
         from providers.smapi_client import AuthTokenExpired, SmapiError
         p = _make_smapi_provider()
@@ -353,7 +858,7 @@ class TestSmapiAutoRefresh:
             side_effect=SmapiError("refresh failed", "500")
         )
         mock_resp = make_mock_response(SAMPLE_SEARCH_RESPONSE)
-        with patch("urllib.request.urlopen", return_value=mock_resp):
+        with patch("providers.transport.fetch", return_value=mock_resp):
             results = p.search_albums("Test Album")
         # Falls through to iTunes
         assert len(results) == 1
@@ -387,6 +892,21 @@ class TestConfigureSmapi:
         # Restore original singleton
         _providers["apple"] = AppleMusicProvider()
 
+    def test_configure_smapi_reads_search_hedge(self, temp_config, monkeypatch):
+        import app
+        config = json.loads(temp_config.read_text())
+        config["services"] = {"apple": {
+            "smapi_token": "t", "smapi_key": "k", "smapi_household_id": "Sonos_hh_test",
+            "search_hedge_ms": 250,
+        }}
+        temp_config.write_text(json.dumps(config))
+        from providers import _providers
+        from providers.apple_music import AppleMusicProvider
+        fresh = AppleMusicProvider()
+        monkeypatch.setitem(_providers, "apple", fresh)
+        app._configure_smapi()
+        assert fresh._hedge_delay == 0.25
+
     def test_configure_smapi_noop_without_tokens(self, temp_config, monkeypatch):
         """_configure_smapi is a no-op when SMAPI tokens are not in config."""
         import app
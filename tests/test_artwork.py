@@ -0,0 +1,90 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from providers.artwork import ArtworkCache, proxy_url, upstream_url
+
+CDN = "https://is1-ssl.mzstatic.com/image/thumb/Music/v4/ab/cd/600x600bb.jpg"
+KEY = "is1-ssl.mzstatic.com/image/thumb/Music/v4/ab/cd/600x600bb.jpg"
+
+
+class TestProxyUrl:
+    def test_cdn_url_proxied(self):
+        assert proxy_url(CDN) == "/artwork/" + KEY
+
+    def test_size_variant(self):
+        assert proxy_url(CDN, size=300) == "/artwork/" + KEY + "?size=300"
+
+    def test_already_proxied_url_resized(self):
+        assert proxy_url("/artwork/" + KEY + "?size=100", size=300) == "/artwork/" + KEY + "?size=300"
+
+    def test_url_with_port_or_userinfo_not_proxied(self):
+        assert proxy_url("https://is1.mzstatic.com:8443/a.jpg") == "https://is1.mzstatic.com:8443/a.jpg"
+        assert proxy_url("https://u@is1.mzstatic.com/a.jpg") == "https://u@is1.mzstatic.com/a.jpg"
+
+    def test_other_hosts_and_empty_unchanged(self):
+        assert proxy_url("https://example.com/600x600bb.jpg") == "https://example.com/600x600bb.jpg"
+        assert proxy_url("") == ""
+        assert proxy_url(None) is None
+
+
+class TestUpstreamUrl:
+    def test_round_trip(self):
+        assert upstream_url(KEY) == CDN
+
+    def test_size_rewrites_cdn_rendition(self):
+        assert upstream_url(KEY, 300).endswith("/300x300bb.jpg")
+
+    def test_disallowed_host_rejected(self):
+        assert upstream_url("example.com/a.jpg") is None
+        assert upstream_url("is1-ssl.mzstatic.com/../etc/passwd") is None
+
+    def test_host_smuggling_rejected(self):
+        assert upstream_url("evil.example?.mzstatic.com/x.jpg") is None
+        assert upstream_url("evil.example#.mzstatic.com/x.jpg") is None
+        assert upstream_url("evil.example@is1.mzstatic.com/x.jpg") is None
+        assert upstream_url("is1.mzstatic.com:8443/x.jpg") is None
+        assert upstream_url("192.168.1.1:80#.mzstatic.com/x.jpg") is None
+
+    def test_query_or_fragment_in_path_rejected(self):
+        assert upstream_url("is1-ssl.mzstatic.com/a.jpg?x=1") is None
+        assert upstream_url("is1-ssl.mzstatic.com/a.jpg#x") is None
+
+
+class TestArtworkCache:
+    def test_fetches_once(self, tmp_path):
+        cache = ArtworkCache(str(tmp_path))
+        with patch("providers.transport.fetch", return_value=b"jpeg") as mock_fetch:
+            path, etag = cache.path_for(CDN)
+            again, etag2 = cache.path_for(CDN)
+        assert mock_fetch.call_count == 1
+        assert path == again and etag == etag2
+        with open(path, "rb") as f:
+            assert f.read() == b"jpeg"
+        assert cache.stats()["hits"] == 1
+
+    def test_fetch_error_stores_nothing(self, tmp_path):
+        cache = ArtworkCache(str(tmp_path))
+        with patch("providers.transport.fetch", side_effect=OSError("offline")):
+            with pytest.raises(OSError):
+                cache.path_for(CDN)
+        assert os.listdir(tmp_path) == []
+
+    def test_quota_evicts_least_recently_served(self, tmp_path):
+        cache = ArtworkCache(str(tmp_path), quota_bytes=10)
+        with patch("providers.transport.fetch", return_value=b"12345"):
+            old, _ = cache.path_for(CDN + "?a")
+            os.utime(old, (1, 1))
+            mid, _ = cache.path_for(CDN + "?b")
+            os.utime(mid, (2, 2))
+            new, _ = cache.path_for(CDN + "?c")
+        assert not os.path.exists(old)
+        assert os.path.exists(mid) and os.path.exists(new)
+        assert cache.stats()["bytes"] == 10
+        assert cache.stats()["evictions"] == 1
+
+    def test_size_survives_restart(self, tmp_path):
+        with patch("providers.transport.fetch", return_value=b"12345"):
+            ArtworkCache(str(tmp_path)).path_for(CDN)
+        assert ArtworkCache(str(tmp_path)).stats()["bytes"] == 5
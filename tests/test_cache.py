@@ -0,0 +1,183 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from providers.cache import MISSING, SearchCache, SingleFlight, TTLCache, normalize_query
+
+
+class TestTTLCache:
+    def test_get_missing_returns_sentinel(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        assert cache.get("a") is MISSING
+        assert cache.get("a", "default") == "default"
+
+    def test_put_then_get(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.put("a", 1)
+        assert cache.get("a") == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_entries_expire(self, mocker):
+        clock = mocker.patch("providers.cache.time.monotonic", return_value=100.0)
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.put("a", 1)
+        clock.return_value = 161.0
+        assert cache.get("a") is MISSING
+        assert cache.stats()["size"] == 0
+
+    def test_negative_entries_use_negative_ttl(self, mocker):
+        clock = mocker.patch("providers.cache.time.monotonic", return_value=100.0)
+        cache = TTLCache(maxsize=4, ttl=3600, negative_ttl=10)
+        cache.put("a", None)
+        assert cache.get("a") is None
+        clock.return_value = 111.0
+        assert cache.get("a") is MISSING
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_get_or_load_calls_loader_once(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        calls = []
+        loader = lambda: calls.append(1) or "value"
+        assert cache.get_or_load("a", loader) == "value"
+        assert cache.get_or_load("a", loader) == "value"
+        assert len(calls) == 1
+
+    def test_hit_rate(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.get("a")
+        cache.put("a", 1)
+        cache.get("a")
+        assert cache.stats()["hit_rate"] == 0.5
+
+
+BEATLES = [
+    {"name": "Abbey Road", "artist": "The Beatles"},
+    {"name": "Beat It", "artist": "Michael Jackson", "album": "Thriller"},
+]
+
+
+class _Search:
+    def __init__(self, results=BEATLES, complete=True):
+        self.results, self.complete, self.calls = results, complete, []
+
+    def __call__(self, query):
+        self.calls.append(query)
+        return self.results, self.complete
+
+
+class TestSearchCache:
+    def test_normalize_query(self):
+        assert normalize_query("  The   BEATLES ") == "the beatles"
+
+    def test_same_normalized_query_hits(self):
+        cache, search = SearchCache(maxsize=8, ttl=60), _Search()
+        cache.get_or_search("album", "Beat", search)
+        assert cache.get_or_search("album", " beat ", search) == BEATLES
+        assert search.calls == ["Beat"]
+        assert cache.stats()["hits"] == 1
+
+    def test_types_cached_separately(self):
+        cache, search = SearchCache(maxsize=8, ttl=60), _Search()
+        cache.get_or_search("album", "beat", search)
+        cache.get_or_search("song", "beat", search)
+        assert len(search.calls) == 2
+
+    def test_longer_query_filtered_from_complete_prefix(self):
+        cache, search = SearchCache(maxsize=8, ttl=60), _Search()
+        cache.get_or_search("album", "beat", search)
+        assert cache.get_or_search("album", "beatl", search) == [BEATLES[0]]
+        assert cache.get_or_search("album", "beat thriller", search) == [BEATLES[1]]
+        assert search.calls == ["beat"]
+        assert cache.stats()["prefix_hits"] == 2
+
+    def test_incomplete_prefix_not_reused(self):
+        cache, search = SearchCache(maxsize=8, ttl=60), _Search(complete=False)
+        cache.get_or_search("album", "beat", search)
+        cache.get_or_search("album", "beatl", search)
+        assert search.calls == ["beat", "beatl"]
+
+    def test_entries_expire(self, mocker):
+        clock = mocker.patch("providers.cache.time.monotonic", return_value=100.0)
+        cache, search = SearchCache(maxsize=8, ttl=60), _Search()
+        cache.get_or_search("album", "beat", search)
+        clock.return_value = 161.0
+        cache.get_or_search("album", "beatles", search)
+        assert search.calls == ["beat", "beatles"]
+
+    def test_lru_eviction(self):
+        cache, search = SearchCache(maxsize=2, ttl=60), _Search(complete=False)
+        for q in ("a", "b", "c"):
+            cache.get_or_search("album", q, search)
+        cache.get_or_search("album", "a", search)
+        assert search.calls == ["a", "b", "c", "a"]
+        assert cache.stats()["size"] == 2
+
+    def test_errors_not_cached(self):
+        cache = SearchCache(maxsize=8, ttl=60)
+
+        def fail(query):
+            raise OSError("offline")
+
+        with pytest.raises(OSError):
+            cache.get_or_search("album", "beat", fail)
+        assert cache.stats()["size"] == 0
+
+
+class TestSingleFlight:
+    def _burst(self, flight, fn, release, n=5, key="k"):
+        """Run n concurrent flight.do(key, fn) calls; fn blocks on release until all have joined."""
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            futures = [pool.submit(flight.do, key, fn) for _ in range(n)]
+            while flight.stats()["calls"] < n:
+                threading.Event().wait(0.001)
+            release.set()
+            return [f.exception() or f.result() for f in futures]
+
+    def test_sequential_calls_each_run(self):
+        flight = SingleFlight()
+        calls = []
+        assert flight.do("k", lambda: calls.append(1) or len(calls)) == 1
+        assert flight.do("k", lambda: calls.append(1) or len(calls)) == 2
+        assert flight.stats() == {"calls": 2, "coalesced": 0, "upstream": 2, "in_flight": 0}
+
+    def test_concurrent_calls_share_one_result(self):
+        release = threading.Event()
+        flight = SingleFlight()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(timeout=2)
+            return ["tracks"]
+
+        assert self._burst(flight, fn, release) == [["tracks"]] * 5
+        assert len(calls) == 1
+        assert flight.stats()["coalesced"] == 4
+        assert flight.stats()["in_flight"] == 0
+
+    def test_concurrent_calls_share_the_error(self):
+        release = threading.Event()
+        flight = SingleFlight()
+
+        def fn():
+            release.wait(timeout=2)
+            raise OSError("down")
+
+        results = self._burst(flight, fn, release, n=3)
+        assert all(isinstance(r, OSError) for r in results)
+        assert flight.stats()["in_flight"] == 0
+
+    def test_different_keys_do_not_share(self):
+        flight = SingleFlight()
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
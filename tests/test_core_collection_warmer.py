@@ -0,0 +1,59 @@
+from core.collection_warmer import CollectionWarmer
+
+
+def _warmer(tags, warm_tag, **kwargs):
+    kwargs.setdefault("min_interval", 0)
+    return CollectionWarmer(lambda: tags, warm_tag, **kwargs)
+
+
+class TestCollectionWarmer:
+    def test_pass_warms_every_tag_once(self):
+        seen = []
+        w = _warmer(["apple:1", "apple:2", "apple:1"], lambda t: seen.append(t) or True)
+        w.run_pass()
+        assert seen == ["apple:1", "apple:2"]
+        stats = w.stats()
+        assert stats["total"] == 2
+        assert stats["done"] == 2
+        assert stats["warmed"] == 2
+        assert stats["passes"] == 1
+        assert stats["running"] is False
+        assert stats["last_pass_at"] is not None
+
+    def test_failures_counted_and_pass_continues(self):
+        def warm(tag):
+            if tag == "apple:bad":
+                raise OSError("offline")
+            return False
+        w = _warmer(["apple:bad", "apple:2"], warm)
+        w.run_pass()
+        stats = w.stats()
+        assert stats["done"] == 2
+        assert stats["failed"] == 1
+        assert stats["warmed"] == 0
+
+    def test_rate_limit_only_between_network_tags(self, mocker):
+        waits = []
+        w = _warmer(["a", "b", "c", "d"], lambda t: t != "b", min_interval=3.0)
+        mocker.patch.object(w._stop, "wait", side_effect=lambda secs: waits.append(secs) or False)
+        w.run_pass()
+        # a fetched -> wait before b; b was cached but a's fetch still counts
+        # -> wait before c; c fetched -> wait before d.
+        assert len(waits) == 3
+        assert all(0 < secs <= 3.0 for secs in waits)
+
+    def test_stop_ends_pass_early(self):
+        w = _warmer(["a", "b", "c"], lambda t: w.stop() or True, min_interval=10)
+        w.run_pass()
+        assert w.stats()["done"] == 1
+        assert w.stats()["running"] is False
+
+    def test_start_runs_in_background(self):
+        import threading
+        done = threading.Event()
+        w = _warmer(["a"], lambda t: done.set() or False, start_delay=0, pass_interval=60)
+        w.start()
+        try:
+            assert done.wait(timeout=2)
+        finally:
+            w.stop()
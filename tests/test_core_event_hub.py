@@ -0,0 +1,62 @@
+import json
+
+from core.event_hub import EventHub, format_sse
+
+
+def _data(message):
+    line = next(l for l in message.splitlines() if l.startswith("data: "))
+    return json.loads(line[len("data: "):])
+
+
+class TestEventHub:
+    def test_publish_reaches_all_clients(self):
+        hub = EventHub()
+        a, b = hub.subscribe(), hub.subscribe()
+        hub.publish("now-playing", {"playing": False})
+        assert _data(a.get_nowait()) == {"playing": False}
+        assert _data(b.get_nowait()) == {"playing": False}
+
+    def test_new_client_gets_latest_state(self):
+        hub = EventHub()
+        hub.publish("now-playing", {"playing": False})
+        hub.publish("now-playing", {"playing": True})
+        q = hub.subscribe()
+        assert _data(q.get_nowait()) == {"playing": True}
+        assert q.empty()
+
+    def test_unchanged_state_is_not_resent(self):
+        hub = EventHub()
+        q = hub.subscribe()
+        assert hub.publish("volume", {"volume": 20}) is True
+        assert hub.publish("volume", {"volume": 20}) is False
+        q.get_nowait()
+        assert q.empty()
+
+    def test_one_off_events_are_not_replayed(self):
+        hub = EventHub()
+        hub.publish("tap", {"tag": "apple:1"}, remember=False)
+        assert hub.subscribe().empty()
+
+    def test_slow_client_drops_oldest(self):
+        hub = EventHub()
+        q = hub.subscribe()
+        for i in range(100):
+            hub.publish("tap", {"n": i}, remember=False)
+        messages = []
+        while not q.empty():
+            messages.append(_data(q.get_nowait())["n"])
+        assert messages[-1] == 99
+        assert len(messages) < 100
+
+    def test_unsubscribe(self):
+        hub = EventHub()
+        q = hub.subscribe()
+        hub.unsubscribe(q)
+        assert hub.client_count() == 0
+        hub.publish("tap", {}, remember=False)
+        assert q.empty()
+
+
+class TestFormatSse:
+    def test_format(self):
+        assert format_sse("tap", '{"tag": "x"}', 7) == 'id: 7\nevent: tap\ndata: {"tag": "x"}\n\n'
@@ -0,0 +1,73 @@
+import socket
+import threading
+import urllib.error
+
+from core.health import HealthMonitor, TapStats, is_network_error
+
+
+def _http_error():
+    return urllib.error.HTTPError("https://itunes.apple.com", 503, "Unavailable", {}, None)
+
+
+class TestIsNetworkError:
+    def test_unreachable_is_network_error(self):
+        assert is_network_error(urllib.error.URLError("Name or service not known"))
+        assert is_network_error(socket.timeout("timed out"))
+        assert is_network_error(ConnectionRefusedError())
+
+    def test_http_and_other_errors_are_not(self):
+        assert not is_network_error(_http_error())
+        assert not is_network_error(ValueError("bad json"))
+
+
+class TestHealthMonitor:
+    def test_goes_offline_after_threshold(self):
+        h = HealthMonitor(probe=lambda: None, failure_threshold=3, probe_interval=60)
+        assert h.record_failure(OSError("down")) is False
+        assert h.record_failure(OSError("down")) is False
+        assert h.record_failure(OSError("down")) is True
+        assert h.offline
+        assert h.stats()["transitions"] == 1
+        h.record_success()
+        h._probe_thread.join(timeout=2)
+        assert not h._probe_thread.is_alive()
+
+    def test_success_resets_failures(self):
+        h = HealthMonitor(probe=lambda: None, failure_threshold=2, probe_interval=60)
+        h.record_failure(OSError("down"))
+        h.record_success()
+        h.record_failure(OSError("down"))
+        assert not h.offline
+
+    def test_non_network_errors_ignored(self):
+        h = HealthMonitor(probe=lambda: None, failure_threshold=1, probe_interval=60)
+        h.record_failure(_http_error())
+        assert not h.offline
+
+    def test_success_ends_offline_mode(self):
+        h = HealthMonitor(probe=lambda: None, failure_threshold=1, probe_interval=60)
+        h.record_failure(OSError("down"))
+        h.record_success()
+        assert not h.offline
+        assert h.stats()["transitions"] == 2
+
+    def test_probe_recovers(self):
+        probed = threading.Event()
+        h = HealthMonitor(probe=probed.set, failure_threshold=1, probe_interval=0.01)
+        h.record_failure(OSError("down"))
+        assert probed.wait(timeout=2)
+        h._probe_thread.join(timeout=2)
+        assert not h.offline
+
+
+class TestTapStats:
+    def test_counts_and_latency_per_path(self):
+        stats = TapStats()
+        stats.record("apple:1", "plan", 0.1)
+        stats.record("apple:2", "plan", 0.3)
+        stats.record("apple:3", "offline", 0.5)
+        s = stats.stats()
+        assert s["paths"]["plan"] == {"count": 2, "avg_ms": 200, "last_ms": 300}
+        assert s["paths"]["offline"]["count"] == 1
+        assert s["last"]["tag"] == "apple:3"
+        assert s["last"]["path"] == "offline"
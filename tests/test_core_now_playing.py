@@ -0,0 +1,129 @@
+import queue
+from unittest.mock import MagicMock
+
+from core.now_playing import NowPlayingMonitor, track_id_from_uri
+
+APPLE_URI = "x-sonos-http:song%3a1440904001.mp4?sid=204&flags=8232&sn=3"
+
+
+def _sub():
+    sub = MagicMock()
+    sub.time_left = 300
+    sub.events = queue.Queue()
+    return sub
+
+
+def _event(**variables):
+    event = MagicMock()
+    event.variables = variables
+    return event
+
+
+def _started_monitor():
+    monitor = NowPlayingMonitor()
+    speaker, coordinator = MagicMock(), MagicMock(uid="RINCON_A")
+    transport, volume = _sub(), _sub()
+    coordinator.avTransport.subscribe.return_value = transport
+    speaker.renderingControl.subscribe.return_value = volume
+    assert monitor.start("10.0.0.12", speaker, coordinator)
+    return monitor, transport, volume
+
+
+def _track_meta(title="Track One", creator="Test Artist", album="Test Album"):
+    return MagicMock(title=title, creator=creator, album=album)
+
+
+class TestTrackIdFromUri:
+    def test_apple_music_uri(self):
+        assert track_id_from_uri(APPLE_URI) == 1440904001
+
+    def test_other_service_is_ignored(self):
+        assert track_id_from_uri("x-sonos-http:song%3a1440904001.mp4?sid=201") is None
+
+    def test_empty_uri(self):
+        assert track_id_from_uri("") is None
+
+
+class TestNowPlayingMonitor:
+    def test_snapshot_from_events(self):
+        monitor, transport, volume = _started_monitor()
+        transport.callback(_event(transport_state="PLAYING", current_track_uri=APPLE_URI,
+                                  current_track_meta_data=_track_meta()))
+        volume.callback(_event(volume={"Master": "32", "LF": "100", "RF": "100"}))
+        assert monitor.serves("10.0.0.12")
+        assert monitor.now_playing() == {
+            "title": "Track One", "artist": "Test Artist", "album": "Test Album",
+            "track_id": 1440904001, "paused": False,
+        }
+        assert monitor.volume() == 32
+
+    def test_partial_event_keeps_track(self):
+        monitor, transport, volume = _started_monitor()
+        transport.callback(_event(transport_state="PLAYING", current_track_uri=APPLE_URI,
+                                  current_track_meta_data=_track_meta()))
+        transport.callback(_event(transport_state="PAUSED_PLAYBACK"))
+        assert monitor.now_playing()["paused"] is True
+        assert monitor.now_playing()["title"] == "Track One"
+
+    def test_stopped_returns_none(self):
+        monitor, transport, volume = _started_monitor()
+        transport.callback(_event(transport_state="STOPPED", current_track_uri="",
+                                  current_track_meta_data=""))
+        assert monitor.now_playing() is None
+
+    def test_replays_events_queued_before_callback(self):
+        monitor = NowPlayingMonitor()
+        speaker, coordinator = MagicMock(), MagicMock()
+        transport, volume = _sub(), _sub()
+        transport.events.put(_event(transport_state="PLAYING", current_track_uri=APPLE_URI,
+                                    current_track_meta_data=_track_meta()))
+        volume.events.put(_event(volume={"Master": "10"}))
+        coordinator.avTransport.subscribe.return_value = transport
+        speaker.renderingControl.subscribe.return_value = volume
+        monitor.start("10.0.0.12", speaker, coordinator)
+        assert monitor.serves("10.0.0.12")
+        assert monitor.volume() == 10
+
+    def test_not_serving_until_snapshot_complete(self):
+        monitor, transport, volume = _started_monitor()
+        transport.callback(_event(transport_state="PLAYING"))
+        assert not monitor.serves("10.0.0.12")
+
+    def test_not_serving_other_ip(self):
+        monitor, transport, volume = _started_monitor()
+        transport.callback(_event(transport_state="PLAYING"))
+        volume.callback(_event(volume={"Master": "10"}))
+        assert not monitor.serves("10.0.0.99")
+
+    def test_not_serving_other_coordinator(self):
+        monitor, transport, volume = _started_monitor()
+        transport.callback(_event(transport_state="PLAYING"))
+        volume.callback(_event(volume={"Master": "10"}))
+        assert monitor.serves("10.0.0.12", "RINCON_A")
+        assert not monitor.serves("10.0.0.12", "RINCON_B")
+
+    def test_renew_failure_stops_serving(self):
+        monitor, transport, volume = _started_monitor()
+        transport.callback(_event(transport_state="PLAYING"))
+        volume.callback(_event(volume={"Master": "10"}))
+        transport.auto_renew_fail(Exception("gone"))
+        assert not monitor.serves("10.0.0.12")
+        volume.unsubscribe.assert_called_once()
+
+    def test_subscribe_failure_returns_false(self):
+        monitor = NowPlayingMonitor()
+        speaker, coordinator = MagicMock(), MagicMock()
+        transport = _sub()
+        coordinator.avTransport.subscribe.return_value = transport
+        speaker.renderingControl.subscribe.side_effect = OSError("no route")
+        assert monitor.start("10.0.0.12", speaker, coordinator) is False
+        transport.unsubscribe.assert_called_once()
+        assert not monitor.serves("10.0.0.12")
+
+    def test_listener_called_on_change_only(self):
+        monitor, transport, volume = _started_monitor()
+        calls = []
+        monitor.add_listener(lambda: calls.append(1))
+        volume.callback(_event(volume={"Master": "10"}))
+        volume.callback(_event(volume={"Master": "10"}))
+        assert len(calls) == 1
@@ -0,0 +1,58 @@
+import json
+
+from core.play_plans import PlayPlanStore
+
+SAMPLE_PLAN = {
+    "sn": "3",
+    "udn": "SA_RINCON52231_X_#Svc52231-f7c0f087-Token",
+    "items": [{"uri": "x-sonos-http:song%3a1440904001.mp4?sid=204&flags=8232&sn=3",
+               "metadata": "<DIDL-Lite></DIDL-Lite>"}],
+}
+
+
+class TestPlayPlanStore:
+    def test_get_returns_none_for_unknown_tag(self, tmp_path):
+        store = PlayPlanStore(str(tmp_path / "play_plans.json"))
+        assert store.get("apple:1440903625") is None
+
+    def test_put_then_get(self, tmp_path):
+        store = PlayPlanStore(str(tmp_path / "play_plans.json"))
+        store.put("apple:1440903625", SAMPLE_PLAN)
+        plan = store.get("apple:1440903625")
+        assert plan["items"] == SAMPLE_PLAN["items"]
+        assert plan["udn"] == SAMPLE_PLAN["udn"]
+
+    def test_put_stamps_built_at(self, tmp_path):
+        store = PlayPlanStore(str(tmp_path / "play_plans.json"))
+        store.put("apple:1440903625", SAMPLE_PLAN)
+        assert store.get("apple:1440903625")["built_at"] > 0
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "play_plans.json")
+        PlayPlanStore(path).put("apple:1440903625", SAMPLE_PLAN)
+        assert PlayPlanStore(path).get("apple:1440903625")["sn"] == "3"
+
+    def test_creates_missing_data_dir(self, tmp_path):
+        path = tmp_path / "data" / "play_plans.json"
+        PlayPlanStore(str(path)).put("apple:1440903625", SAMPLE_PLAN)
+        assert "apple:1440903625" in json.loads(path.read_text())
+
+    def test_discard_removes_plan(self, tmp_path):
+        path = str(tmp_path / "play_plans.json")
+        store = PlayPlanStore(path)
+        store.put("apple:1440903625", SAMPLE_PLAN)
+        store.discard("apple:1440903625")
+        assert store.get("apple:1440903625") is None
+        assert PlayPlanStore(path).get("apple:1440903625") is None
+
+    def test_clear_removes_all(self, tmp_path):
+        store = PlayPlanStore(str(tmp_path / "play_plans.json"))
+        store.put("apple:1", SAMPLE_PLAN)
+        store.put("apple:2", SAMPLE_PLAN)
+        store.clear()
+        assert len(store) == 0
+
+    def test_corrupt_file_starts_empty(self, tmp_path):
+        path = tmp_path / "play_plans.json"
+        path.write_text("{not json")
+        assert len(PlayPlanStore(str(path))) == 0
@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock
+
+import soco.services
+
+from core.session_pool import SessionPool
+
+
+class TestSessionPool:
+    def test_reuses_session_per_ip(self):
+        pool = SessionPool()
+        first = pool.session("10.0.0.12")
+        assert pool.session("10.0.0.12") is first
+        assert pool.session("10.0.0.13") is not first
+        assert pool.stats()["hits"] == 1
+        assert pool.stats()["misses"] == 2
+
+    def test_reset_closes_session(self):
+        pool = SessionPool()
+        sess = pool.session("10.0.0.12")
+        close = MagicMock()
+        sess.close = close
+        pool.reset("10.0.0.12")
+        close.assert_called_once()
+        assert pool.session("10.0.0.12") is not sess
+        assert pool.stats()["resets"] == 1
+
+    def test_reset_unknown_ip_is_not_counted(self):
+        pool = SessionPool()
+        pool.reset("10.0.0.12")
+        assert pool.stats()["resets"] == 0
+
+    def test_reset_all(self):
+        pool = SessionPool()
+        pool.session("10.0.0.12")
+        pool.session("10.0.0.13")
+        pool.reset()
+        assert pool.stats()["sessions"] == 0
+        assert pool.stats()["resets"] == 2
+
+    def test_session_is_per_host(self):
+        pool = SessionPool()
+        assert pool.session_for_url("http://10.0.0.12:1400/MediaRenderer/AVTransport/Control") \
+            is pool.session("10.0.0.12")
+        assert pool.session("10.0.0.13") is not pool.session("10.0.0.12")
+
+    def test_install_routes_soco_posts_through_session(self, monkeypatch):
+        monkeypatch.setattr(soco.services, "requests", soco.services.requests)
+        pool = SessionPool()
+        sess = pool.session("10.0.0.12")
+        sess.post = MagicMock(return_value="response")
+        pool.install()
+        url = "http://10.0.0.12:1400/MediaRenderer/AVTransport/Control"
+        assert soco.services.requests.post(url, data=b"x", timeout=5) == "response"
+        sess.post.assert_called_once_with(url, data=b"x", timeout=5)
+        # Anything else still resolves on the real requests module
+        import requests
+        assert soco.services.requests.exceptions is requests.exceptions
@@ -1,4 +1,6 @@
 import json
+import pytest
+import re
 from unittest.mock import patch, MagicMock
 from providers.apple_music import AppleMusicProvider
 
@@ -35,10 +37,31 @@ def _make_provider(udn=SAMPLE_UDN):
     return p
 
 
-def _get_enqueued(mock_speaker, call_index):
-    """Extract the EnqueuedURI and EnqueuedURIMetaData from an AddURIToQueue call."""
-    call_params = dict(mock_speaker.avTransport.AddURIToQueue.call_args_list[call_index][0][0])
-    return call_params["EnqueuedURI"], call_params["EnqueuedURIMetaData"]
+def _solo_speaker():
+    """A MagicMock speaker that is its own group coordinator."""
+    speaker = MagicMock()
+    speaker.group.coordinator = speaker
+    return speaker
+
+
+def _all_enqueued(mock_speaker):
+    """Return every (uri, metadata) pair sent via AddMultipleURIsToQueue or AddURIToQueue."""
+    enqueued = []
+    for c in mock_speaker.avTransport.AddMultipleURIsToQueue.call_args_list:
+        params = dict(c[0][0])
+        uris = params["EnqueuedURIs"].split(" ")
+        metas = re.findall(r"<DIDL-Lite.*?</DIDL-Lite>", params["EnqueuedURIsMetaData"])
+        assert len(uris) == len(metas) == params["NumberOfURIs"]
+        enqueued.extend(zip(uris, metas))
+    for c in mock_speaker.avTransport.AddURIToQueue.call_args_list:
+        params = dict(c[0][0])
+        enqueued.append((params["EnqueuedURI"], params["EnqueuedURIMetaData"]))
+    return enqueued
+
+
+def _get_enqueued(mock_speaker, index):
+    """Extract the URI and DIDL metadata of the index-th enqueued item."""
+    return _all_enqueued(mock_speaker)[index]
 
 
 class TestPlayAlbum:
@@ -50,7 +73,7 @@ class TestPlayAlbum:
     def test_adds_all_tracks(self, mock_speaker):
         from core.sonos_player import play_album
         play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
-        assert mock_speaker.avTransport.AddURIToQueue.call_count == 2
+        assert len(_all_enqueued(mock_speaker)) == 2
 
     def test_adds_tracks_with_correct_metadata(self, mock_speaker):
         from core.sonos_player import play_album
@@ -381,9 +404,9 @@ class TestGetNowPlayingExtra:
 class TestTransportSelfHealing:
     def test_pause_heals_on_exception(self, mocker):
         from core.sonos_player import pause
-        old_speaker = MagicMock()
+        old_speaker = _solo_speaker()
         old_speaker.pause.side_effect = Exception("connection refused")
-        new_speaker = MagicMock()
+        new_speaker = _solo_speaker()
         mocker.patch("soco.SoCo", side_effect=[old_speaker, new_speaker])
         mocker.patch("core.sonos_player._rediscover_speaker", return_value="10.0.0.99")
         pause("10.0.0.12", speaker_name="Living Room", config_path="/tmp/config.json")
@@ -392,7 +415,7 @@ class TestTransportSelfHealing:
     def test_pause_raises_without_speaker_info(self, mocker):
         import pytest
         from core.sonos_player import pause
-        speaker = MagicMock()
+        speaker = _solo_speaker()
         speaker.pause.side_effect = Exception("connection refused")
         mocker.patch("soco.SoCo", return_value=speaker)
         with pytest.raises(Exception, match="connection refused"):
@@ -400,9 +423,9 @@ class TestTransportSelfHealing:
 
     def test_resume_heals_on_exception(self, mocker):
         from core.sonos_player import resume
-        old_speaker = MagicMock()
+        old_speaker = _solo_speaker()
         old_speaker.play.side_effect = Exception("connection refused")
-        new_speaker = MagicMock()
+        new_speaker = _solo_speaker()
         mocker.patch("soco.SoCo", side_effect=[old_speaker, new_speaker])
         mocker.patch("core.sonos_player._rediscover_speaker", return_value="10.0.0.99")
         resume("10.0.0.12", speaker_name="Living Room", config_path="/tmp/config.json")
@@ -411,7 +434,7 @@ class TestTransportSelfHealing:
     def test_resume_raises_without_speaker_info(self, mocker):
         import pytest
         from core.sonos_player import resume
-        speaker = MagicMock()
+        speaker = _solo_speaker()
         speaker.play.side_effect = Exception("connection refused")
         mocker.patch("soco.SoCo", return_value=speaker)
         with pytest.raises(Exception, match="connection refused"):
@@ -419,9 +442,9 @@ class TestTransportSelfHealing:
 
     def test_stop_heals_on_exception(self, mocker):
         from core.sonos_player import stop
-        old_speaker = MagicMock()
+        old_speaker = _solo_speaker()
         old_speaker.stop.side_effect = Exception("connection refused")
-        new_speaker = MagicMock()
+        new_speaker = _solo_speaker()
         mocker.patch("soco.SoCo", side_effect=[old_speaker, new_speaker])
         mocker.patch("core.sonos_player._rediscover_speaker", return_value="10.0.0.99")
         stop("10.0.0.12", speaker_name="Living Room", config_path="/tmp/config.json")
@@ -430,7 +453,7 @@ class TestTransportSelfHealing:
     def test_stop_raises_without_speaker_info(self, mocker):
         import pytest
         from core.sonos_player import stop
-        speaker = MagicMock()
+        speaker = _solo_speaker()
         speaker.stop.side_effect = Exception("connection refused")
         mocker.patch("soco.SoCo", return_value=speaker)
         with pytest.raises(Exception, match="connection refused"):
@@ -438,9 +461,9 @@ class TestTransportSelfHealing:
 
     def test_next_heals_on_exception(self, mocker):
         from core.sonos_player import next_track
-        old_speaker = MagicMock()
+        old_speaker = _solo_speaker()
         old_speaker.next.side_effect = Exception("connection refused")
-        new_speaker = MagicMock()
+        new_speaker = _solo_speaker()
         mocker.patch("soco.SoCo", side_effect=[old_speaker, new_speaker])
         mocker.patch("core.sonos_player._rediscover_speaker", return_value="10.0.0.99")
         next_track("10.0.0.12", speaker_name="Living Room", config_path="/tmp/config.json")
@@ -449,7 +472,7 @@ class TestTransportSelfHealing:
     def test_next_raises_without_speaker_info(self, mocker):
         import pytest
         from core.sonos_player import next_track
-        speaker = MagicMock()
+        speaker = _solo_speaker()
         speaker.next.side_effect = Exception("connection refused")
         mocker.patch("soco.SoCo", return_value=speaker)
         with pytest.raises(Exception, match="connection refused"):
@@ -457,9 +480,9 @@ class TestTransportSelfHealing:
 
     def test_prev_heals_on_exception(self, mocker):
         from core.sonos_player import prev_track
-        old_speaker = MagicMock()
+        old_speaker = _solo_speaker()
         old_speaker.previous.side_effect = Exception("connection refused")
-        new_speaker = MagicMock()
+        new_speaker = _solo_speaker()
         mocker.patch("soco.SoCo", side_effect=[old_speaker, new_speaker])
         mocker.patch("core.sonos_player._rediscover_speaker", return_value="10.0.0.99")
         prev_track("10.0.0.12", speaker_name="Living Room", config_path="/tmp/config.json")
@@ -468,7 +491,7 @@ class TestTransportSelfHealing:
     def test_prev_raises_without_speaker_info(self, mocker):
         import pytest
         from core.sonos_player import prev_track
-        speaker = MagicMock()
+        speaker = _solo_speaker()
         speaker.previous.side_effect = Exception("connection refused")
         mocker.patch("soco.SoCo", return_value=speaker)
         with pytest.raises(Exception, match="connection refused"):
@@ -493,3 +516,405 @@ class TestTransportSelfHealing:
         mocker.patch("soco.SoCo", side_effect=Exception("unreachable"))
         with pytest.raises(Exception, match="unreachable"):
             set_volume("10.0.0.12", 42)
+
+
+class TestPlayPlans:
+    def test_play_album_returns_plan(self, mock_speaker):
+        from core.sonos_player import play_album
+        plan = play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        assert plan["sn"] == "3"
+        assert plan["udn"] == SAMPLE_UDN
+        assert [i["uri"] for i in plan["items"]] == [
+            _real_provider.build_track_uri(t["track_id"], "3") for t in SAMPLE_TRACKS
+        ]
+
+    def test_play_plan_enqueues_stored_items_without_lookups(self, mock_speaker):
+        from core.sonos_player import play_album, play_plan
+        plan = play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        mock_speaker.reset_mock()
+        play_plan("10.0.0.12", plan)
+        mock_speaker.clear_queue.assert_called_once()
+        assert _get_enqueued(mock_speaker, 0) == (plan["items"][0]["uri"], plan["items"][0]["metadata"])
+        mock_speaker.play_from_queue.assert_called_once_with(0)
+        mock_speaker.contentDirectory.Browse.assert_not_called()
+
+    def test_play_plan_heals_on_exception(self, mocker):
+        from core.sonos_player import play_plan
+        old_speaker = MagicMock()
+        old_speaker.group.coordinator = old_speaker
+        old_speaker.clear_queue.side_effect = Exception("connection refused")
+        new_speaker = MagicMock()
+        new_speaker.group.coordinator = new_speaker
+        mocker.patch("soco.SoCo", side_effect=[old_speaker, new_speaker])
+        mocker.patch("core.sonos_player._rediscover_speaker", return_value="10.0.0.99")
+        play_plan("10.0.0.12", {"items": [{"uri": "u", "metadata": "m"}]},
+                  speaker_name="Living Room", config_path="/tmp/config.json")
+        new_speaker.play_from_queue.assert_called_once_with(0)
+
+    def test_build_album_plan_does_not_touch_queue(self, mock_speaker):
+        from core.sonos_player import build_album_plan
+        plan = build_album_plan("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        assert len(plan["items"]) == 2
+        mock_speaker.clear_queue.assert_not_called()
+        mock_speaker.play_from_queue.assert_not_called()
+
+    def test_build_album_plan_returns_none_for_no_tracks(self, mock_speaker):
+        from core.sonos_player import build_album_plan
+        assert build_album_plan("10.0.0.12", [], _make_provider(), "3") is None
+
+    def test_build_playlist_plan_has_single_container_item(self, mock_speaker):
+        from core.sonos_player import build_playlist_plan
+        provider = _make_provider()
+        provider.build_playlist_uri.side_effect = _real_provider.build_playlist_uri
+        provider.build_playlist_didl.side_effect = _real_provider.build_playlist_didl
+        plan = build_playlist_plan("10.0.0.12", "p.ABC", "Road Trip", provider, "3")
+        assert len(plan["items"]) == 1
+        assert "libraryplaylist%3Ap.ABC" in plan["items"][0]["uri"]
+
+
+def _many_tracks(n):
+    return [dict(SAMPLE_TRACKS[0], track_id=1440904000 + i, name=f"Track {i}") for i in range(n)]
+
+
+class TestBulkEnqueue:
+    def test_album_uses_single_bulk_call(self, mock_speaker):
+        from core.sonos_player import play_album
+        play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        assert mock_speaker.avTransport.AddMultipleURIsToQueue.call_count == 1
+        mock_speaker.avTransport.AddURIToQueue.assert_not_called()
+
+    def test_chunks_large_albums(self, mock_speaker):
+        from core.sonos_player import play_album
+        play_album("10.0.0.12", _many_tracks(40), _make_provider(), "3")
+        calls = mock_speaker.avTransport.AddMultipleURIsToQueue.call_args_list
+        assert [dict(c[0][0])["NumberOfURIs"] for c in calls] == [16, 16, 8]
+
+    def test_preserves_track_order(self, mock_speaker):
+        from core.sonos_player import play_album
+        tracks = _many_tracks(20)
+        play_album("10.0.0.12", tracks, _make_provider(), "3")
+        assert [uri for uri, _ in _all_enqueued(mock_speaker)] == [
+            _real_provider.build_track_uri(t["track_id"], "3") for t in tracks
+        ]
+
+    def test_single_track_uses_add_uri(self, mock_speaker):
+        from core.sonos_player import play_album
+        play_album("10.0.0.12", SAMPLE_TRACKS[:1], _make_provider(), "3")
+        mock_speaker.avTransport.AddMultipleURIsToQueue.assert_not_called()
+        assert mock_speaker.avTransport.AddURIToQueue.call_count == 1
+
+    def test_falls_back_to_per_track_when_rejected(self, mock_speaker):
+        from soco.exceptions import SoCoUPnPException
+        from core.sonos_player import play_album
+        mock_speaker.ip_address = "10.0.0.50"
+        mock_speaker.avTransport.AddMultipleURIsToQueue.side_effect = SoCoUPnPException(
+            "UPnP Error 401", "401", "<error/>")
+        play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        assert mock_speaker.avTransport.AddURIToQueue.call_count == 2
+        mock_speaker.play_from_queue.assert_called_once_with(0)
+
+    def test_fallback_continues_from_rejected_chunk(self, mock_speaker):
+        from soco.exceptions import SoCoUPnPException
+        from core.sonos_player import play_album
+        mock_speaker.ip_address = "10.0.0.51"
+        mock_speaker.avTransport.AddMultipleURIsToQueue.side_effect = [
+            None, SoCoUPnPException("UPnP Error 402", "402", "<error/>"),
+        ]
+        play_album("10.0.0.12", _many_tracks(20), _make_provider(), "3")
+        # First chunk of 16 went in bulk, the remaining 4 one at a time
+        assert mock_speaker.avTransport.AddURIToQueue.call_count == 4
+
+    def test_remembers_speakers_without_bulk_support(self, mock_speaker):
+        from soco.exceptions import SoCoUPnPException
+        from core.sonos_player import play_album
+        mock_speaker.ip_address = "10.0.0.52"
+        mock_speaker.avTransport.AddMultipleURIsToQueue.side_effect = SoCoUPnPException(
+            "UPnP Error 401", "401", "<error/>")
+        play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        assert mock_speaker.avTransport.AddMultipleURIsToQueue.call_count == 1
+        assert mock_speaker.avTransport.AddURIToQueue.call_count == 4
+
+    def test_network_error_is_not_swallowed(self, mock_speaker):
+        import pytest
+        from core.sonos_player import play_album
+        mock_speaker.avTransport.AddMultipleURIsToQueue.side_effect = OSError("connection reset")
+        with pytest.raises(OSError):
+            play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        mock_speaker.avTransport.AddURIToQueue.assert_not_called()
+
+
+class TestStreamingStart:
+    def _wait_for_worker(self):
+        import threading
+        for t in threading.enumerate():
+            if t.name != "MainThread" and t.daemon:
+                t.join(timeout=2)
+
+    def test_plays_after_first_track(self, mock_speaker):
+        from core.sonos_player import play_album
+        order = []
+        mock_speaker.avTransport.AddURIToQueue.side_effect = lambda *a, **k: order.append("add_first")
+        mock_speaker.play_from_queue.side_effect = lambda *a, **k: order.append("play")
+        mock_speaker.avTransport.AddMultipleURIsToQueue.side_effect = lambda *a, **k: order.append("add_rest")
+        play_album("10.0.0.12", _many_tracks(5), _make_provider(), "3", stream=True)
+        self._wait_for_worker()
+        assert order == ["add_first", "play", "add_rest"]
+
+    def test_worker_appends_remaining_tracks_in_order(self, mock_speaker):
+        from core.sonos_player import play_album
+        tracks = _many_tracks(40)
+        play_album("10.0.0.12", tracks, _make_provider(), "3", stream=True)
+        self._wait_for_worker()
+        first = dict(mock_speaker.avTransport.AddURIToQueue.call_args[0][0])["EnqueuedURI"]
+        rest = [uri for c in mock_speaker.avTransport.AddMultipleURIsToQueue.call_args_list
+                for uri in dict(c[0][0])["EnqueuedURIs"].split(" ")]
+        assert [first] + rest == [
+            _real_provider.build_track_uri(t["track_id"], "3") for t in tracks
+        ]
+
+    def test_single_track_does_not_start_worker(self, mock_speaker, mocker):
+        from core.sonos_player import play_album
+        mock_thread = mocker.patch("core.sonos_player.threading.Thread")
+        play_album("10.0.0.12", SAMPLE_TRACKS[:1], _make_provider(), "3", stream=True)
+        mock_thread.assert_not_called()
+        mock_speaker.play_from_queue.assert_called_once_with(0)
+
+    def test_new_play_cancels_worker(self, mock_speaker):
+        import threading
+        from core.sonos_player import play_album
+        entered = threading.Event()
+        gate = threading.Event()
+        bulk_calls = []
+
+        def slow_bulk(params, **kwargs):
+            bulk_calls.append(dict(params)["EnqueuedURIs"])
+            if len(bulk_calls) == 1:
+                entered.set()
+                gate.wait(timeout=2)
+
+        mock_speaker.avTransport.AddMultipleURIsToQueue.side_effect = slow_bulk
+        play_album("10.0.0.12", _many_tracks(40), _make_provider(), "3", stream=True)
+        assert entered.wait(timeout=2)
+        second = threading.Thread(
+            target=play_album, args=("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3"))
+        second.start()
+        gate.set()
+        second.join(timeout=2)
+        self._wait_for_worker()
+        # The first album's worker stopped after its in-flight chunk; the
+        # second album was queued in one bulk call after clearing the queue.
+        assert len(bulk_calls) == 2
+        assert str(SAMPLE_TRACKS[0]["track_id"]) in bulk_calls[-1]
+        assert mock_speaker.clear_queue.call_count == 2
+
+    def test_play_waiting_for_queue_lock_cancels_new_worker(self, mock_speaker):
+        import threading
+        from core.sonos_player import play_album
+        first_clear = threading.Event()
+        release = threading.Event()
+        events = []
+
+        def clear_queue():
+            events.append("clear")
+            if not first_clear.is_set():
+                first_clear.set()
+                release.wait(timeout=2)
+
+        mock_speaker.clear_queue.side_effect = clear_queue
+        mock_speaker.avTransport.AddURIToQueue.side_effect = (
+            lambda params, **k: events.append(dict(params)["EnqueuedURI"]))
+        mock_speaker.avTransport.AddMultipleURIsToQueue.side_effect = (
+            lambda params, **k: events.extend(dict(params)["EnqueuedURIs"].split(" ")))
+        album_a = _many_tracks(5)
+        first = threading.Thread(target=play_album,
+                                 args=("10.0.0.12", album_a, _make_provider(), "3"),
+                                 kwargs={"stream": True})
+        first.start()
+        assert first_clear.wait(timeout=2)
+        # The second play starts while the first still holds the queue lock.
+        album_b = [dict(t, track_id=t["track_id"] + 1000) for t in SAMPLE_TRACKS]
+        second = threading.Thread(target=play_album,
+                                  args=("10.0.0.12", album_b, _make_provider(), "3"))
+        second.start()
+        threading.Event().wait(0.05)
+        release.set()
+        first.join(timeout=2)
+        second.join(timeout=2)
+        self._wait_for_worker()
+        last_clear = len(events) - 1 - events[::-1].index("clear")
+        a_uris = {_real_provider.build_track_uri(t["track_id"], "3") for t in album_a}
+        assert not a_uris & set(events[last_clear:])
+
+    def test_worker_error_is_logged_not_raised(self, mock_speaker):
+        from core.sonos_player import play_album
+        mock_speaker.avTransport.AddMultipleURIsToQueue.side_effect = OSError("connection reset")
+        play_album("10.0.0.12", _many_tracks(5), _make_provider(), "3", stream=True)
+        self._wait_for_worker()
+        mock_speaker.play_from_queue.assert_called_once_with(0)
+
+    def test_play_plan_can_stream(self, mock_speaker):
+        from core.sonos_player import play_plan
+        items = [{"uri": f"u{i}", "metadata": f"<DIDL-Lite>{i}</DIDL-Lite>"} for i in range(3)]
+        play_plan("10.0.0.12", {"items": items}, stream=True)
+        self._wait_for_worker()
+        assert mock_speaker.avTransport.AddURIToQueue.call_count == 1
+        assert dict(mock_speaker.avTransport.AddMultipleURIsToQueue.call_args[0][0])["NumberOfURIs"] == 2
+
+
+class TestSpeakerIdentity:
+    @pytest.fixture
+    def identity(self, tmp_path, monkeypatch):
+        from core import sonos_player
+        from core.speaker_identity import SpeakerIdentityStore
+        store = SpeakerIdentityStore(str(tmp_path / "speaker_identity.json"))
+        monkeypatch.setattr(sonos_player, "_identity", store)
+        return store
+
+    def test_udn_is_cached_after_first_lookup(self, mock_speaker, identity):
+        from core.sonos_player import play_album
+        provider = _make_provider()
+        play_album("10.0.0.12", SAMPLE_TRACKS, provider, "3")
+        play_album("10.0.0.12", SAMPLE_TRACKS, provider, "3")
+        provider.lookup_udn.assert_called_once()
+        assert identity.get_udn("3") == SAMPLE_UDN
+
+    def test_fallback_udn_is_not_cached(self, mock_speaker, identity):
+        from core.sonos_player import play_album
+        provider = _make_provider(udn="SA_RINCON52231_")
+        provider.sonos_service_type = 52231
+        play_album("10.0.0.12", SAMPLE_TRACKS, provider, "3")
+        assert identity.get_udn("3") is None
+
+    def test_failure_forgets_cached_udn(self, mocker, identity):
+        from core.sonos_player import play_album
+        identity.set_udn("3", "SA_RINCON52231_stale")
+        old_speaker = MagicMock()
+        old_speaker.group.coordinator = old_speaker
+        old_speaker.clear_queue.side_effect = Exception("connection refused")
+        new_speaker = MagicMock()
+        new_speaker.group.coordinator = new_speaker
+        mocker.patch("soco.SoCo", side_effect=[old_speaker, new_speaker])
+        mocker.patch("core.sonos_player._rediscover_speaker", return_value="10.0.0.99")
+        provider = _make_provider()
+        play_album("10.0.0.12", SAMPLE_TRACKS, provider, "3",
+                   speaker_name="Living Room", config_path="/tmp/config.json")
+        provider.lookup_udn.assert_called_once()
+        assert identity.get_udn("3") == SAMPLE_UDN
+
+    def test_refresh_identity_records_speaker_facts(self, mock_speaker, identity):
+        from core.sonos_player import refresh_identity
+        mock_speaker.household_id = "Sonos_abc"
+        mock_speaker.get_speaker_info.return_value = {"model_name": "Sonos One"}
+        mock_speaker.uid = "RINCON_000E58123456"
+        snapshot = refresh_identity("10.0.0.12")
+        assert snapshot == {"household_id": "Sonos_abc", "model": "Sonos One",
+                            "coordinator_uid": "RINCON_000E58123456"}
+
+    def test_refresh_identity_without_store_is_noop(self, mock_speaker):
+        from core.sonos_player import refresh_identity
+        assert refresh_identity("10.0.0.12") is None
+        mock_speaker.get_speaker_info.assert_not_called()
+
+
+class TestSessionPooling:
+    def test_failure_resets_session(self, mocker):
+        from core import sonos_player
+        broken = MagicMock()
+        type(broken).volume = property(lambda self: (_ for _ in ()).throw(OSError("timeout")))
+        mocker.patch("soco.SoCo", return_value=broken)
+        sess = sonos_player._pool.session("10.0.0.12")
+        assert sonos_player.get_volume("10.0.0.12") is None
+        assert sonos_player._pool.session("10.0.0.12") is not sess
+        assert sonos_player.pool_stats()["resets"] == 1
+
+    def test_rediscovery_resets_old_ip(self, mocker, tmp_path):
+        from core import sonos_player
+        config_file = tmp_path / "config.json"
+        config_file.write_text(json.dumps({"speaker_ip": "10.0.0.12", "speaker_name": "Living Room"}))
+        old = sonos_player._pool.session("10.0.0.12")
+        device = MagicMock(player_name="Living Room", ip_address="10.0.0.99")
+        mocker.patch("soco.discover", return_value={device})
+        sonos_player._rediscover_speaker("Living Room", str(config_file))
+        assert sonos_player._pool.session("10.0.0.12") is not old
+
+
+class TestTopologyCache:
+    def test_coordinator_resolved_once_across_plays(self, mock_speaker, mocker):
+        from core.sonos_player import play_album, topology_stats
+        group = mocker.PropertyMock(return_value=MagicMock(coordinator=mock_speaker))
+        type(mock_speaker).group = group
+        play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        play_album("10.0.0.12", SAMPLE_TRACKS, _make_provider(), "3")
+        assert group.call_count == 1
+        assert topology_stats()["hits"] == 1
+
+    def test_transport_goes_to_coordinator(self, mocker):
+        from core.sonos_player import pause
+        member = MagicMock()
+        coordinator = MagicMock()
+        member.group.coordinator = coordinator
+        mocker.patch("soco.SoCo", return_value=member)
+        pause("10.0.0.12")
+        coordinator.pause.assert_called_once()
+        member.pause.assert_not_called()
+
+    def test_failure_invalidates_coordinator(self, mocker):
+        from core.sonos_player import play_plan, topology_stats
+        old_speaker = _solo_speaker()
+        old_speaker.clear_queue.side_effect = Exception("connection refused")
+        new_speaker = _solo_speaker()
+        mocker.patch("soco.SoCo", side_effect=[old_speaker, new_speaker])
+        mocker.patch("core.sonos_player._rediscover_speaker", return_value="10.0.0.12")
+        play_plan("10.0.0.12", {"items": [{"uri": "u", "metadata": "m"}]},
+                  speaker_name="Living Room", config_path="/tmp/config.json")
+        new_speaker.play_from_queue.assert_called_once_with(0)
+        assert topology_stats()["misses"] == 2
+
+
+class TestNowPlayingEvents:
+    def _start(self, mock_speaker):
+        import queue
+        from core.sonos_player import start_now_playing_events
+        subs = []
+        for service in (mock_speaker.avTransport, mock_speaker.renderingControl):
+            sub = MagicMock(time_left=300, events=queue.Queue())
+            service.subscribe.return_value = sub
+            subs.append(sub)
+        assert start_now_playing_events("10.0.0.12")
+        transport, volume = subs
+        meta = MagicMock(title="Track One", creator="Test Artist", album="Test Album")
+        transport.callback(MagicMock(variables={
+            "transport_state": "PLAYING", "current_track_meta_data": meta,
+            "current_track_uri": "x-sonos-http:song%3a1440904001.mp4?sid=204&flags=8232&sn=3"}))
+        volume.callback(MagicMock(variables={"volume": {"Master": "25"}}))
+
+    def test_get_now_playing_answers_from_events(self, mock_speaker):
+        from core.sonos_player import get_now_playing
+        self._start(mock_speaker)
+        result = get_now_playing("10.0.0.12")
+        assert result["track_id"] == 1440904001
+        mock_speaker.get_current_transport_info.assert_not_called()
+        mock_speaker.get_current_track_info.assert_not_called()
+
+    def test_get_volume_answers_from_events(self, mock_speaker):
+        from core.sonos_player import get_volume
+        self._start(mock_speaker)
+        mock_speaker.volume = 99
+        assert get_volume("10.0.0.12") == 25
+
+    def test_regroup_moves_transport_subscription(self, mock_speaker):
+        import queue
+        from core import sonos_player
+        from core.sonos_player import get_now_playing
+        self._start(mock_speaker)
+        new_coordinator = MagicMock(uid="RINCON_NEW")
+        new_coordinator.avTransport.subscribe.return_value = MagicMock(
+            time_left=300, events=queue.Queue())
+        mock_speaker.group.coordinator = new_coordinator
+        sonos_player._topology.invalidate("10.0.0.12")
+        mock_speaker.get_current_transport_info.return_value = {
+            "current_transport_state": "STOPPED"}
+        assert get_now_playing("10.0.0.12") is None  # polled, not the old group's track
+        mock_speaker.get_current_transport_info.assert_called_once()
+        new_coordinator.avTransport.subscribe.assert_called_once_with(auto_renew=True)
@@ -0,0 +1,63 @@
+import json
+
+from core.speaker_identity import SpeakerIdentityStore
+
+SAMPLE_UDN = "SA_RINCON52231_X_#Svc52231-f7c0f087-Token"
+
+
+class TestSpeakerIdentityStore:
+    def test_empty_when_file_missing(self, tmp_path):
+        store = SpeakerIdentityStore(str(tmp_path / "speaker_identity.json"))
+        assert store.snapshot() == {}
+        assert store.get_udn("3") is None
+
+    def test_update_persists_fields(self, tmp_path):
+        path = str(tmp_path / "speaker_identity.json")
+        SpeakerIdentityStore(path).update(model="Sonos One", sn="3")
+        store = SpeakerIdentityStore(path)
+        assert store.get("model") == "Sonos One"
+        assert store.get("sn") == "3"
+
+    def test_udn_round_trip(self, tmp_path):
+        path = str(tmp_path / "speaker_identity.json")
+        SpeakerIdentityStore(path).set_udn("3", SAMPLE_UDN)
+        assert SpeakerIdentityStore(path).get_udn(3) == SAMPLE_UDN
+
+    def test_forget_udn(self, tmp_path):
+        store = SpeakerIdentityStore(str(tmp_path / "speaker_identity.json"))
+        store.set_udn("3", SAMPLE_UDN)
+        store.forget_udn("3")
+        assert store.get_udn("3") is None
+
+    def test_first_household_is_recorded_without_clearing(self, tmp_path):
+        store = SpeakerIdentityStore(str(tmp_path / "speaker_identity.json"))
+        store.set_udn("3", SAMPLE_UDN)
+        assert store.observe_household("Sonos_abc") is False
+        assert store.get("household_id") == "Sonos_abc"
+        assert store.get_udn("3") == SAMPLE_UDN
+
+    def test_household_change_clears_identity(self, tmp_path):
+        store = SpeakerIdentityStore(str(tmp_path / "speaker_identity.json"))
+        store.observe_household("Sonos_abc")
+        store.update(model="Sonos One", sn="3")
+        store.set_udn("3", SAMPLE_UDN)
+        assert store.observe_household("Sonos_xyz") is True
+        assert store.snapshot() == {"household_id": "Sonos_xyz"}
+
+    def test_empty_household_is_ignored(self, tmp_path):
+        store = SpeakerIdentityStore(str(tmp_path / "speaker_identity.json"))
+        store.observe_household("Sonos_abc")
+        assert store.observe_household("") is False
+        assert store.get("household_id") == "Sonos_abc"
+
+    def test_corrupt_file_is_ignored(self, tmp_path):
+        path = tmp_path / "speaker_identity.json"
+        path.write_text("{not json")
+        assert SpeakerIdentityStore(str(path)).snapshot() == {}
+
+    def test_clear_empties_file(self, tmp_path):
+        path = tmp_path / "speaker_identity.json"
+        store = SpeakerIdentityStore(str(path))
+        store.update(model="Sonos One")
+        store.clear()
+        assert json.loads(path.read_text()) == {}
@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+
+from core.topology import TopologyCache
+
+
+def _speaker_with_subscription():
+    speaker = MagicMock()
+    sub = MagicMock()
+    sub.time_left = 300
+    speaker.zoneGroupTopology.subscribe.return_value = sub
+    return speaker, sub
+
+
+class TestTopologyCache:
+    def test_resolves_once_within_refresh_window(self):
+        cache = TopologyCache(refresh_secs=60)
+        resolve = MagicMock(return_value="coordinator")
+        assert cache.coordinator("10.0.0.12", resolve) == "coordinator"
+        assert cache.coordinator("10.0.0.12", resolve) == "coordinator"
+        resolve.assert_called_once()
+        assert cache.stats()["hits"] == 1
+
+    def test_timed_refresh_without_subscription(self, mocker):
+        cache = TopologyCache(refresh_secs=60)
+        clock = mocker.patch("core.topology.time.monotonic", return_value=1000.0)
+        resolve = MagicMock(return_value="coordinator")
+        cache.coordinator("10.0.0.12", resolve)
+        clock.return_value = 1061.0
+        cache.coordinator("10.0.0.12", resolve)
+        assert resolve.call_count == 2
+
+    def test_subscription_keeps_entry_past_refresh(self, mocker):
+        cache = TopologyCache(refresh_secs=60)
+        speaker, sub = _speaker_with_subscription()
+        cache.subscribe(speaker)
+        clock = mocker.patch("core.topology.time.monotonic", return_value=1000.0)
+        resolve = MagicMock(return_value="coordinator")
+        cache.coordinator("10.0.0.12", resolve)
+        clock.return_value = 5000.0
+        cache.coordinator("10.0.0.12", resolve)
+        resolve.assert_called_once()
+        assert cache.stats()["subscribed"] is True
+
+    def test_event_applies_payload_and_clears_cache(self):
+        cache = TopologyCache()
+        speaker, sub = _speaker_with_subscription()
+        cache.subscribe(speaker)
+        resolve = MagicMock(return_value="coordinator")
+        cache.coordinator("10.0.0.12", resolve)
+        event = MagicMock()
+        event.variables = {"zone_group_state": "<ZoneGroupState/>"}
+        sub.callback(event)
+        event.service.soco.zone_group_state.process_payload.assert_called_once()
+        cache.coordinator("10.0.0.12", resolve)
+        assert resolve.call_count == 2
+
+    def test_renew_failure_falls_back_to_timed_refresh(self):
+        cache = TopologyCache()
+        speaker, sub = _speaker_with_subscription()
+        cache.subscribe(speaker)
+        sub.auto_renew_fail(Exception("speaker gone"))
+        assert cache.stats()["subscribed"] is False
+
+    def test_subscribe_failure_is_logged_not_raised(self):
+        cache = TopologyCache()
+        speaker = MagicMock()
+        speaker.zoneGroupTopology.subscribe.side_effect = OSError("no route")
+        cache.subscribe(speaker)
+        assert cache.stats()["subscribed"] is False
+
+    def test_invalidate_single_ip(self):
+        cache = TopologyCache()
+        resolve = MagicMock(return_value="coordinator")
+        cache.coordinator("10.0.0.12", resolve)
+        cache.invalidate("10.0.0.12")
+        cache.coordinator("10.0.0.12", resolve)
+        assert resolve.call_count == 2
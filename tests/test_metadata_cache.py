@@ -0,0 +1,178 @@
+import threading
+
+import pytest
+
+from providers.metadata_cache import MetadataCache
+
+TRACKS = [{"track_id": 1440904001, "name": "Track One"}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = MetadataCache(str(tmp_path / "data" / "metadata_cache.sqlite3"), memory_size=2)
+    yield c
+    c.close()
+
+
+def _loader(value, calls):
+    def load():
+        calls.append(1)
+        return value
+    return load
+
+
+class TestMetadataCache:
+    def test_miss_calls_loader_then_hits_memory(self, cache):
+        calls = []
+        assert cache.get("album", "apple:album:1", _loader(TRACKS, calls)) == TRACKS
+        assert cache.get("album", "apple:album:1", _loader(TRACKS, calls)) == TRACKS
+        assert len(calls) == 1
+        assert cache.stats()["memory_hits"] == 1
+
+    def test_survives_restart(self, tmp_path):
+        path = str(tmp_path / "metadata_cache.sqlite3")
+        first = MetadataCache(path)
+        first.put("album", "apple:album:1", TRACKS)
+        first.close()
+        second = MetadataCache(path)
+        calls = []
+        assert second.get("album", "apple:album:1", _loader([], calls)) == TRACKS
+        assert calls == []
+        assert second.stats()["disk_hits"] == 1
+        second.close()
+
+    def test_memory_tier_is_bounded(self, cache):
+        for i in range(5):
+            cache.put("track", f"apple:track:{i}", TRACKS)
+        stats = cache.stats()
+        assert stats["memory_size"] == 2
+        assert stats["disk_size"] == 5
+
+    def test_stale_entry_is_served_and_refreshed(self, cache, mocker):
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        cache.put("playlist_info", "apple:playlist_info:p.1", {"title": "Old"})
+        clock.return_value = 1000.0 + 3601
+        refreshed = threading.Event()
+
+        def load():
+            refreshed.set()
+            return {"title": "New"}
+
+        assert cache.get("playlist_info", "apple:playlist_info:p.1", load) == {"title": "Old"}
+        assert refreshed.wait(timeout=2)
+        for t in threading.enumerate():
+            if t is not threading.current_thread() and t.daemon:
+                t.join(timeout=2)
+        assert cache.get("playlist_info", "apple:playlist_info:p.1", load) == {"title": "New"}
+
+    def test_expired_entry_is_fetched_synchronously(self, cache, mocker):
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        cache.put("playlist_tracks", "k", ["old"])
+        clock.return_value = 1000.0 + 31 * 86400
+        assert cache.get("playlist_tracks", "k", lambda: ["new"]) == ["new"]
+
+    def test_expired_entry_is_fallback_when_fetch_fails(self, cache, mocker):
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        cache.put("playlist_tracks", "k", ["old"])
+        clock.return_value = 1000.0 + 31 * 86400
+
+        def fail():
+            raise OSError("offline")
+
+        assert cache.get("playlist_tracks", "k", fail) == ["old"]
+        assert cache.stats()["fallbacks"] == 1
+
+    def test_error_without_cached_value_propagates(self, cache):
+        def fail():
+            raise OSError("offline")
+        with pytest.raises(OSError):
+            cache.get("album", "k", fail)
+
+    def test_empty_results_expire_quickly(self, cache, mocker):
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        cache.put("album", "k", [])
+        clock.return_value = 1000.0 + 601
+        calls = []
+        assert cache.get("album", "k", _loader(TRACKS, calls)) == TRACKS
+        assert calls == [1]
+
+    def test_negative_ttl_is_configurable(self, tmp_path, mocker):
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        c = MetadataCache(str(tmp_path / "m.sqlite3"), negative_ttl=60)
+        c.put("album", "k", [])
+        clock.return_value = 1000.0 + 30
+        calls = []
+        assert c.get("album", "k", _loader(TRACKS, calls)) == []
+        assert c.stats()["negative_hits"] == 1
+        clock.return_value = 1000.0 + 61
+        assert c.get("album", "k", _loader(TRACKS, calls)) == TRACKS
+        assert calls == [1]
+        c.close()
+
+    def test_is_negative_ignores_age(self, tmp_path, mocker):
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        path = str(tmp_path / "m.sqlite3")
+        c = MetadataCache(path)
+        c.put("album", "gone", [])
+        c.put("album", "k", TRACKS)
+        clock.return_value = 1000.0 + 365 * 86400
+        assert c.is_negative("gone") is True
+        assert c.is_negative("k") is False
+        assert c.is_negative("unknown") is False
+        c.close()
+        reopened = MetadataCache(path)
+        assert reopened.is_negative("gone") is True
+        assert reopened.stats()["disk_hits"] == 0
+        reopened.close()
+
+    def test_peek_returns_only_fresh_entries(self, cache, mocker):
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        assert cache.peek("album", "k") is None
+        cache.put("album", "k", TRACKS)
+        assert cache.peek("album", "k") == TRACKS
+        clock.return_value = 1000.0 + 8 * 86400
+        assert cache.peek("album", "k") is None
+
+    def test_expires_in(self, cache, mocker):
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        assert cache.expires_in("album", "k") is None
+        cache.put("album", "k", TRACKS)
+        clock.return_value = 1000.0 + 6 * 86400
+        assert cache.expires_in("album", "k") == pytest.approx(86400)
+        assert cache.stats()["memory_hits"] == 0
+
+    def test_offline_serves_expired_copy_without_fetching(self, tmp_path, mocker):
+        from unittest.mock import MagicMock
+        clock = mocker.patch("providers.metadata_cache.time.time", return_value=1000.0)
+        health = MagicMock(offline=True)
+        c = MetadataCache(str(tmp_path / "m.sqlite3"), health=health)
+        c.put("album", "k", TRACKS)
+        clock.return_value = 1000.0 + 365 * 86400
+        calls = []
+        assert c.get("album", "k", _loader(["new"], calls)) == TRACKS
+        assert calls == []
+        assert c.stats()["offline_hits"] == 1
+        c.close()
+
+    def test_fetch_outcomes_reported_to_health(self, tmp_path):
+        from unittest.mock import MagicMock
+        health = MagicMock(offline=False)
+        c = MetadataCache(str(tmp_path / "m.sqlite3"), health=health)
+        c.get("album", "a", lambda: TRACKS)
+        health.record_success.assert_called_once()
+
+        def fail():
+            raise OSError("offline")
+
+        with pytest.raises(OSError):
+            c.get("album", "b", fail)
+        health.record_failure.assert_called_once()
+        c.close()
+
+    def test_disk_trimmed_to_max_rows(self, tmp_path, mocker):
+        mocker.patch("providers.metadata_cache._TRIM_EVERY", 1)
+        c = MetadataCache(str(tmp_path / "m.sqlite3"), max_rows=3)
+        for i in range(6):
+            c.put("track", f"k{i}", TRACKS)
+        assert c.stats()["disk_size"] == 3
+        c.close()
@@ -0,0 +1,120 @@
+import pytest
+
+from providers.playlist_catalog import PlaylistCatalog
+from providers.smapi_client import SmapiClient
+
+
+def _playlists(n, title="Mix"):
+    return [{"id": f"libraryplaylist:p.{i}", "title": f"{title} {i}", "item_type": "playlist",
+             "album_art_uri": ""} for i in range(n)]
+
+
+class _Folder(SmapiClient):
+    """SmapiClient whose libraryfolder:f.4 serves pages of a playlist list."""
+
+    def __init__(self, items):
+        super().__init__("https://example.com/smapi", "tok", "key", "Sonos_hh")
+        self.items = items
+        self.calls = []
+
+    def get_metadata(self, item_id, index=0, count=100):
+        assert item_id == "libraryfolder:f.4"
+        self.calls.append(index)
+        return self.items[index:index + count], len(self.items)
+
+
+class TestPlaylistCatalog:
+    def test_pages_through_whole_library(self):
+        folder = _Folder(_playlists(250))
+        catalog = PlaylistCatalog(folder, page_size=100)
+        assert len(catalog.entries()) == 250
+        assert sorted(folder.calls) == [0, 100, 200]
+        assert catalog.get("p.249")["title"] == "Mix 249"
+
+    def test_lookups_served_from_memory(self):
+        folder = _Folder(_playlists(3))
+        catalog = PlaylistCatalog(folder)
+        catalog.get("p.1")
+        catalog.get("p.2")
+        assert folder.calls == [0]
+        assert catalog.stats()["hits"] == 2
+
+    def test_unchanged_first_page_skips_full_refresh(self, mocker):
+        clock = mocker.patch("providers.playlist_catalog.time.monotonic", return_value=0.0)
+        folder = _Folder(_playlists(150))
+        catalog = PlaylistCatalog(folder, page_size=100, ttl=60)
+        catalog.entries()
+        clock.return_value = 61.0
+        catalog.entries()
+        assert folder.calls == [0, 100, 0]
+        assert catalog.stats()["quick_refreshes"] == 1
+
+    def test_changed_library_paged_again(self, mocker):
+        clock = mocker.patch("providers.playlist_catalog.time.monotonic", return_value=0.0)
+        folder = _Folder(_playlists(150))
+        catalog = PlaylistCatalog(folder, page_size=100, ttl=60)
+        catalog.entries()
+        folder.items = _playlists(151)
+        clock.return_value = 61.0
+        assert len(catalog.entries()) == 151
+        assert folder.calls == [0, 100, 0, 100]
+
+    def test_unknown_id_refreshes_once_per_interval(self, mocker):
+        clock = mocker.patch("providers.playlist_catalog.time.monotonic", return_value=0.0)
+        folder = _Folder(_playlists(2))
+        catalog = PlaylistCatalog(folder, miss_refresh=30)
+        catalog.get("p.0")
+        folder.items = _playlists(3)
+        assert catalog.get("p.2") is None  # checked moments ago
+        clock.return_value = 31.0
+        assert catalog.get("p.2")["title"] == "Mix 2"
+
+    def test_refresh_failure_keeps_cached_list(self, mocker):
+        clock = mocker.patch("providers.playlist_catalog.time.monotonic", return_value=0.0)
+        folder = _Folder(_playlists(2))
+        catalog = PlaylistCatalog(folder, ttl=60)
+        catalog.entries()
+        clock.return_value = 61.0
+
+        def fail(item_id, index=0, count=100):
+            raise OSError("offline")
+
+        folder.get_metadata = fail
+        assert len(catalog.entries()) == 2
+
+    def test_first_load_failure_raises(self):
+        folder = _Folder([])
+
+        def fail(item_id, index=0, count=100):
+            raise OSError("offline")
+
+        folder.get_metadata = fail
+        with pytest.raises(OSError):
+            PlaylistCatalog(folder).entries()
+
+    def test_non_playlist_items_skipped(self):
+        items = _playlists(1) + [{"id": "libraryfolder:x", "title": "Folder", "item_type": "container"}]
+        catalog = PlaylistCatalog(_Folder(items))
+        assert [e["title"] for e in catalog.entries()] == ["Mix 0"]
+
+    def test_pages_sized_by_first_page(self):
+        class _CappedFolder(_Folder):
+            def get_metadata(self, item_id, index=0, count=100):
+                return super().get_metadata(item_id, index, min(count, 50))
+
+        folder = _CappedFolder(_playlists(120))
+        catalog = PlaylistCatalog(folder, page_size=100)
+        assert len(catalog.entries()) == 120
+        assert sorted(folder.calls) == [0, 50, 100]
+
+    def test_short_follow_up_page_is_completed(self):
+        class _FlakyFolder(_Folder):
+            def get_metadata(self, item_id, index=0, count=100):
+                if index == 100:
+                    count = 60  # one page comes back short
+                return super().get_metadata(item_id, index, count)
+
+        folder = _FlakyFolder(_playlists(250))
+        catalog = PlaylistCatalog(folder, page_size=100)
+        assert len(catalog.entries()) == 250
+        assert catalog.get("p.199")["title"] == "Mix 199"
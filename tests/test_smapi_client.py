@@ -10,6 +10,7 @@ from providers.smapi_client import (
     AuthTokenExpired,
     SmapiClient,
     SmapiError,
+    _ItemParser,
     _xml_escape,
 )
 
@@ -136,19 +137,21 @@ def _make_client():
     )
 
 
-def _mock_urlopen(response_xml):
-    """Return a context-manager mock for urllib.request.urlopen."""
-    mock_resp = MagicMock()
-    mock_resp.read.return_value = response_xml.encode("utf-8")
-    mock_resp.__enter__ = lambda s: s
-    mock_resp.__exit__ = MagicMock(return_value=False)
-    return mock_resp
+def _response(response_xml):
+    """Return a response body as returned by providers.transport.fetch."""
+    return response_xml.encode("utf-8")
+
+
+def _chunks(response_xml, size=64):
+    """Return a response body split the way providers.transport.stream yields it."""
+    data = _response(response_xml)
+    return [data[i:i + size] for i in range(0, len(data), size)]
 
 
 class TestSearch:
-    @patch("urllib.request.urlopen")
-    def test_search_returns_items_and_total(self, mock_open):
-        mock_open.return_value = _mock_urlopen(SEARCH_RESPONSE)
+    @patch("providers.transport.stream")
+    def test_search_returns_items_and_total(self, mock_stream):
+        mock_stream.return_value = _chunks(SEARCH_RESPONSE)
         client = _make_client()
         items, total = client.search("Radiohead")
 
@@ -168,45 +171,45 @@ class TestSearch:
         assert track["item_type"] == "track"
         assert track["album"] == "OK Computer"
 
-    @patch("urllib.request.urlopen")
-    def test_search_sends_correct_soap_action(self, mock_open):
-        mock_open.return_value = _mock_urlopen(SEARCH_RESPONSE)
+    @patch("providers.transport.stream")
+    def test_search_sends_correct_soap_action(self, mock_stream):
+        mock_stream.return_value = _chunks(SEARCH_RESPONSE)
         client = _make_client()
         client.search("test query", search_id="album", index=10, count=25)
 
-        req = mock_open.call_args[0][0]
-        assert req.get_header("Soapaction") == '"http://www.sonos.com/Services/1.1#search"'
-        body = req.data.decode("utf-8")
+        kwargs = mock_stream.call_args.kwargs
+        assert kwargs["headers"]["SOAPAction"] == '"http://www.sonos.com/Services/1.1#search"'
+        body = kwargs["data"].decode("utf-8")
         assert "<ns:term>test query</ns:term>" in body
         assert "<ns:id>album</ns:id>" in body
         assert "<ns:index>10</ns:index>" in body
         assert "<ns:count>25</ns:count>" in body
 
-    @patch("urllib.request.urlopen")
-    def test_search_includes_credentials(self, mock_open):
-        mock_open.return_value = _mock_urlopen(SEARCH_RESPONSE)
+    @patch("providers.transport.stream")
+    def test_search_includes_credentials(self, mock_stream):
+        mock_stream.return_value = _chunks(SEARCH_RESPONSE)
         client = _make_client()
         client.search("test")
 
-        body = mock_open.call_args[0][0].data.decode("utf-8")
+        body = mock_stream.call_args.kwargs["data"].decode("utf-8")
         assert "<ns:token>test_token</ns:token>" in body
         assert "<ns:key>test_key</ns:key>" in body
         assert "<ns:householdId>Sonos_test_household_abc123</ns:householdId>" in body
 
-    @patch("urllib.request.urlopen")
-    def test_search_escapes_xml_in_term(self, mock_open):
-        mock_open.return_value = _mock_urlopen(SEARCH_RESPONSE)
+    @patch("providers.transport.stream")
+    def test_search_escapes_xml_in_term(self, mock_stream):
+        mock_stream.return_value = _chunks(SEARCH_RESPONSE)
         client = _make_client()
         client.search("rock & roll <live>")
 
-        body = mock_open.call_args[0][0].data.decode("utf-8")
+        body = mock_stream.call_args.kwargs["data"].decode("utf-8")
         assert "rock &amp; roll &lt;live&gt;" in body
 
 
 class TestGetMetadata:
-    @patch("urllib.request.urlopen")
-    def test_get_metadata_returns_tracks(self, mock_open):
-        mock_open.return_value = _mock_urlopen(GET_METADATA_RESPONSE)
+    @patch("providers.transport.stream")
+    def test_get_metadata_returns_tracks(self, mock_stream):
+        mock_stream.return_value = _chunks(GET_METADATA_RESPONSE)
         client = _make_client()
         items, total = client.get_metadata("album:1440902935")
 
@@ -215,22 +218,114 @@ class TestGetMetadata:
         assert items[0]["title"] == "Airbag"
         assert items[1]["title"] == "Paranoid Android"
 
-    @patch("urllib.request.urlopen")
-    def test_get_metadata_sends_correct_body(self, mock_open):
-        mock_open.return_value = _mock_urlopen(GET_METADATA_RESPONSE)
+    @patch("providers.transport.stream")
+    def test_get_metadata_sends_correct_body(self, mock_stream):
+        mock_stream.return_value = _chunks(GET_METADATA_RESPONSE)
         client = _make_client()
         client.get_metadata("album:123", index=5, count=10)
 
-        body = mock_open.call_args[0][0].data.decode("utf-8")
+        body = mock_stream.call_args.kwargs["data"].decode("utf-8")
         assert "<ns:id>album:123</ns:id>" in body
         assert "<ns:index>5</ns:index>" in body
         assert "<ns:count>10</ns:count>" in body
 
 
+class TestItemParser:
+    def test_items_emitted_as_they_complete(self):
+        parser = _ItemParser()
+        data = _response(GET_METADATA_RESPONSE)
+        split = data.index(b"</mediaMetadata>") + len(b"</mediaMetadata>")
+        first = parser.feed(data[:split])
+        assert [item["title"] for item in first] == ["Airbag"]
+        assert parser.total == 12
+        rest = parser.feed(data[split:]) + parser.close()
+        assert [item["title"] for item in rest] == ["Paranoid Android"]
+
+    def test_nested_track_metadata_fields(self):
+        xml = (
+            '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"><s:Body>'
+            '<getMetadataResponse xmlns="http://www.sonos.com/Services/1.1"><getMetadataResult>'
+            "<mediaMetadata><id>song:1</id><title>One</title><trackMetadata>"
+            "<artist>A</artist><album>B</album><albumArtURI>https://x/1.jpg</albumArtURI>"
+            "</trackMetadata></mediaMetadata><mediaMetadata><title>no id</title></mediaMetadata>"
+            "</getMetadataResult></getMetadataResponse></s:Body></s:Envelope>"
+        )
+        parser = _ItemParser()
+        items = parser.feed(xml.encode()) + parser.close()
+        assert items == [{"item_type": "track", "id": "song:1", "title": "One", "artist": "A",
+                          "album": "B", "album_art_uri": "https://x/1.jpg"}]
+        assert parser.total == 0
+
+    def test_fault_kept_for_caller(self):
+        parser = _ItemParser()
+        assert parser.feed(_response(GENERIC_FAULT)) + parser.close() == []
+        assert parser.fault.find("faultstring").text == "Something went wrong"
+
+    @patch("providers.transport.stream")
+    def test_total_falls_back_to_item_count(self, mock_stream):
+        mock_stream.return_value = _chunks(GET_METADATA_RESPONSE.replace("<total>12</total>", ""))
+        items, total = _make_client().get_metadata("album:1")
+        assert total == len(items) == 2
+
+
+class TestIterMetadata:
+    def _client(self, total, served_page=None):
+        client = _make_client()
+        items = [{"id": f"track:{i}"} for i in range(total)]
+
+        def get_metadata(item_id, index=0, count=100):
+            count = min(count, served_page or count)
+            return items[index:index + count], total
+
+        client.get_metadata = MagicMock(side_effect=get_metadata)
+        return client
+
+    def test_single_page(self):
+        client = self._client(3)
+        assert len(list(client.iter_metadata("libraryplaylist:p.1"))) == 3
+        client.get_metadata.assert_called_once_with("libraryplaylist:p.1", index=0, count=200)
+
+    def test_remaining_pages_fetched_in_order(self):
+        client = self._client(1000)
+        ids = [item["id"] for item in client.iter_metadata("libraryplaylist:p.1", page_size=300)]
+        assert ids == [f"track:{i}" for i in range(1000)]
+        assert client.get_metadata.call_count == 4
+
+    def test_follows_page_size_capped_by_service(self):
+        client = self._client(250, served_page=100)
+        assert len(list(client.iter_metadata("libraryplaylist:p.1", page_size=200))) == 250
+        indexes = sorted(c.args[1] if len(c.args) > 1 else c.kwargs["index"]
+                         for c in client.get_metadata.call_args_list)
+        assert indexes == [0, 100, 200]
+
+    def test_empty_container(self):
+        client = self._client(0)
+        assert list(client.iter_metadata("libraryplaylist:p.1")) == []
+
+    def test_short_follow_up_page_is_completed(self):
+        client = self._client(500)
+        serve = client.get_metadata.side_effect
+
+        def get_metadata(item_id, index=0, count=100):
+            if index == 200:
+                count = 120  # e.g. a transient cap on one page
+            return serve(item_id, index, count)
+
+        client.get_metadata.side_effect = get_metadata
+        ids = [item["id"] for item in client.iter_metadata("libraryplaylist:p.1")]
+        assert ids == [f"track:{i}" for i in range(500)]
+
+    def test_get_all_metadata_returns_every_page(self):
+        client = self._client(450)
+        items = client.get_all_metadata("libraryplaylist:p.1", page_size=100)
+        assert [item["id"] for item in items] == [f"track:{i}" for i in range(450)]
+        assert client.get_metadata.call_count == 5
+
+
 class TestGetMediaMetadata:
-    @patch("urllib.request.urlopen")
-    def test_get_media_metadata_returns_item(self, mock_open):
-        mock_open.return_value = _mock_urlopen(GET_MEDIA_METADATA_RESPONSE)
+    @patch("providers.transport.fetch")
+    def test_get_media_metadata_returns_item(self, mock_fetch):
+        mock_fetch.return_value = _response(GET_MEDIA_METADATA_RESPONSE)
         client = _make_client()
         item = client.get_media_metadata("track:1440903001")
 
@@ -240,11 +335,17 @@ class TestGetMediaMetadata:
         assert item["artist"] == "Radiohead"
         assert item["album"] == "OK Computer"
 
+    @patch("providers.transport.fetch")
+    def test_get_media_metadata_is_retried(self, mock_fetch):
+        mock_fetch.return_value = _response(GET_MEDIA_METADATA_RESPONSE)
+        _make_client().get_media_metadata("track:1440903001")
+        assert mock_fetch.call_args.kwargs["retries"] == 1
+
 
 class TestRefreshAuthToken:
-    @patch("urllib.request.urlopen")
-    def test_refresh_updates_credentials(self, mock_open):
-        mock_open.return_value = _mock_urlopen(REFRESH_TOKEN_RESPONSE)
+    @patch("providers.transport.fetch")
+    def test_refresh_updates_credentials(self, mock_fetch):
+        mock_fetch.return_value = _response(REFRESH_TOKEN_RESPONSE)
         client = _make_client()
         assert client.token == "test_token"
         assert client.key == "test_key"
@@ -256,37 +357,73 @@ class TestRefreshAuthToken:
         assert client.token == "NewTokenValue123"
         assert client.key == "9999999999"
 
+    @patch("providers.transport.fetch")
+    def test_refresh_is_not_retried(self, mock_fetch):
+        mock_fetch.return_value = _response(REFRESH_TOKEN_RESPONSE)
+        _make_client().refresh_auth_token()
+        assert mock_fetch.call_args.kwargs["retries"] == 0
+
+
+class TestTokenLifetime:
+    @patch("providers.transport.fetch")
+    def test_refresh_stamps_issue_time(self, mock_fetch, mocker):
+        mocker.patch("providers.smapi_client.time.time", return_value=1000.0)
+        mock_fetch.return_value = _response(REFRESH_TOKEN_RESPONSE)
+        client = _make_client()
+        assert client.refresh_due_in() == 0.0
+        client.refresh_auth_token()
+        assert client.token_issued_at == 1000.0
+        assert client.refresh_due_in() == pytest.approx(client.token_lifetime * 0.8)
+
+    def test_expiry_shortens_learned_lifetime(self, mocker):
+        clock = mocker.patch("providers.smapi_client.time.time", return_value=1000.0)
+        client = _make_client()
+        client.token_issued_at = 1000.0
+        clock.return_value = 1000.0 + 3600
+        client.note_token_expired("other_token")
+        assert client.token_lifetime == 12 * 3600
+        client.note_token_expired("test_token")
+        assert client.token_lifetime == 3600
+
+    @patch("providers.transport.fetch")
+    def test_refresh_if_current_skips_replaced_token(self, mock_fetch):
+        mock_fetch.return_value = _response(REFRESH_TOKEN_RESPONSE)
+        client = _make_client()
+        assert client.refresh_if_current("test_token") == ("NewTokenValue123", "9999999999")
+        assert client.refresh_if_current("test_token") is None
+        assert mock_fetch.call_count == 1
+
 
 class TestErrorHandling:
-    @patch("urllib.request.urlopen")
-    def test_auth_expired_raises_specific_exception(self, mock_open):
+    @patch("providers.transport.stream")
+    def test_auth_expired_raises_specific_exception(self, mock_stream):
         error = urllib.error.HTTPError(
             "https://example.com", 500, "Server Error", {},
             io.BytesIO(AUTH_EXPIRED_FAULT.encode("utf-8")),
         )
-        mock_open.side_effect = error
+        mock_stream.side_effect = error
         client = _make_client()
 
         with pytest.raises(AuthTokenExpired) as exc_info:
             client.search("test")
         assert "AuthTokenExpired" in str(exc_info.value)
 
-    @patch("urllib.request.urlopen")
-    def test_generic_fault_raises_smapi_error(self, mock_open):
+    @patch("providers.transport.stream")
+    def test_generic_fault_raises_smapi_error(self, mock_stream):
         error = urllib.error.HTTPError(
             "https://example.com", 500, "Server Error", {},
             io.BytesIO(GENERIC_FAULT.encode("utf-8")),
         )
-        mock_open.side_effect = error
+        mock_stream.side_effect = error
         client = _make_client()
 
         with pytest.raises(SmapiError) as exc_info:
             client.search("test")
         assert exc_info.value.error_code == "999"
 
-    @patch("urllib.request.urlopen")
-    def test_fault_in_200_response_raises(self, mock_open):
-        mock_open.return_value = _mock_urlopen(AUTH_EXPIRED_FAULT)
+    @patch("providers.transport.stream")
+    def test_fault_in_200_response_raises(self, mock_stream):
+        mock_stream.return_value = _chunks(AUTH_EXPIRED_FAULT)
         client = _make_client()
 
         with pytest.raises(AuthTokenExpired):
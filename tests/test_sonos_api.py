@@ -3,17 +3,13 @@ import json
 import urllib.error
 
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 from providers.sonos_api import SonosControlClient, SonosAuthError
 
 
 def make_response(data: dict):
-    mock = MagicMock()
-    mock.__enter__ = lambda s: s
-    mock.__exit__ = MagicMock(return_value=False)
-    mock.read.return_value = json.dumps(data).encode()
-    return mock
+    return json.dumps(data).encode()
 
 
 def make_http_error(code: int, body: str = ""):
@@ -57,7 +53,7 @@ class TestGetAuthUrl:
 class TestExchangeCode:
     def test_returns_access_refresh_expires(self, client):
         resp = make_response({"access_token": "acc", "refresh_token": "ref", "expires_in": 3600})
-        with patch("urllib.request.urlopen", return_value=resp):
+        with patch("providers.transport.fetch", return_value=resp):
             access, refresh, expires = client.exchange_code(
                 "code123", "https://vinyl-mac.local/sonos/callback"
             )
@@ -66,27 +62,25 @@ class TestExchangeCode:
         assert expires == 3600
 
     def test_raises_sonos_auth_error_on_http_error(self, client):
-        with patch("urllib.request.urlopen", side_effect=make_http_error(400, '{"error":"invalid_grant"}')):
+        with patch("providers.transport.fetch", side_effect=make_http_error(400, '{"error":"invalid_grant"}')):
             with pytest.raises(SonosAuthError, match="400"):
                 client.exchange_code("bad-code", "https://vinyl-mac.local/sonos/callback")
 
     def test_uses_basic_auth_header(self, client):
         resp = make_response({"access_token": "a", "refresh_token": "r", "expires_in": 1})
-        with patch("urllib.request.urlopen", return_value=resp) as mock_open:
+        with patch("providers.transport.fetch", return_value=resp) as mock_fetch:
             client.exchange_code("c", "https://vinyl-mac.local/sonos/callback")
-        req = mock_open.call_args[0][0]
-        assert req.get_header("Authorization").startswith("Basic ")
+        assert mock_fetch.call_args.kwargs["headers"]["Authorization"].startswith("Basic ")
 
     def test_posts_to_token_url(self, client):
         resp = make_response({"access_token": "a", "refresh_token": "r", "expires_in": 1})
-        with patch("urllib.request.urlopen", return_value=resp) as mock_open:
+        with patch("providers.transport.fetch", return_value=resp) as mock_fetch:
             client.exchange_code("c", "https://vinyl-mac.local/sonos/callback")
-        req = mock_open.call_args[0][0]
-        assert "oauth/access" in req.full_url
+        assert "oauth/access" in mock_fetch.call_args[0][0]
 
     def test_handles_missing_refresh_token(self, client):
         resp = make_response({"access_token": "a", "expires_in": 1})
-        with patch("urllib.request.urlopen", return_value=resp):
+        with patch("providers.transport.fetch", return_value=resp):
             access, refresh, expires = client.exchange_code("c", "https://x/cb")
         assert access == "a"
         assert refresh == ""
@@ -95,52 +89,51 @@ class TestExchangeCode:
 class TestRefreshAccessToken:
     def test_returns_new_access_token_and_expiry(self, client):
         resp = make_response({"access_token": "new-acc", "expires_in": 7200})
-        with patch("urllib.request.urlopen", return_value=resp):
+        with patch("providers.transport.fetch", return_value=resp):
             access, expires = client.refresh_access_token("old-refresh")
         assert access == "new-acc"
         assert expires == 7200
 
     def test_raises_on_http_error(self, client):
-        with patch("urllib.request.urlopen", side_effect=make_http_error(401)):
+        with patch("providers.transport.fetch", side_effect=make_http_error(401)):
             with pytest.raises(SonosAuthError):
                 client.refresh_access_token("bad-token")
 
     def test_uses_refresh_grant_type(self, client):
         resp = make_response({"access_token": "a", "expires_in": 1})
-        with patch("urllib.request.urlopen", return_value=resp) as mock_open:
+        with patch("providers.transport.fetch", return_value=resp) as mock_fetch:
             client.refresh_access_token("my-refresh")
-        req = mock_open.call_args[0][0]
-        assert b"grant_type=refresh_token" in req.data
-        assert b"refresh_token=my-refresh" in req.data
+        data = mock_fetch.call_args.kwargs["data"]
+        assert b"grant_type=refresh_token" in data
+        assert b"refresh_token=my-refresh" in data
 
 
 class TestGetHouseholds:
     def test_returns_household_list(self, client):
         resp = make_response({"households": [{"id": "hh-123", "name": "Home"}]})
-        with patch("urllib.request.urlopen", return_value=resp):
+        with patch("providers.transport.fetch", return_value=resp):
             households = client.get_households("valid-token")
         assert len(households) == 1
         assert households[0]["id"] == "hh-123"
 
     def test_returns_empty_list_when_none(self, client):
         resp = make_response({"households": []})
-        with patch("urllib.request.urlopen", return_value=resp):
+        with patch("providers.transport.fetch", return_value=resp):
             result = client.get_households("valid-token")
         assert result == []
 
     def test_raises_sonos_auth_error_on_401(self, client):
-        with patch("urllib.request.urlopen", side_effect=make_http_error(401)):
+        with patch("providers.transport.fetch", side_effect=make_http_error(401)):
             with pytest.raises(SonosAuthError, match="Unauthorized"):
                 client.get_households("bad-token")
 
     def test_uses_bearer_auth_header(self, client):
         resp = make_response({"households": []})
-        with patch("urllib.request.urlopen", return_value=resp) as mock_open:
+        with patch("providers.transport.fetch", return_value=resp) as mock_fetch:
             client.get_households("my-token")
-        req = mock_open.call_args[0][0]
-        assert req.get_header("Authorization") == "Bearer my-token"
+        assert mock_fetch.call_args.kwargs["headers"]["Authorization"] == "Bearer my-token"
 
     def test_raises_non_401_http_errors(self, client):
-        with patch("urllib.request.urlopen", side_effect=make_http_error(500)):
+        with patch("providers.transport.fetch", side_effect=make_http_error(500)):
             with pytest.raises(SonosAuthError, match="500"):
                 client.get_households("token")
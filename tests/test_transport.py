@@ -0,0 +1,103 @@
+import urllib.error
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from providers.transport import Transport
+
+
+def _response(status=200, content=b"ok"):
+    return MagicMock(status_code=status, content=content, reason="Reason", headers={})
+
+
+@pytest.fixture
+def transport(mocker):
+    mocker.patch("providers.transport.time.sleep")
+    return Transport(retries=2, backoff=0.01)
+
+
+def _session(transport, host, side_effect):
+    sess = transport.session(host)
+    sess.request = MagicMock(side_effect=side_effect)
+    return sess
+
+
+class TestTransport:
+    def test_returns_body_and_reuses_session_per_host(self, transport):
+        sess = _session(transport, "itunes.apple.com",
+                        [_response(content=b"a"), _response(content=b"b")])
+        assert transport.fetch("https://itunes.apple.com/lookup?id=1") == b"a"
+        assert transport.fetch("https://itunes.apple.com/lookup?id=2") == b"b"
+        assert transport.session("itunes.apple.com") is sess
+        assert transport.session("api.sonos.com") is not sess
+        assert transport.stats()["itunes.apple.com"]["requests"] == 2
+
+    def test_data_makes_a_post_with_headers_and_timeout(self, transport):
+        sess = _session(transport, "example.com", [_response()])
+        transport.fetch("https://example.com/soap", data=b"<x/>", headers={"A": "b"}, timeout=3)
+        sess.request.assert_called_once_with("POST", "https://example.com/soap", data=b"<x/>",
+                                             headers={"A": "b"}, timeout=3, stream=False)
+
+    def test_error_status_raises_http_error_with_body(self, transport):
+        _session(transport, "example.com", [_response(404, b"missing")])
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            transport.fetch("https://example.com/x")
+        assert exc_info.value.code == 404
+        assert exc_info.value.read() == b"missing"
+        assert transport.stats()["example.com"]["http_errors"] == 1
+
+    def test_get_retried_on_connection_error_and_503(self, transport):
+        sess = _session(transport, "example.com", [
+            requests.ConnectionError("reset"), _response(503), _response(content=b"ok")])
+        assert transport.fetch("https://example.com/x") == b"ok"
+        assert sess.request.call_count == 3
+        stats = transport.stats()["example.com"]
+        assert stats["retries"] == 2
+        assert stats["errors"] == 1
+
+    def test_retries_exhausted_raise(self, transport):
+        _session(transport, "example.com", [requests.ConnectionError("reset")] * 3)
+        with pytest.raises(requests.ConnectionError):
+            transport.fetch("https://example.com/x")
+
+    def test_post_not_retried_by_default(self, transport):
+        sess = _session(transport, "example.com", [requests.ConnectionError("reset")])
+        with pytest.raises(requests.ConnectionError):
+            transport.fetch("https://example.com/x", data=b"body")
+        assert sess.request.call_count == 1
+
+    def test_timeouts_not_retried(self, transport):
+        sess = _session(transport, "example.com", [requests.ReadTimeout("slow")])
+        with pytest.raises(requests.Timeout):
+            transport.fetch("https://example.com/x")
+        assert sess.request.call_count == 1
+
+    def test_unresolvable_host_not_retried(self, transport):
+        from urllib3.exceptions import MaxRetryError, NameResolutionError
+        dns = NameResolutionError("example.com", None, OSError("Name or service not known"))
+        sess = _session(transport, "example.com",
+                        [requests.ConnectionError(MaxRetryError(None, "/x", dns))])
+        with pytest.raises(requests.ConnectionError):
+            transport.fetch("https://example.com/x")
+        assert sess.request.call_count == 1
+
+    def test_stream_yields_chunks_and_closes(self, transport):
+        resp = _response()
+        resp.iter_content.return_value = iter([b"<a>", b"</a>"])
+        sess = _session(transport, "example.com", [resp])
+        assert list(transport.stream("https://example.com/x", chunk_size=3)) == [b"<a>", b"</a>"]
+        assert sess.request.call_args.kwargs["stream"] is True
+        resp.iter_content.assert_called_once_with(3)
+        resp.__exit__.assert_called_once()
+
+    def test_stream_error_status_raises_before_yielding(self, transport):
+        _session(transport, "example.com", [_response(500, b"<fault/>")])
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            next(transport.stream("https://example.com/x"))
+        assert exc_info.value.read() == b"<fault/>"
+
+    def test_network_errors_count_for_health(self, transport):
+        from core.health import is_network_error
+        assert is_network_error(requests.ConnectionError("reset"))
+        assert is_network_error(requests.ReadTimeout("slow"))